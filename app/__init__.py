@@ -16,6 +16,11 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(get_config())
 
+    # Pool con métricas de espera/agotamiento (solo cuando hay pool configurado: PostgreSQL)
+    engine_opts = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    if "pool_size" in engine_opts:
+        from .services.db_pool import MeteredQueuePool
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**engine_opts, "poolclass": MeteredQueuePool}
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -30,8 +35,8 @@ def create_app():
     @login_manager.user_loader
     def load_user(user_id):
         # Import tardío para evitar el ciclo
-        from .models import Usuario
-        return Usuario.query.get(int(user_id))
+        from .services.user_cache import load_user as cached_load_user
+        return cached_load_user(int(user_id))
 
 
 
@@ -67,6 +72,9 @@ def create_app():
     from .blueprints.media import bp as media_bp
     app.register_blueprint(media_bp)
 
+    from .blueprints.panel import bp as panel_bp
+    app.register_blueprint(panel_bp)
+
     from .blueprints.users import bp as users_bp
     app.register_blueprint(users_bp)
 
@@ -76,6 +84,14 @@ def create_app():
     from .blueprints.session import bp as session_bp
     app.register_blueprint(session_bp)
 
+    from .commands import register_commands
+    register_commands(app)
+
+    from .services import mail_queue, recordatorios, sql_stats
+    mail_queue.init_app(app)
+    recordatorios.init_app(app)
+    sql_stats.init_app(app, db)
+
     @app.get("/")
     def home():
         return redirect(
@@ -87,6 +103,18 @@ def create_app():
     @app.get("/health")
     def health():
         return jsonify({"status": "ok"}), 200
+
+    @app.get("/metrics")
+    def metrics():
+        # Admin logueado o token de monitoreo (METRICS_TOKEN)
+        token = app.config.get("METRICS_TOKEN")
+        auth = request.headers.get("Authorization", "")
+        if not (token and auth == f"Bearer {token}") and not (
+            current_user.is_authenticated and current_user.rol == "admin"
+        ):
+            return jsonify({"error": "No autorizado"}), 403
+        from .services.db_pool import metricas
+        return jsonify({"db_pool": metricas(db.engine)}), 200
     
 
     return app
@@ -1,48 +1,115 @@
 # app/blueprints/animales.py
 from datetime import date
-from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, current_app, send_file, stream_with_context
 from flask_login import current_user, login_required
 from .. import db
-from ..models import Animal, Ubicacion, HistorialEstado, FotoAnimal, Insumo, TratamientoInsumo
+from ..models import Animal, HistorialEstado, FotoAnimal, Tratamiento
 from ..security import roles_required
-import os, uuid
-from werkzeug.utils import secure_filename
+from ..services.pagination import keyset_page
+from ..services.search import apply_search, search_keys
+from ..services.qr import ensure_qr_png
+from ..services.qr_sheet import select_animales, write_sheet_pdf, iter_sheet_zip
+from ..services.images import process_upload, borrar_tras_commit, clave_subida
+from ..services.storage import get_storage
+from ..services import public_cache
+from ..services.background import submit
+from ..services.estado_animal import registrar_estado, recalcular
+from ..services.cargas import animal_or_404
+from ..services import catalogo
+from sqlalchemy import func, select, delete
+from sqlalchemy.orm import joinedload
+import tempfile
 
 
 ESTADO_ANIMAL = ("En tratamiento","Recuperado","Fallecido","Observacion", "Adoptado")
 bp = Blueprint("animales", __name__)
 
+
+def _ultimos_tratamientos(animal_ids):
+    """Último tratamiento por animal en una sola consulta (usa ix_tratamiento_animal_fecha)."""
+    if not animal_ids:
+        return {}
+    rn = func.row_number().over(
+        partition_by=Tratamiento.animal_id,
+        order_by=(Tratamiento.fecha_tratamiento.desc(), Tratamiento.tratamiento_id.desc()),
+    ).label("rn")
+    ranked = (
+        select(Tratamiento.tratamiento_id, rn)
+        .where(Tratamiento.animal_id.in_(animal_ids))
+        .subquery()
+    )
+    rows = (
+        Tratamiento.query
+        .join(ranked, Tratamiento.tratamiento_id == ranked.c.tratamiento_id)
+        .filter(ranked.c.rn == 1)
+        .all()
+    )
+    return {t.animal_id: t for t in rows}
+
 # Listar animales con búsqueda
 @bp.get("/animales")
 @login_required
 def lista_animales():
     q = (request.args.get("q") or "").strip()
+    estado = request.args.get("estado") or None
     qry = Animal.query
-    if q:
-        like = f"%{q}%"
-        qry = qry.filter(
-            db.or_(
-                Animal.nombre.ilike(like),
-                Animal.especie.ilike(like),
-                Animal.color.ilike(like),
-            )
+    if estado in ESTADO_ANIMAL:
+        qry = qry.filter(Animal.estado_actual == estado)  # ix_animal_estado_actual
+    qry, rank = apply_search(qry, [Animal.nombre, Animal.especie, Animal.color], q)
+    page = keyset_page(
+        qry.options(joinedload(Animal.usuario), joinedload(Animal.ubicacion)),
+        search_keys(rank, Animal.animal_id, [(Animal.animal_id, True)]),
+        after=request.args.get("after"),
+    )
+    animales = page.items
+    ultimos = _ultimos_tratamientos([a.animal_id for a in animales])
+
+    return render_template("animals_list.html", animales=animales, q=q, ultimos=ultimos, page=page,
+                           estado=estado, ESTADO_ANIMAL=ESTADO_ANIMAL)
+
+# Hoja imprimible con los QR de varios animales (por ubicación, rango de registro o ids)
+@bp.get("/animales/qr/hoja")
+@login_required
+def hoja_qr():
+    ids = []
+    for raw in request.args.getlist("ids"):
+        ids.extend(int(x) for x in raw.split(",") if x.strip().isdigit())
+    ubicacion_id = request.args.get("ubicacion_id", type=int)
+    try:
+        desde = date.fromisoformat(request.args["desde"]) if request.args.get("desde") else None
+        hasta = date.fromisoformat(request.args["hasta"]) if request.args.get("hasta") else None
+    except ValueError:
+        abort(400, "Fecha inválida. Use AAAA-MM-DD.")
+    if not (ids or ubicacion_id or desde or hasta):
+        abort(400, "Indica ids, ubicacion_id o un rango desde/hasta")
+
+    animales = select_animales(ubicacion_id=ubicacion_id, desde=desde, hasta=hasta, ids=ids,
+                               limit=current_app.config.get("QR_SHEET_MAX", 1000))
+    if not animales:
+        flash("No hay animales para esa selección.", "error")
+        return redirect(url_for("animales.lista_animales"))
+
+    # workers=1: nada de procesos hijos dentro de un worker de gunicorn. La hoja se
+    # compone en este proceso (hasta QR_SHEET_MAX etiquetas); los lotes grandes van
+    # por `flask qr-hoja`, que sí usa el pool.
+    if (request.args.get("formato") or "pdf").lower() == "zip":
+        resp = current_app.response_class(
+            stream_with_context(iter_sheet_zip(animales, workers=1)), mimetype="application/zip"
         )
-    animales = qry.order_by(Animal.animal_id.desc()).all()
-    def _key (t):
-        return ((t.fecha_tratamiento or date.min), t.tratamiento_id or 0)
-    ultimos = {
-        a.animal_id: max(a.tratamientos, key=_key) if a.tratamientos else None
-        for a in animales
-    }
-    
-    return render_template("animals_list.html", animales=animales, q=q, ultimos=ultimos)
+        resp.headers["Content-Disposition"] = "attachment; filename=hojas_qr.zip"
+        return resp
+
+    # Pillow agrega cada hoja a un temporal en disco; la respuesta se envía al terminar
+    tmp = tempfile.TemporaryFile()
+    write_sheet_pdf(animales, tmp, workers=1)
+    tmp.seek(0)
+    return send_file(tmp, mimetype="application/pdf", as_attachment=True, download_name="hoja_qr.pdf")
 
 # ruta para formulario de nuevo animal
 @bp.get("/animales/nuevo")
 @login_required
 def nuevo_animal():
-    ubicaciones = Ubicacion.query.order_by(Ubicacion.comuna.asc(), Ubicacion.nombre_sector.asc()).all()
-    return render_template("animal_new.html", ubicaciones=ubicaciones)
+    return render_template("animal_new.html", ubicaciones=catalogo.para_select("ubicaciones"))
 
 # Crear nuevo animal
 @bp.post("/animales")
@@ -61,24 +128,26 @@ def crear_animal():
     )
     db.session.add(a)
     db.session.commit()
+    try:
+        ensure_qr_png(a.codigo_qr)
+    except OSError:
+        current_app.logger.exception("No se pudo pre-generar el QR del animal %s", a.animal_id)
     return redirect(url_for("animales.detalle_animal", animal_id=a.animal_id))
 
 # Ver detalle de animal
 @bp.get("/animales/<int:animal_id>")
 @login_required
 def detalle_animal(animal_id:int):
-    a = Animal.query.get_or_404(animal_id)
-    insumos = Insumo.query.order_by(Insumo.nombre.asc()).all()
-    ubicaciones = Ubicacion.query.order_by(Ubicacion.comuna.asc(), Ubicacion.nombre_sector.asc()).all()
-    return render_template("animal_detail.html", animal=a, insumos=insumos, ubicaciones=ubicaciones, ESTADO_ANIMAL=ESTADO_ANIMAL)
+    a = animal_or_404(animal_id, "detalle")
+    return render_template("animal_detail.html", animal=a, ubicaciones=catalogo.para_select("ubicaciones"),
+                           ESTADO_ANIMAL=ESTADO_ANIMAL)
 
 # Formulario para editar animal
 @bp.get("/animales/<int:animal_id>/editar")
 @login_required
 def editar_animal(animal_id:int):
     a = Animal.query.get_or_404(animal_id)
-    ubicaciones = Ubicacion.query.order_by(Ubicacion.comuna.asc(), Ubicacion.nombre_sector.asc()).all()
-    return render_template("animal_edit.html", animal=a, ubicaciones=ubicaciones)
+    return render_template("animal_edit.html", animal=a, ubicaciones=catalogo.para_select("ubicaciones"))
 
 # Guardar edición de animal
 @bp.post("/animales/<int:animal_id>/editar")
@@ -106,7 +175,10 @@ def cambiar_ubicacion(animal_id:int):
 @bp.post("/animales/<int:animal_id>/historial")
 @login_required
 def agregar_historial(animal_id: int):
-    a = Animal.query.get_or_404(animal_id)
+    # FOR UPDATE: dos cambios de estado simultáneos no dejan la copia en Animal desfasada
+    a = db.session.get(Animal, animal_id, with_for_update=True)
+    if a is None:
+        abort(404)
 
     estado = (request.form.get("estado") or "").strip()
     obs    = request.form.get("observaciones") or None
@@ -132,6 +204,7 @@ def agregar_historial(animal_id: int):
     )
 
     db.session.add(h)
+    registrar_estado(a, estado)
     db.session.commit()
     flash("Historial agregado.", "success")
     return redirect(url_for("animales.historial_animal", animal_id=a.animal_id))
@@ -140,11 +213,14 @@ def agregar_historial(animal_id: int):
 @bp.post("/animales/<int:animal_id>/historial/<int:historial_id>/eliminar")
 @login_required
 def eliminar_historial(animal_id:int, historial_id:int):
-    a = Animal.query.get_or_404(animal_id)
+    a = db.session.get(Animal, animal_id, with_for_update=True)
+    if a is None:
+        abort(404)
     h = HistorialEstado.query.get_or_404(historial_id)
     if h.animal_id != a.animal_id:
         abort(404)
     db.session.delete(h)
+    recalcular(a)
     db.session.commit()
     flash("Entrada de historial eliminada.", "success")
     return redirect(url_for("animales.historial_animal", animal_id=a.animal_id))
@@ -168,17 +244,22 @@ def subir_foto(animal_id:int):
         return redirect(url_for("animales.detalle_animal", animal_id=a.animal_id))
 
     ext = file.filename.rsplit(".",1)[-1].lower()
-    subdir = f"animal/{a.animal_id}"
-    folder = os.path.join(current_app.config["UPLOAD_FOLDER"], subdir)
-    os.makedirs(folder, exist_ok=True)
-    fname = f"{uuid.uuid4().hex}.{ext}"
-    path_abs = os.path.join(folder, secure_filename(fname))
-    file.save(path_abs)
-
-    rel = f"{subdir}/{fname}"
+    # Clave interna: /media/ no la sirve hasta que process_upload quite los metadatos
+    rel = clave_subida(a.animal_id, ext)
+    # Se copia por bloques desde el stream del request al almacenamiento (disco o S3)
+    storage = get_storage()
+    storage.save(rel, file.stream, content_type=file.mimetype)
+
     f = FotoAnimal(animal_id=a.animal_id, usuario_id=current_user.usuario_id, filename=rel, titulo=titulo)
     db.session.add(f)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        storage.delete(rel)
+        raise
+    # Variantes (miniatura, media) y limpieza EXIF fuera del request
+    submit(process_upload, f.foto_id)
     flash("Foto subida.", "success")
     return redirect(url_for("animales.detalle_animal", animal_id=a.animal_id))
 
@@ -190,13 +271,8 @@ def eliminar_foto(animal_id:int, foto_id:int):
     f = FotoAnimal.query.get_or_404(foto_id)
     if f.animal_id != a.animal_id:
         abort(404)
-    full = os.path.join(current_app.config["UPLOAD_FOLDER"], f.filename)
-    try:
-        if os.path.isfile(full):
-            os.remove(full)
-    except Exception:
-        pass
     db.session.delete(f)
+    borrar_tras_commit([f.filename])
     db.session.commit()
     flash("Foto eliminada.", "success")
     return redirect(url_for("animales.detalle_animal", animal_id=a.animal_id))
@@ -205,8 +281,8 @@ def eliminar_foto(animal_id:int, foto_id:int):
 @bp.get("/animales/<int:animal_id>/tratamientos")
 @login_required
 def tratamientos_animal(animal_id: int):
-    a = Animal.query.get_or_404(animal_id)
-    insumos = Insumo.query.order_by(Insumo.nombre.asc()).all()
+    a = animal_or_404(animal_id, "tratamientos")
+    insumos = catalogo.para_select("insumos")
     tratamientos_ordenados = sorted(
         a.tratamientos or [],
         key=lambda t: ((t.fecha_tratamiento or date.min), t.tratamiento_id),
@@ -219,7 +295,7 @@ def tratamientos_animal(animal_id: int):
 @bp.get("/animales/<int:animal_id>/historial")
 @login_required
 def historial_animal(animal_id: int):
-    a = Animal.query.get_or_404(animal_id)
+    a = animal_or_404(animal_id, "historial")
     return render_template("animal_historial.html", animal=a, ESTADO_ANIMAL=ESTADO_ANIMAL, today=date.today().isoformat())
 
 
@@ -227,27 +303,21 @@ def historial_animal(animal_id: int):
 @bp.post("/animales/<int:animal_id>/eliminar")
 @roles_required("admin", "veterinario")
 def eliminar_animal(animal_id: int):
-    a = Animal.query.get_or_404(animal_id)
-
-    fotos = list(a.fotos or [])
-    for f in fotos:
-        full = os.path.join(current_app.config["UPLOAD_FOLDER"], f.filename)
-        try:
-            if os.path.isfile(full):
-                os.remove(full)
-        except Exception:
-            pass
-        db.session.delete(f)
-
-    tratamientos = list(getattr(a, "tratamientos", []) or [])
-    for t in tratamientos:
-        TratamientoInsumo.query.filter_by(tratamiento_id=t.tratamiento_id).delete(synchronize_session=False)
-        db.session.delete(t)
-
-    HistorialEstado.query.filter_by(animal_id=a.animal_id).delete(synchronize_session=False)
-
-    db.session.delete(a)
+    # Sin cargar el animal ni sus colecciones: el DELETE se propaga por los
+    # ON DELETE CASCADE (fotos, historial -> recordatorios, tratamientos -> detalle)
+    # y deja en NULL el tratamiento_id de sus movimientos de stock
+    filenames = db.session.execute(
+        select(FotoAnimal.filename).where(FotoAnimal.animal_id == animal_id)
+    ).scalars().all()
+    res = db.session.execute(
+        delete(Animal).where(Animal.animal_id == animal_id).execution_options(synchronize_session=False)
+    )
+    if res.rowcount == 0:
+        db.session.rollback()
+        abort(404)
+    borrar_tras_commit(filenames)
     db.session.commit()
+    public_cache.invalidate_animal(animal_id)
 
     flash("Animal eliminado junto a sus fotos, historial y tratamientos.", "success")
     return redirect(url_for("animales.lista_animales"))
\ No newline at end of file
@@ -1,31 +1,60 @@
 # app/blueprints/insumos.py
 from decimal import Decimal
 from datetime import datetime, date
-from flask import Blueprint, render_template, request, redirect, url_for, abort, flash
-from flask_login import login_required
+from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, current_app, jsonify
+from flask_login import login_required, current_user
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from .. import db
-from ..models import Insumo, TratamientoInsumo
+from ..models import Insumo, MovimientoInsumo, TratamientoInsumo
+from ..services.pagination import keyset_page
+from ..services.search import apply_search, search_keys
+from ..services import catalogo
+from ..services.stock import (ingresar, consumir, cargar_lotes, disponible, movimientos, por_vencer,
+                              fijar_vencimiento)
+from ..services.forecast import pronostico, VENTANA_BASE
 
 bp = Blueprint("insumos", __name__)
 
+
+def _leer_vencimiento():
+    """(fecha, error) del campo `fecha_vencimiento`; vacío = sin vencimiento."""
+    raw = request.form.get("fecha_vencimiento") or ""
+    if not raw:
+        return None, None
+    try:
+        fv = datetime.strptime(raw, "%Y-%m-%d").date()
+    except ValueError:
+        return None, "Fecha de vencimiento inválida. Use AAAA-MM-DD."
+    if fv < date.today():
+        return None, "La fecha de vencimiento no puede ser pasada."
+    return fv, None
+
+
 # Listar insumos con búsqueda
 @bp.get("/insumos")
 @login_required
 def lista_insumos():
     q = (request.args.get("q") or "").strip()
-    qry = Insumo.query
-    if q:
-        like = f"%{q}%"
-        qry = qry.filter(
-            db.or_(
-                Insumo.nombre.ilike(like),
-                Insumo.unidad.ilike(like),
-            )
-        )
-    insumos = qry.order_by(Insumo.nombre.asc()).all()
-    return render_template("insumos_list.html", insumos=insumos, q=q, today=date.today().isoformat())
+    qry, rank = apply_search(Insumo.query, [Insumo.nombre, Insumo.unidad], q)
+    page = keyset_page(
+        qry,
+        search_keys(rank, Insumo.insumo_id, [(Insumo.nombre, False), (Insumo.insumo_id, False)]),
+        after=request.args.get("after"),
+    )
+    dias = current_app.config.get("LOTES_AVISO_DIAS", 30)
+    return render_template("insumos_list.html", insumos=page.items, q=q, page=page,
+                           pronostico=pronostico(page.items), ventana=VENTANA_BASE,
+                           por_vencer=por_vencer(dias), dias_aviso=dias,
+                           today=date.today().isoformat())
+
+# Buscador JSON para los <select> de insumos cuando el catálogo es grande
+@bp.get("/insumos/buscar")
+@login_required
+def buscar_insumos():
+    limit = min(request.args.get("limit", type=int) or 20, 50)
+    items = catalogo.buscar("insumos", request.args.get("q", ""), limit)
+    return jsonify({"items": [{"id": i.insumo_id, "texto": catalogo.texto(i)} for i in items]})
 
 # Crear nuevo insumo
 @bp.post("/insumos")
@@ -34,7 +63,6 @@ def crear_insumo():
     nombre_raw = (request.form.get("nombre") or "").strip()
     unidad_raw = (request.form.get("unidad") or "").strip()
     stock_val  = request.form.get("stock", type=float, default=0.0)
-    fv_raw     = request.form.get("fecha_vencimiento") or ""
 
 
     if not (nombre_raw and unidad_raw):
@@ -49,42 +77,27 @@ def crear_insumo():
     except Exception:
         stock = Decimal("0")
     
-    fv = None
-    fv_raw = request.form.get("fecha_vencimiento") or ""
-    if fv_raw:
-        try:
-            fv = datetime.strptime(fv_raw, "%Y-%m-%d").date()
-        except ValueError:
-            flash("Fecha de vencimiento inválida. Use AAAA-MM-DD.", "error")
-            return redirect(url_for("insumos.lista_insumos"))
-    
-    if fv and fv < date.today():
-        flash("No se puede registrar un insumo con fecha de vencimiento pasada.", "error")
+    fv, error = _leer_vencimiento()
+    if error:
+        flash(error, "error")
         return redirect(url_for("insumos.lista_insumos"))
+    # Sin cantidad no se crea lote, y el vencimiento es del lote
+    sin_lote = "Sin cantidad no se crea un lote: se ignoró la fecha de vencimiento." if fv and stock <= 0 else None
 
     
-    existente = Insumo.query.filter(func.lower(Insumo.nombre) == nombre.lower()).first()
+    existente = (
+        Insumo.query.filter(func.lower(Insumo.nombre) == nombre.lower())
+        .with_for_update().first()
+    )
     if existente:
-        if existente.fecha_vencimiento and existente.fecha_vencimiento < date.today():
-            flash(
-            f"El insumo “{existente.nombre}” está vencido (vence: {existente.fecha_vencimiento}). "
-            "Actualiza la fecha de vencimiento antes de sumar stock.",
-            "error",
-        )
-
-        
         if existente.unidad.lower() == unidad.lower():
-
-            if fv and fv < date.today():
-                flash("No se puede registrar stock con fecha de vencimiento pasada.", "error")
-                return redirect(url_for("insumos.lista_insumos"))
-
-            existente.stock = (existente.stock or Decimal("0")) + stock
-            if fv and (existente.fecha_vencimiento is None or fv > existente.fecha_vencimiento):
-                existente.fecha_vencimiento = fv  # opcional: mantener la más lejana
+            # Cada ingreso es un lote con su vencimiento: no se pisa la fecha de lo que ya había
+            ingresar(existente, stock, fv, "Ingreso", usuario_id=current_user.usuario_id)
             try:
                 db.session.commit()
                 flash(f"El insumo “{existente.nombre}” ya existía: se sumó {stock} {unidad} al stock.", "success")
+                if sin_lote:
+                    flash(sin_lote, "warning")
             except IntegrityError:
                 db.session.rollback()
                 flash("No se pudo actualizar el stock por un error de integridad.", "error")
@@ -97,11 +110,15 @@ def crear_insumo():
             )
             return redirect(url_for("insumos.lista_insumos"))
 
-    i = Insumo(nombre=nombre, unidad=unidad, stock=stock, fecha_vencimiento=fv)
+    i = Insumo(nombre=nombre, unidad=unidad, stock=Decimal("0"))
     db.session.add(i)
+    catalogo.marcar("insumos")
+    ingresar(i, stock, fv, "Inicial", usuario_id=current_user.usuario_id)
     try:
         db.session.commit()
         flash("Insumo creado.", "success")
+        if sin_lote:
+            flash(sin_lote, "warning")
     except IntegrityError:
         db.session.rollback()
         flash("Ya existe un insumo con ese nombre.", "error")
@@ -114,22 +131,61 @@ def ajustar_stock(insumo_id: int):
     delta_val = request.form.get("delta", type=float)
     if delta_val is None:
         abort(400, "delta requerido")
-    i = Insumo.query.get_or_404(insumo_id)
-    nuevo = (i.stock or Decimal("0")) + Decimal(str(delta_val))
-    if nuevo < 0:
-        flash("El stock no puede quedar negativo.", "error")
-        return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
-    i.stock = nuevo
+    i = db.session.get(Insumo, insumo_id, with_for_update=True)
+    if i is None:
+        abort(404)
+    delta = Decimal(str(delta_val))
+    nota = (request.form.get("nota") or "").strip()[:250] or None
+    if delta > 0:
+        fv, error = _leer_vencimiento()
+        if error:
+            db.session.rollback()
+            flash(error, "error")
+            return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
+        ingresar(i, delta, fv, "Ajuste", usuario_id=current_user.usuario_id, nota=nota)
+    elif delta < 0:
+        lotes = cargar_lotes([i.insumo_id])[i.insumo_id]
+        # Las mermas salen primero de lo vencido
+        if consumir(i, -delta, lotes, "Ajuste", vencidos=True,
+                    usuario_id=current_user.usuario_id, nota=nota) > 0:
+            db.session.rollback()
+            flash("El stock no puede quedar negativo.", "error")
+            return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
     db.session.commit()
     flash("Stock actualizado.", "success")
     return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
 
+# Corregir el vencimiento de un lote con saldo
+@bp.post("/insumos/<int:insumo_id>/lotes/<int:lote_id>/vencimiento")
+@login_required
+def corregir_vencimiento(insumo_id: int, lote_id: int):
+    i = db.session.get(Insumo, insumo_id, with_for_update=True)
+    if i is None:
+        abort(404)
+    lotes = cargar_lotes([i.insumo_id])[i.insumo_id]
+    lote = next((l for l in lotes if l.lote_id == lote_id), None)
+    if lote is None:
+        db.session.rollback()
+        abort(404)
+    fv, error = _leer_vencimiento()
+    if error:
+        db.session.rollback()
+        flash(error, "error")
+        return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
+    fijar_vencimiento(i, lote, fv, lotes)
+    db.session.commit()
+    flash(f"Vencimiento del lote #{lote.lote_id} actualizado.", "success")
+    return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
+
 # Formulario para editar insumo
 @bp.get("/insumos/<int:insumo_id>/editar")
 @login_required
 def editar_insumo(insumo_id: int):
     i = Insumo.query.get_or_404(insumo_id)
-    return render_template("insumo_edit.html", insumo=i, today=date.today().isoformat())
+    movs = movimientos(i.insumo_id, limit=20)
+    lotes = cargar_lotes([i.insumo_id])[i.insumo_id]
+    return render_template("insumo_edit.html", insumo=i, movimientos=movs, lotes=lotes,
+                           disponible=disponible(lotes), today=date.today().isoformat())
 
 # Guardar edición de insumo (excepto stock)
 @bp.post("/insumos/<int:insumo_id>/editar")
@@ -138,7 +194,6 @@ def guardar_edicion_insumo(insumo_id: int):
     i = Insumo.query.get_or_404(insumo_id)
     nombre_raw = (request.form.get("nombre") or "").strip()
     unidad_raw = (request.form.get("unidad") or "").strip()
-    fv_raw     = request.form.get("fecha_vencimiento") or ""
 
     if not (nombre_raw and unidad_raw):
         abort(400, "nombre y unidad son obligatorios")
@@ -157,21 +212,8 @@ def guardar_edicion_insumo(insumo_id: int):
 
     i.nombre = nombre
     i.unidad = unidad
-
-    if fv_raw:
-        try:
-            nueva_fv = datetime.strptime(fv_raw, "%Y-%m-%d").date()
-        except ValueError:
-            flash("Fecha de vencimiento inválida. Use AAAA-MM-DD.", "error")
-            return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
-
-        if nueva_fv < date.today():
-            flash("No puedes establecer una fecha de vencimiento pasada.", "error")
-            return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
-
-        i.fecha_vencimiento = nueva_fv
-    else:
-        i.fecha_vencimiento = None
+    catalogo.marcar("insumos")
+    # El vencimiento es por lote: se registra al ingresar stock y se corrige en la tabla de lotes
 
     try:
         db.session.commit()
@@ -181,7 +223,7 @@ def guardar_edicion_insumo(insumo_id: int):
         flash("No se pudo actualizar (posible duplicado).", "error")
     return redirect(url_for("insumos.editar_insumo", insumo_id=i.insumo_id))
 
-# Eliminar insumo (si no está en uso)
+# Eliminar insumo (si no está en uso ni tiene movimientos de stock)
 @bp.post("/insumos/<int:insumo_id>/eliminar")
 @login_required
 def eliminar_insumo(insumo_id: int):
@@ -190,9 +232,14 @@ def eliminar_insumo(insumo_id: int):
     if en_uso:
         flash("No se puede eliminar: el insumo está siendo usado en tratamientos.", "error")
         return redirect(url_for("insumos.lista_insumos"))
+    con_libro = db.session.query(MovimientoInsumo.movimiento_id).filter_by(insumo_id=insumo_id).limit(1).first()
+    if con_libro:
+        flash("No se puede eliminar: el insumo tiene movimientos de stock y su historial se conserva.", "error")
+        return redirect(url_for("insumos.editar_insumo", insumo_id=insumo_id))
 
     try:
         db.session.delete(i)
+        catalogo.marcar("insumos")
         db.session.commit()
         flash("Insumo eliminado.", "success")
     except IntegrityError:
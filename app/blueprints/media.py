@@ -1,12 +1,97 @@
-from flask import Blueprint, current_app, send_from_directory, abort
-import os
+from flask import Blueprint, current_app, send_from_directory, abort, url_for, redirect, request
+from ..services.images import RENDITIONS, ORIGINAL_MAX, rendition_name, es_interna
+from ..services.storage import get_storage, RangoInvalido
+import mimetypes
+
+mimetypes.add_type("image/webp", ".webp")
+
+# La redirección al bucket público no es el contenido: caché corta, por si cambia S3_PUBLIC_BASE_URL
+REDIRECT_MAX_AGE = 300
 
 bp = Blueprint("media", __name__)
 
+# URL de una foto; con `size` usa la variante. Sin procesar aún lleva EXIF/GPS: imagen de espera
+@bp.app_template_global()
+def foto_src(f, size=None):
+    if not f.procesada:
+        return url_for("static", filename="img/foto-procesando.svg")
+    if size:
+        return url_for("media.media", filename=rendition_name(f.filename, size))
+    return url_for("media.media", filename=f.filename)
+
+# srcset con las variantes de la foto ("" si aún no se procesan)
+@bp.app_template_global()
+def foto_srcset(f):
+    if not f.procesada:
+        return ""
+    parts = [f"{foto_src(f, s)} {w}w" for s, w in RENDITIONS.items()]
+    parts.append(f"{foto_src(f)} {ORIGINAL_MAX}w")
+    return ", ".join(parts)
+
+def _rango_s3():
+    """Range a pasar a get_object: solo uno, en bytes, y sin If-Range (ahí va el archivo completo)."""
+    r = request.range
+    if r is None or r.units != "bytes" or len(r.ranges) != 1 or "If-Range" in request.headers:
+        return None
+    return r.to_header()
+
+def _desde_s3(storage, filename: str):
+    """Con S3_PUBLIC_BASE_URL (bucket público o CDN) redirige; si no, retransmite por bloques."""
+    base = current_app.config.get("S3_PUBLIC_BASE_URL")
+    if base:
+        return redirect(f"{base.rstrip('/')}/{storage.prefix}{filename}", code=302)
+    try:
+        obj = storage.get(filename, rango=_rango_s3())
+    except FileNotFoundError:
+        abort(404)
+    except RangoInvalido:
+        abort(416)
+    body = obj["Body"]
+    resp = current_app.response_class(
+        body.iter_chunks(storage.chunk),
+        mimetype=obj.get("ContentType") or mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        direct_passthrough=True,
+    )
+    resp.content_length = obj.get("ContentLength")
+    if obj.get("ContentRange"):
+        resp.status_code = 206
+        resp.headers["Content-Range"] = obj["ContentRange"]
+    resp.accept_ranges = "bytes"
+    resp.set_etag((obj.get("ETag") or "").strip('"') or filename)
+    resp.call_on_close(body.close)
+    return resp.make_conditional(request)
+
+def _cache(resp, max_age: int):
+    """Caché inmutable solo para contenido (200, 206, 304); lo demás, caché corta."""
+    resp.cache_control.public = True
+    if resp.status_code in (200, 206, 304):
+        resp.cache_control.max_age = max_age
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.max_age = REDIRECT_MAX_AGE
+    return resp
+
 @bp.get("/media/<path:filename>")
 def media(filename: str):
-    folder = current_app.config["UPLOAD_FOLDER"]
-    full = os.path.join(folder, filename)
-    if not os.path.abspath(full).startswith(os.path.abspath(folder)) or not os.path.isfile(full):
+    # Las subidas sin procesar y la cuarentena son internas
+    if es_interna(filename):
+        abort(404)
+    # Lo que se sirve ya está procesado, con nombre uuid, y nunca se reescribe: caché inmutable
+    max_age = current_app.config.get("MEDIA_MAX_AGE", 31536000)
+    storage = get_storage()
+    if storage.nombre == "s3":
+        return _cache(_desde_s3(storage, filename), max_age)
+
+    if not storage.exists(filename):
         abort(404)
-    return send_from_directory(folder, filename)
+    folder = storage.root
+    accel_prefix = current_app.config.get("MEDIA_X_ACCEL_PREFIX")
+    if accel_prefix:
+        # nginx sirve el archivo desde una location `internal` que apunta a UPLOAD_FOLDER
+        resp = current_app.response_class(status=200)
+        resp.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + filename.lstrip("/")
+        resp.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    else:
+        # conditional=True: ETag/Last-Modified, 304 y Range (206); con USE_X_SENDFILE delega en el servidor
+        resp = send_from_directory(folder, filename, max_age=max_age, conditional=True, etag=True)
+    return _cache(resp, max_age)
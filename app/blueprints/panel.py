@@ -0,0 +1,13 @@
+# app/blueprints/panel.py
+from flask import Blueprint, render_template
+from flask_login import login_required
+from ..services.kpi import panel as kpi_panel
+
+bp = Blueprint("panel", __name__)
+
+# Panel con indicadores del refugio (leídos de kpi_resumen)
+@bp.get("/panel")
+@login_required
+def ver_panel():
+    datos, actualizado_en = kpi_panel()
+    return render_template("panel.html", kpi=datos, actualizado_en=actualizado_en)
@@ -6,7 +6,8 @@ from .. import db
 from ..models import Usuario
 from ..services.passwords import gen_temp_password_from_email
 from ..services.token import reset_serializer
-from ..services.mail import send_email
+from ..services.mail_queue import enqueue_email
+from ..services.user_cache import invalidate_user
 
 bp = Blueprint("passwords", __name__)
 
@@ -40,6 +41,7 @@ def cambiar_password_post():
 
     current_user.set_password(nueva)
     db.session.commit()
+    invalidate_user(current_user.usuario_id)
     session.pop("force_pwd_change", None)
     flash("Contraseña actualizada.", "success")
     return redirect(url_for("animales.lista_animales"))
@@ -63,7 +65,8 @@ def forgot_password_post():
             f"Hola {u.nombre},\n\nPara restablecer tu contraseña usa este enlace "
             f"(válido por 1 hora):\n{reset_url}\n\nSi no solicitaste esto, ignora este correo."
         )
-        send_email(u.correo, "Restablecer contraseña - Patitas QR", body)
+        enqueue_email(u.correo, "Restablecer contraseña - Patitas QR", body)
+        db.session.commit()
     flash("Si el correo existe, te enviamos instrucciones de restablecimiento.", "success")
     return redirect(url_for("sessions.login"))
 
@@ -105,5 +108,6 @@ def reset_password_post(token):
 
     u.set_password(nueva)
     db.session.commit()
+    invalidate_user(u.usuario_id)
     flash("Contraseña actualizada. Ya puedes iniciar sesión.", "success")
     return redirect(url_for("sessions.login"))
@@ -1,33 +1,63 @@
 # app/blueprints/publico.py
-from flask import Blueprint, current_app, render_template, send_file, abort
+from flask import Blueprint, current_app, render_template, send_file, abort, request, session
+from flask_login import current_user
 from ..models import Animal, Tratamiento
-import qrcode, io
+from ..services import public_cache
+from ..services.cargas import opciones
+from ..services.qr import ensure_qr_png, qr_cache_path, qr_key, render_qr_png
+import io, os
 
 bp = Blueprint("publico", __name__)
 
 # Ruta para mostrar la ficha pública del animal
 @bp.get("/p/<token>")
 def ficha_publica(token: str):
-    animal = Animal.query.filter_by(codigo_qr=token).first()
-    if not animal:
-        abort(404)
-    tratamientos_aprobados = (
-        Tratamiento.query
-        .filter_by(animal_id=animal.animal_id, estado="Aprobado")
-        .order_by(Tratamiento.fecha_tratamiento.desc())
-        .limit(5)
-        .all()
-    )
-    return render_template("public_animal.html", animal=animal, tratamientos=tratamientos_aprobados)
+    # Solo se cachea la vista anónima: la autenticada muestra datos del usuario en el menú
+    cacheable = not current_user.is_authenticated and "_flashes" not in session
+    entry = public_cache.get_ficha(token) if cacheable else None
+
+    if entry is None:
+        animal = (
+            Animal.query
+            .options(*opciones("publica"))
+            .filter_by(codigo_qr=token)
+            .first()
+        )
+        if not animal:
+            abort(404)
+        tratamientos_aprobados = (
+            Tratamiento.query
+            .filter_by(animal_id=animal.animal_id, estado="Aprobado")
+            .order_by(Tratamiento.fecha_tratamiento.desc())
+            .limit(5)
+            .all()
+        )
+        html = render_template("public_animal.html", animal=animal, tratamientos=tratamientos_aprobados)
+        if not cacheable:
+            return html
+        entry = public_cache.set_ficha(
+            token, animal.animal_id, html, ttl=current_app.config.get("PUBLIC_FICHA_CACHE_TTL", 300)
+        )
+
+    resp = current_app.response_class(entry.html, mimetype="text/html")
+    resp.set_etag(entry.etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = current_app.config.get("PUBLIC_FICHA_MAX_AGE", 60)
+    return resp.make_conditional(request)
 
 # Ruta para generar y servir el código QR como imagen PNG
 @bp.get("/qr/<token>.png")
 def qr_png(token: str):
-    base = current_app.config.get("QR_PUBLIC_BASE_URL", "http://localhost:5000")
-    url = f"{base}/p/{token}"
-    img = qrcode.make(url)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return send_file(buf, mimetype="image/png")
+    max_age = current_app.config.get("QR_CACHE_MAX_AGE", 86400)
+    path = qr_cache_path(token)
+    if not os.path.isfile(path):
+        # Solo se cachean en disco los tokens de animales existentes
+        if not Animal.query.filter_by(codigo_qr=token).first():
+            buf = io.BytesIO(render_qr_png(token))
+            return send_file(buf, mimetype="image/png")
+        path = ensure_qr_png(token)
+
+    resp = send_file(path, mimetype="image/png", etag=qr_key(token), conditional=True, max_age=max_age)
+    resp.cache_control.public = True
+    return resp
 
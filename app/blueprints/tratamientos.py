@@ -1,14 +1,15 @@
 # app/blueprints/tratamientos.py
-from flask import Blueprint, request, redirect, url_for, abort, flash, render_template
+from flask import Blueprint, request, redirect, url_for, abort, flash, render_template, jsonify, current_app
 from sqlalchemy.exc import IntegrityError
 from flask_login import current_user
 from .. import db
 from ..models import Tratamiento, TratamientoInsumo, Insumo
 from ..security import roles_required
+from ..services import stock, catalogo
+from ..services.db_pool import timeouts_locales, es_bloqueo
 from decimal import Decimal
 from sqlalchemy import select
-from sqlalchemy.exc import SQLAlchemyError
-from datetime import date
+from sqlalchemy.exc import SQLAlchemyError, OperationalError
 
 bp = Blueprint("tratamientos", __name__)
 
@@ -53,8 +54,9 @@ def crear_tratamiento():
 
     if totales:
         faltantes = []
+        insumos = stock.cargar_insumos(totales)
         for ins_id, req in totales.items():
-            i = Insumo.query.get(ins_id)
+            i = insumos.get(ins_id)
             if i and i.stock is not None and i.stock < req:
                 faltantes.append(f"{i.nombre} (disp: {i.stock}, req: {req})")
         if faltantes:
@@ -74,79 +76,112 @@ def crear_tratamiento():
 @bp.post("/tratamientos/<int:tratamiento_id>/aprobar")
 @roles_required("veterinario", "admin")
 def aprobar_tratamiento(tratamiento_id: int):
-    t = Tratamiento.query.get_or_404(tratamiento_id)
+    # FOR UPDATE también sobre el tratamiento: dos clics simultáneos no descuentan dos veces.
+    # lock_timeout corto: si otra aprobación retiene las filas, se avisa en vez de colgar el worker
+    try:
+        timeouts_locales(db.session, lock_ms=current_app.config.get("APROBACION_LOCK_TIMEOUT_MS"))
+        t = db.session.execute(
+            select(Tratamiento).where(Tratamiento.tratamiento_id == tratamiento_id).with_for_update()
+        ).scalar_one_or_none()
+    except OperationalError as e:
+        if not es_bloqueo(e):
+            raise
+        db.session.rollback()
+        flash("El tratamiento se está aprobando en otra sesión; intenta de nuevo.", "error")
+        return redirect(request.referrer or url_for("animales.lista_animales"))
+    if t is None:
+        abort(404)
     if t.estado != "Pendiente":
+        db.session.rollback()
         flash("Solo se puede aprobar un tratamiento en estado Pendiente.", "error")
         return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
 
-    detalles = list(t.detalle_insumos or [])
-    if not detalles:
+    req = stock.requeridos(t.detalle_insumos or [])
+    if not req:
         t.estado = "Aprobado"
         db.session.commit()
         flash("Tratamiento aprobado (sin insumos).", "success")
         return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
 
-    faltantes = []
-    for d in detalles:
-        i = Insumo.query.get(d.insumo_id)
-        if not i:
-            faltantes.append(f"Insumo #{d.insumo_id} inexistente")
-            continue
-        disp = i.stock or Decimal("0")
-        req = d.cantidad
-        if disp < req:
-            faltantes.append(f"{i.nombre} (disponible: {disp}, requerido: {req})")
-        if i.fecha_vencimiento and i.fecha_vencimiento < date.today():
-            faltantes.append(f"{i.nombre} vencido (vence: {i.fecha_vencimiento})")
-
-    if faltantes:
-        flash("No se pudo aprobar por falta de: " + "; ".join(faltantes), "error")
-        return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
-
     try:
-        ids = [d.insumo_id for d in detalles]
-        locked_insumos = (
-            db.session.execute(
-                select(Insumo)
-                .where(Insumo.insumo_id.in_(ids))
-                .with_for_update()
-            ).scalars().all()
-        )
-        locked_map = {i.insumo_id: i for i in locked_insumos}
-
-        for d in detalles:
-            i = locked_map.get(d.insumo_id)
-            if not i:
-                db.session.rollback()
-                flash(f"Insumo #{d.insumo_id} inexistente.", "error")
-                return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
-            disp = i.stock or Decimal("0")
-            req = d.cantidad
-            if disp < req:
-                db.session.rollback()
-                flash(f"Stock insuficiente de {i.nombre}. Disp: {disp}, req: {req}", "error")
-                return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
-            if i.fecha_vencimiento and i.fecha_vencimiento < date.today():
-                db.session.rollback()
-                flash(f"El insumo {i.nombre} está vencido (vence: {i.fecha_vencimiento}).", "error")
-                return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
-
-        for d in detalles:
-            i = locked_map[d.insumo_id]
-            i.stock = (i.stock or Decimal("0")) - d.cantidad
+        # Una sola consulta bloqueada y ordenada; se valida y descuenta sobre esas filas
+        insumos = stock.cargar_insumos(req, lock=True)
+        lotes = stock.cargar_lotes(insumos)
+        faltantes = stock.faltantes(req, insumos, lotes)
+        if faltantes:
+            db.session.rollback()
+            flash("No se pudo aprobar por falta de: " + "; ".join(faltantes), "error")
+            return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
 
+        stock.descontar(req, insumos, lotes, tratamiento_id=t.tratamiento_id, usuario_id=current_user.usuario_id)
         t.estado = "Aprobado"
-        db.session.add(t)
         db.session.commit()
         flash("Tratamiento aprobado y stock actualizado ✅", "success")
 
-    except SQLAlchemyError:
+    except SQLAlchemyError as e:
         db.session.rollback()
-        flash("Ocurrió un error al aprobar el tratamiento.", "error")
+        if es_bloqueo(e):
+            flash("Los insumos están siendo usados por otra aprobación; intenta de nuevo.", "error")
+        else:
+            flash("Ocurrió un error al aprobar el tratamiento.", "error")
 
     return redirect(url_for("animales.tratamientos_animal", animal_id=t.animal_id))
 
 
+# Aprobar varios tratamientos a la vez
+@bp.post("/tratamientos/aprobar")
+@roles_required("veterinario", "admin")
+def aprobar_tratamientos_lote():
+    """Acepta `tratamiento_id[]` por formulario o {"tratamiento_ids": [...]} en JSON.
+
+    Responde JSON con el resultado por tratamiento si la petición es JSON;
+    si no, resume con flash y vuelve a la página anterior.
+    """
+    if request.is_json:
+        raw = (request.get_json(silent=True) or {}).get("tratamiento_ids") or []
+    else:
+        raw = request.form.getlist("tratamiento_id[]") or request.form.getlist("tratamiento_id")
+    try:
+        ids = [int(x) for x in raw]
+    except (TypeError, ValueError):
+        abort(400, "tratamiento_ids debe ser una lista de enteros")
+    if not ids:
+        abort(400, "No se indicaron tratamientos")
+    if len(ids) > current_app.config.get("APROBACION_LOTE_MAX", 200):
+        abort(400, "Demasiados tratamientos en un lote")
+
+    try:
+        timeouts_locales(db.session, lock_ms=current_app.config.get("APROBACION_LOCK_TIMEOUT_MS"))
+        resultados = stock.aprobar_lote(ids, usuario_id=current_user.usuario_id)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if es_bloqueo(e):
+            if request.is_json:
+                return jsonify({"error": "Tratamientos o insumos bloqueados por otra aprobación"}), 409
+            flash("Hay otra aprobación en curso sobre estos tratamientos; intenta de nuevo.", "error")
+            return redirect(request.referrer or url_for("animales.lista_animales"))
+        if request.is_json:
+            return jsonify({"error": "No se pudo aprobar el lote"}), 500
+        flash("Ocurrió un error al aprobar los tratamientos.", "error")
+        return redirect(request.referrer or url_for("animales.lista_animales"))
+
+    aprobados = sum(1 for _, ok, _ in resultados if ok)
+    if request.is_json:
+        return jsonify({
+            "aprobados": aprobados,
+            "resultados": [{"tratamiento_id": tid, "ok": ok, "mensaje": msg}
+                           for tid, ok, msg in resultados],
+        })
+
+    if aprobados:
+        flash(f"{aprobados} tratamiento(s) aprobados y stock actualizado ✅", "success")
+    for tid, ok, msg in resultados:
+        if not ok:
+            flash(f"Tratamiento #{tid}: {msg}", "error")
+    return redirect(request.referrer or url_for("animales.lista_animales"))
+
+
 # Rechazar tratamiento
 @bp.post("/tratamientos/<int:tratamiento_id>/rechazar")
 @roles_required("veterinario", "admin")
@@ -167,7 +202,7 @@ def actualizar_cantidad_detalle(tratamiento_id: int, insumo_id: int):
     if t.estado != "Pendiente":
         abort(400, "Solo se puede editar un tratamiento Pendiente")
 
-    d = TratamientoInsumo.query.get((tratamiento_id, insumo_id))
+    d = db.session.get(TratamientoInsumo, (tratamiento_id, insumo_id))
     if not d:
         abort(404, "Detalle no encontrado")
 
@@ -196,14 +231,14 @@ def agregar_linea_detalle(tratamiento_id: int):
         abort(400, "La cantidad debe ser > 0")
 
     q = Decimal(str(cantidad))
-    d = TratamientoInsumo.query.get((tratamiento_id, insumo_id))
+    d = db.session.get(TratamientoInsumo, (tratamiento_id, insumo_id))
     if d:
         d.cantidad = d.cantidad + q
     else:
         d = TratamientoInsumo(tratamiento_id=tratamiento_id, insumo_id=insumo_id, cantidad=q)
         db.session.add(d)
 
-    i = Insumo.query.get(insumo_id)
+    i = db.session.get(Insumo, insumo_id)
     if i and i.stock is not None and i.stock < d.cantidad:
         flash(f"La cantidad total de {i.nombre} (req: {d.cantidad}) supera stock actual ({i.stock}). "
               "Podrás aprobar cuando repongas stock o reduzcas la cantidad.", "warning")
@@ -220,7 +255,7 @@ def eliminar_linea_detalle(tratamiento_id: int, insumo_id: int):
     if t.estado != "Pendiente":
         abort(400, "Solo se puede editar un tratamiento Pendiente")
 
-    d = TratamientoInsumo.query.get((tratamiento_id, insumo_id))
+    d = db.session.get(TratamientoInsumo, (tratamiento_id, insumo_id))
     if not d:
         abort(404, "Detalle no encontrado")
 
@@ -234,8 +269,7 @@ def eliminar_linea_detalle(tratamiento_id: int, insumo_id: int):
 @roles_required("veterinario", "asistente", "admin")
 def tratamiento_edit(tratamiento_id: int):
     t = Tratamiento.query.get_or_404(tratamiento_id)
-    insumos = Insumo.query.order_by(Insumo.nombre.asc()).all()
-    return render_template("tratamiento_edit.html", t=t, insumos=insumos)
+    return render_template("tratamiento_edit.html", t=t, insumos=catalogo.para_select("insumos"))
 
 # Actualizar tratamiento
 @bp.post("/tratamientos/<int:tratamiento_id>/actualizar")
@@ -1,11 +1,14 @@
 # app/blueprints/ubicaciones.py
-from flask import Blueprint, render_template, request, redirect, url_for, abort, flash
+from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, jsonify
 from flask_login import login_required
-from sqlalchemy import func, or_
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from .. import db
 from ..models import Ubicacion, Animal
 from ..security import roles_required
+from ..services.pagination import keyset_page
+from ..services.search import apply_search, search_keys
+from ..services import catalogo
 
 bp = Blueprint("ubicaciones", __name__)
 
@@ -14,14 +17,24 @@ bp = Blueprint("ubicaciones", __name__)
 @login_required
 def lista_ubicaciones():
     q = (request.args.get("q") or "").strip()
-    qry = Ubicacion.query
-    if q:
-        like = f"%{q}%"
-        qry = qry.filter(or_(Ubicacion.comuna.ilike(like),
-                             Ubicacion.nombre_sector.ilike(like),
-                             Ubicacion.descripcion.ilike(like)))
-    ubicaciones = qry.order_by(Ubicacion.comuna.asc(), Ubicacion.nombre_sector.asc()).all()
-    return render_template("ubicaciones_list.html", ubicaciones=ubicaciones, q=q)
+    qry, rank = apply_search(
+        Ubicacion.query, [Ubicacion.comuna, Ubicacion.nombre_sector, Ubicacion.descripcion], q
+    )
+    page = keyset_page(
+        qry,
+        search_keys(rank, Ubicacion.ubicacion_id,
+                    [(Ubicacion.comuna, False), (Ubicacion.nombre_sector, False), (Ubicacion.ubicacion_id, False)]),
+        after=request.args.get("after"),
+    )
+    return render_template("ubicaciones_list.html", ubicaciones=page.items, q=q, page=page)
+
+# Buscador JSON para los <select> de ubicación cuando el catálogo es grande
+@bp.get("/ubicaciones/buscar")
+@login_required
+def buscar_ubicaciones():
+    limit = min(request.args.get("limit", type=int) or 20, 50)
+    items = catalogo.buscar("ubicaciones", request.args.get("q", ""), limit)
+    return jsonify({"items": [{"id": u.ubicacion_id, "texto": catalogo.texto(u)} for u in items]})
 
 # Crear nueva ubicacion
 @bp.post("/ubicaciones")
@@ -46,6 +59,7 @@ def crear_ubicacion():
 
     u = Ubicacion(comuna=comuna, nombre_sector=sector, descripcion=(descripcion or None))
     db.session.add(u)
+    catalogo.marcar("ubicaciones")
     try:
         db.session.commit()
         flash("Ubicación creada.", "success")
@@ -87,6 +101,7 @@ def guardar_edicion_ubicacion(ubicacion_id: int):
     u.comuna = comuna
     u.nombre_sector = sector
     u.descripcion = (descripcion or None)
+    catalogo.marcar("ubicaciones")
     try:
         db.session.commit()
         flash("Ubicación actualizada.", "success")
@@ -109,6 +124,7 @@ def eliminar_ubicacion(ubicacion_id: int):
 
     try:
         db.session.delete(u)
+        catalogo.marcar("ubicaciones")
         db.session.commit()
         flash("Ubicación eliminada.", "success")
     except IntegrityError:
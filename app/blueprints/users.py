@@ -1,13 +1,15 @@
 # app/blueprints/users.py
 from flask import Blueprint, render_template, request, redirect, url_for, abort, flash
 from flask_login import current_user
-from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 from .. import db
 from ..models import Usuario, Tratamiento, HistorialEstado, FotoAnimal, Animal
 from ..security import roles_required
-from ..services.mail import send_email
+from ..services.mail_queue import enqueue_email
 from ..services.passwords import gen_temp_password_from_email
+from ..services.pagination import keyset_page
+from ..services.user_cache import invalidate_user
+from ..services.search import apply_search, search_keys
 
 bp = Blueprint("users", __name__)
 
@@ -22,15 +24,15 @@ def _vets_activos_count():
 @roles_required("admin", "veterinario")
 def usuarios_list():
     q = (request.args.get("q") or "").strip()
-    qry = Usuario.query
-    if q:
-        like = f"%{q}%"
-        qry = qry.filter(or_(Usuario.nombre.ilike(like),
-                             Usuario.apellido.ilike(like),
-                             Usuario.correo.ilike(like)))
-    usuarios = qry.order_by(Usuario.activo.desc(), Usuario.rol.asc(),
-                            Usuario.apellido.asc(), Usuario.nombre.asc()).all()
-    return render_template("usuarios_list.html", usuarios=usuarios, q=q)
+    qry, rank = apply_search(Usuario.query, [Usuario.nombre, Usuario.apellido, Usuario.correo], q)
+    page = keyset_page(
+        qry,
+        search_keys(rank, Usuario.usuario_id,
+                    [(Usuario.activo, True), (Usuario.rol, False), (Usuario.apellido, False),
+                     (Usuario.nombre, False), (Usuario.usuario_id, False)]),
+        after=request.args.get("after"),
+    )
+    return render_template("usuarios_list.html", usuarios=page.items, q=q, page=page)
 
 # Ruta para crear nuevo usuario
 @bp.get("/usuarios/nuevo")
@@ -61,17 +63,18 @@ def usuarios_crear():
     u = Usuario(nombre=nombre, apellido=apellido, correo=correo, rol=rol_final)
     u.set_password(temp_pwd)
     db.session.add(u)
+    login_url = url_for("sessions.login", _external=True)
+    body = (
+        f"Hola {u.nombre},\n\nTu cuenta en Patitas QR fue creada.\n"
+        f"Correo: {u.correo}\nContraseña temporal: {temp_pwd}\n\n"
+        f"Ingresa aquí: {login_url}\n"
+        f"Al iniciar sesión con la clave temporal, se te pedirá cambiarla.\n\n"
+        f"Si no solicitaste esta cuenta, ignora este mensaje."
+    )
+    # Se encola en la misma transacción: si el usuario no se crea, tampoco sale el correo
+    enqueue_email(u.correo, "Acceso a Patitas QR", body)
     try:
         db.session.commit()
-        login_url = url_for("sessions.login", _external=True)
-        body = (
-            f"Hola {u.nombre},\n\nTu cuenta en Patitas QR fue creada.\n"
-            f"Correo: {u.correo}\nContraseña temporal: {temp_pwd}\n\n"
-            f"Ingresa aquí: {login_url}\n"
-            f"Al iniciar sesión con la clave temporal, se te pedirá cambiarla.\n\n"
-            f"Si no solicitaste esta cuenta, ignora este mensaje."
-        )
-        send_email(u.correo, "Acceso a Patitas QR", body)
         flash("Usuario creado. Se envió una contraseña temporal al correo.", "success")
     except IntegrityError as e:
         db.session.rollback()
@@ -108,6 +111,7 @@ def usuario_cambiar_rol(usuario_id:int):
 
     u.rol = nuevo
     db.session.commit()
+    invalidate_user(u.usuario_id)
     flash("Rol actualizado.", "success")
     return redirect(url_for("users.usuarios_list"))
 
@@ -127,6 +131,7 @@ def usuario_desactivar(usuario_id:int):
         return redirect(url_for("users.usuarios_list"))
     u.activo = False
     db.session.commit()
+    invalidate_user(u.usuario_id)
     flash("Usuario desactivado.", "success")
     return redirect(url_for("users.usuarios_list"))
 
@@ -137,6 +142,7 @@ def usuario_activar(usuario_id:int):
     u = Usuario.query.get_or_404(usuario_id)
     u.activo = True
     db.session.commit()
+    invalidate_user(u.usuario_id)
     flash("Usuario activado.", "success")
     return redirect(url_for("users.usuarios_list"))
 
@@ -165,5 +171,6 @@ def usuario_eliminar(usuario_id:int):
 
     db.session.delete(u)
     db.session.commit()
+    invalidate_user(usuario_id)
     flash("Usuario eliminado.", "success")
     return redirect(url_for("users.usuarios_list"))
@@ -0,0 +1,142 @@
+# app/commands.py
+from datetime import date
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command("qr-hoja")
+    @click.option("--ubicacion", "ubicacion_id", type=int, help="Solo animales de esta ubicación.")
+    @click.option("--desde", help="fecha_registro desde (AAAA-MM-DD).")
+    @click.option("--hasta", help="fecha_registro hasta (AAAA-MM-DD).")
+    @click.option("--ids", help="Lista de animal_id separados por coma.")
+    @click.option("--workers", type=int, default=None, help="Procesos para codificar los QR.")
+    @click.option("-o", "--output", default="hoja_qr.pdf", show_default=True, help="Archivo .pdf o .zip")
+    def qr_hoja(ubicacion_id, desde, hasta, ids, workers, output):
+        """Genera una hoja imprimible con las etiquetas QR de varios animales."""
+        from .services.qr_sheet import select_animales, write_sheet_pdf, iter_sheet_zip
+        id_list = [int(x) for x in (ids or "").split(",") if x.strip().isdigit()]
+        try:
+            d1 = date.fromisoformat(desde) if desde else None
+            d2 = date.fromisoformat(hasta) if hasta else None
+        except ValueError:
+            raise click.BadParameter("Fecha inválida. Use AAAA-MM-DD.")
+        animales = select_animales(ubicacion_id=ubicacion_id, desde=d1, hasta=d2, ids=id_list)
+        if not animales:
+            raise click.ClickException("No hay animales para esa selección.")
+
+        with open(output, "w+b") as fh:  # el PDF se arma con append: Pillow lo relee
+            if output.lower().endswith(".zip"):
+                for chunk in iter_sheet_zip(animales, workers=workers):
+                    fh.write(chunk)
+            else:
+                paginas = write_sheet_pdf(animales, fh, workers=workers)
+                click.echo(f"{paginas} página(s)")
+        click.echo(f"{len(animales)} etiquetas → {output}")
+
+    @app.cli.command("mail-worker")
+    @click.option("--once", is_flag=True, help="Entrega lo pendiente y termina.")
+    def mail_worker(once):
+        """Entrega los correos de la tabla correo_saliente (con reintentos)."""
+        import time
+        from .services.mail_queue import deliver_pending
+        poll = app.config.get("MAIL_QUEUE_POLL_SECONDS", 30)
+        while True:
+            total = 0
+            while (n := deliver_pending()):
+                total += n
+            if total:
+                click.echo(f"{total} correo(s) enviado(s)")
+            if once:
+                break
+            time.sleep(poll)
+
+    @app.cli.command("recordatorios")
+    @click.option("--fecha", help="Tomar esta fecha como hoy (AAAA-MM-DD).")
+    def recordatorios(fecha):
+        """Encola los resúmenes de controles próximos o vencidos (idempotente)."""
+        from datetime import date
+        from .services.recordatorios import procesar
+        try:
+            hoy = date.fromisoformat(fecha) if fecha else None
+        except ValueError:
+            raise click.BadParameter("Fecha inválida. Use AAAA-MM-DD.")
+        click.echo(f"{procesar(hoy)} resumen(es) encolado(s)")
+
+    @app.cli.command("fotos-procesar")
+    @click.option("--limite", type=int, default=None, help="Máximo de fotos a procesar.")
+    def fotos_procesar(limite):
+        """Genera variantes y limpia EXIF de las fotos aún no procesadas."""
+        from . import db
+        from .models import FotoAnimal
+        from .services.images import process_upload
+        qry = db.session.query(FotoAnimal.foto_id).filter(FotoAnimal.procesada.is_(False)).order_by(FotoAnimal.foto_id)
+        if limite:
+            qry = qry.limit(limite)
+        ok = err = 0
+        for (foto_id,) in qry.all():
+            try:
+                process_upload(foto_id)
+                ok += 1
+            except Exception as e:
+                db.session.rollback()
+                err += 1
+                click.echo(f"foto {foto_id}: {e}", err=True)
+        click.echo(f"{ok} procesada(s), {err} con error")
+
+    @app.cli.command("stock-reconstruir")
+    @click.option("--aplicar", is_flag=True, help="Corrige insumo.stock; sin esto solo informa.")
+    def stock_reconstruir(aplicar):
+        """Compara insumo.stock con la suma del libro de movimientos."""
+        from . import db
+        from .services.stock import descuadres, reconstruir
+        filas = descuadres()
+        for i, saldo in filas:
+            click.echo(f"insumo {i.insumo_id} {i.nombre}: stock={i.stock} libro={saldo}")
+        if not filas:
+            click.echo("Stock cuadrado con el libro.")
+            return
+        if aplicar:
+            n = reconstruir()
+            db.session.commit()
+            click.echo(f"{n} insumo(s) corregido(s)")
+
+    @app.cli.command("estado-reparar")
+    def estado_reparar():
+        """Recalcula animal.estado_actual desde historial_estado."""
+        from . import db
+        from .services.estado_animal import reparar
+        n = reparar()
+        db.session.commit()
+        click.echo(f"{n} animal(es) actualizado(s)")
+
+    @app.cli.command("kpi-refrescar")
+    def kpi_refrescar():
+        """Recalcula la tabla kpi_resumen del panel (para cron)."""
+        from .services.kpi import refrescar
+        click.echo(f"{refrescar()} fila(s) en kpi_resumen")
+
+    @app.cli.command("uploads-gc")
+    @click.option("--borrar", "accion", flag_value="borrar", help="Borra los archivos huérfanos.")
+    @click.option("--cuarentena", "accion", flag_value="cuarentena",
+                  help="Mueve los huérfanos a _cuarentena/<fecha>/ en el mismo almacenamiento.")
+    @click.option("--min-edad", type=int, default=None, help="No toca archivos más nuevos que esto (segundos).")
+    @click.option("--top", type=int, default=20, show_default=True, help="Animales a listar por espacio usado.")
+    def uploads_gc(accion, min_edad, top):
+        """Cruza las fotos del almacenamiento (animal/) con foto_animal e informa uso y huérfanos."""
+        import heapq
+        from .services.uploads_gc import recolectar
+        inf = recolectar(accion=accion, min_edad=min_edad)
+        mb = lambda n: f"{n / 1048576:.1f} MB"
+        click.echo(f"{inf.archivos} archivo(s), {mb(inf.bytes)} en {len(inf.por_animal)} animal(es)")
+        click.echo(f"Huérfanos: {inf.huerfanos} ({mb(inf.bytes_huerfanos)})"
+                   + (f" -> {accion}" if accion and inf.huerfanos else "")
+                   + (f"; {inf.recientes} reciente(s) sin tocar" if inf.recientes else ""))
+        if inf.faltantes:
+            click.echo(f"Fotos sin archivo original: {inf.faltantes} (p. ej. {', '.join(inf.ejemplos_faltantes[:5])})")
+        for path in inf.ignorados[:20]:
+            click.echo(f"Ignorado: {path}")
+        if top:
+            click.echo("animal_id  archivos  tamaño  huérfanos")
+            for aid, (n, size, nh, sh) in heapq.nlargest(top, inf.por_animal.items(), key=lambda kv: kv[1][1]):
+                click.echo(f"{aid:>9}  {n:>8}  {mb(size):>8}  {nh} ({mb(sh)})")
@@ -19,6 +19,30 @@ def _normalize_db_url(url: str | None) -> str:
         url = url.replace("postgresql://", "postgresql+psycopg://", 1)
     return url
 
+def _engine_options(url: str) -> dict:
+    """Opciones del engine. El pool y los timeouts solo aplican a PostgreSQL
+    (SQLite usa su propio pool y no entiende `options`)."""
+    opts = {"pool_pre_ping": True}
+    if not url.startswith("postgresql"):
+        return opts
+    opts.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),  # segundos
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "10")),    # espera máxima por conexión
+    )
+    # Valores por defecto de cada conexión (ms, 0 = sin límite); un request puede
+    # acotarlos más con SET LOCAL (ver services/db_pool.timeouts_locales)
+    pg = []
+    for var, param, default in (("DB_STATEMENT_TIMEOUT_MS", "statement_timeout", "30000"),
+                                ("DB_LOCK_TIMEOUT_MS", "lock_timeout", "10000")):
+        ms = int(os.getenv(var, default))
+        if ms:
+            pg.append(f"-c {param}={ms}")
+    if pg:
+        opts["connect_args"] = {"options": " ".join(pg)}
+    return opts
+
 
 
 class Config:
@@ -33,18 +57,90 @@ class Config:
 )
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    # (opcional, mejora la estabilidad de conexiones en Render)
-    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True}
+    # Pool y timeouts por variables de entorno. Cada worker tiene su pool: con
+    # W workers se abren hasta W * (DB_POOL_SIZE + DB_MAX_OVERFLOW) conexiones,
+    # que deben caber en el límite del plan de Postgres en Render
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # /metrics: si se define, se acepta "Authorization: Bearer <token>" (además de admin logueado)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # --- Listados (paginación por cursor) ---
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+    # Búsqueda por similitud trigram (requiere la extensión pg_trgm, ver migraciones)
+    SEARCH_USE_TRGM = _bool(os.getenv("SEARCH_USE_TRGM", "1"), True)
 
     # --- QR público ---
     _RENDER_URL = os.getenv("RENDER_EXTERNAL_URL")
     QR_PUBLIC_BASE_URL = os.getenv("QR_PUBLIC_BASE_URL", _RENDER_URL or "http://localhost:5000")
     ALLOWED_ORIGINS     = os.getenv("ALLOWED_ORIGINS", QR_PUBLIC_BASE_URL)
+    QR_CACHE_MAX_AGE    = int(os.getenv("QR_CACHE_MAX_AGE", "86400"))  # segundos
+    # Ficha pública (/p/<token>): caché del HTML renderizado y max-age para el navegador
+    PUBLIC_FICHA_CACHE_TTL = int(os.getenv("PUBLIC_FICHA_CACHE_TTL", "300"))
+    PUBLIC_FICHA_MAX_AGE   = int(os.getenv("PUBLIC_FICHA_MAX_AGE", "60"))
+    # Hojas de etiquetas QR para imprimir
+    QR_SHEET_COLS    = int(os.getenv("QR_SHEET_COLS", "4"))
+    QR_SHEET_ROWS    = int(os.getenv("QR_SHEET_ROWS", "6"))
+    QR_SHEET_MAX     = int(os.getenv("QR_SHEET_MAX", "1000"))
+    QR_SHEET_WORKERS = int(os.getenv("QR_SHEET_WORKERS", "0")) or None  # procesos de `flask qr-hoja`; None = nº de CPUs
 
     # --- Subida de imágenes ---
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", str(PROJECT_ROOT / "uploads"))
     MAX_CONTENT_LENGTH = 4 * 1024 * 1024  # 4 MB
     ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+    # /media/: caché inmutable y delegación opcional al servidor web
+    MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", str(365 * 24 * 3600)))
+    MEDIA_X_ACCEL_PREFIX = os.getenv("MEDIA_X_ACCEL_PREFIX")  # p. ej. "/_media_interno" (nginx)
+    USE_X_SENDFILE = _bool(os.getenv("USE_X_SENDFILE"), False)  # Apache/lighttpd
+
+    # Dónde viven las fotos: "local" (UPLOAD_FOLDER) o "s3" (S3/MinIO/R2; requiere boto3).
+    # En Render el disco es efímero y no se comparte entre instancias: usar s3
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+    STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(1024 * 1024)))  # bytes por bloque
+    S3_BUCKET = os.getenv("S3_BUCKET")
+    S3_PREFIX = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # p. ej. http://localhost:9000 (MinIO)
+    S3_REGION = os.getenv("S3_REGION")
+    S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+    S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+    # Si el bucket (o un CDN delante) es público, /media/ redirige ahí en vez de retransmitir
+    S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL")
+
+    # `flask uploads-gc`: antigüedad mínima de un huérfano para tocarlo (s) y archivos por consulta
+    UPLOADS_GC_MIN_EDAD = int(os.getenv("UPLOADS_GC_MIN_EDAD", "3600"))
+    UPLOADS_GC_LOTE = int(os.getenv("UPLOADS_GC_LOTE", "1000"))
+
+    # --- Tareas de fondo (procesamiento de fotos, etc.) ---
+    BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "2"))
+    BACKGROUND_SYNC = _bool(os.getenv("BACKGROUND_SYNC"), False)  # ejecuta en línea (tests/CLI)
+
+    # --- Tratamientos: máximo de ids por aprobación en lote ---
+    APROBACION_LOTE_MAX = int(os.getenv("APROBACION_LOTE_MAX", "200"))
+
+    # --- Lotes: aviso de vencimiento en el listado de insumos (días) ---
+    LOTES_AVISO_DIAS = int(os.getenv("LOTES_AVISO_DIAS", "30"))
+
+    # --- Pronóstico de consumo: cada cuánto se recalcula completo (segundos) ---
+    FORECAST_REBUILD_SECONDS = int(os.getenv("FORECAST_REBUILD_SECONDS", "900"))
+
+    # --- Panel de indicadores (kpi_resumen) ---
+    KPI_REFRESH_SECONDS = int(os.getenv("KPI_REFRESH_SECONDS", "300"))
+    KPI_SEMANAS = int(os.getenv("KPI_SEMANAS", "8"))
+    KPI_STOCK_BAJO = int(os.getenv("KPI_STOCK_BAJO", "5"))
+
+    # --- Aprobaciones: espera máxima por los FOR UPDATE (ms, solo PostgreSQL) ---
+    APROBACION_LOCK_TIMEOUT_MS = int(os.getenv("APROBACION_LOCK_TIMEOUT_MS", "3000"))
+
+    # --- Catálogos de insumos/ubicaciones para los <select> ---
+    CATALOGO_CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", "300"))  # segundos
+    CATALOGO_EMBED_MAX = int(os.getenv("CATALOGO_EMBED_MAX", "300"))  # más que esto = buscador JSON
+
+    # --- Desarrollo: nº de consultas y tiempo de BD por request (log + Server-Timing) ---
+    SQL_STATS = _bool(os.getenv("SQL_STATS"), False)
+    SQL_STATS_WARN = int(os.getenv("SQL_STATS_WARN", "20"))  # más consultas que esto = warning
+
+    # --- Sesión: caché del usuario logueado (segundos) ---
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
 
     # --- Reseteo de contraseña ---
     TEMP_PWD_SECRET = os.getenv("TEMP_PWD_SECRET") 
@@ -58,6 +154,23 @@ class Config:
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", MAIL_USERNAME)
     MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "smtp").lower()  # "smtp" | "sendgrid" | "mailgun"
+    MAIL_SMTP_MAX_IDLE = int(os.getenv("MAIL_SMTP_MAX_IDLE", "60"))  # segundos antes de reabrir la conexión SMTP
+
+    # --- Cola de correo (tabla correo_saliente + worker en segundo plano) ---
+    MAIL_QUEUE_WORKER = _bool(os.getenv("MAIL_QUEUE_WORKER"), True)  # 0 = solo `flask mail-worker`
+    MAIL_QUEUE_POLL_SECONDS = int(os.getenv("MAIL_QUEUE_POLL_SECONDS", "30"))
+    MAIL_QUEUE_BATCH = int(os.getenv("MAIL_QUEUE_BATCH", "20"))
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+    MAIL_RETRY_BASE_SECONDS = int(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+    MAIL_RETRY_MAX_SECONDS = int(os.getenv("MAIL_RETRY_MAX_SECONDS", "3600"))
+    MAIL_SEND_LEASE_SECONDS = int(os.getenv("MAIL_SEND_LEASE_SECONDS", "300"))  # reserva de un correo mientras se envía
+
+    # --- Recordatorios de próximo control (resumen por correo) ---
+    RECORDATORIOS_WORKER = _bool(os.getenv("RECORDATORIOS_WORKER"), True)  # 0 = solo `flask recordatorios`
+    RECORDATORIOS_INTERVALO_SECONDS = int(os.getenv("RECORDATORIOS_INTERVALO_SECONDS", "3600"))
+    RECORDATORIOS_DIAS = int(os.getenv("RECORDATORIOS_DIAS", "3"))                  # avisar con N días de anticipación
+    RECORDATORIOS_VENCIDOS_DIAS = int(os.getenv("RECORDATORIOS_VENCIDOS_DIAS", "30"))  # no insistir con controles más viejos
+    RECORDATORIOS_CHUNK = int(os.getenv("RECORDATORIOS_CHUNK", "50"))
 
 
 def get_config():
@@ -11,6 +11,11 @@ def gen_uuid():
     return str(uuid.uuid4())
 
 
+def trgm_index(name, column):
+    """Índice GIN pg_trgm para búsquedas ILIKE '%q%' (en otros motores queda como índice normal)."""
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"})
+
+
 
 class Usuario(UserMixin, db.Model):
     __tablename__ = "usuario"
@@ -31,6 +36,9 @@ class Usuario(UserMixin, db.Model):
         ),
         UniqueConstraint("correo", name="usuario_correo_uk"),
         Index("ix_usuario_correo", "correo"),
+        trgm_index("ix_usuario_nombre_trgm", "nombre"),
+        trgm_index("ix_usuario_apellido_trgm", "apellido"),
+        trgm_index("ix_usuario_correo_trgm", "correo"),
     )
     def get_id(self) -> str:
         return str(self.usuario_id)
@@ -55,6 +63,12 @@ class Ubicacion(db.Model):
     descripcion = db.Column(db.Text)
     creado_en = db.Column(db.DateTime, server_default=func.current_timestamp())
 
+    __table_args__ = (
+        trgm_index("ix_ubicacion_comuna_trgm", "comuna"),
+        trgm_index("ix_ubicacion_sector_trgm", "nombre_sector"),
+        trgm_index("ix_ubicacion_descripcion_trgm", "descripcion"),
+    )
+
     def __repr__(self):
         return f"<Ubicacion {self.ubicacion_id} {self.comuna}-{self.nombre_sector}>"
 
@@ -69,7 +83,9 @@ class Animal(db.Model):
     color = db.Column(db.String(50))
     codigo_qr = db.Column(db.String(255), unique=True, nullable=False, default=gen_uuid)
     fecha_registro = db.Column(db.Date, nullable=False, server_default=func.current_date())
-
+    # Copia del último historial_estado (ver services/estado_animal.py)
+    estado_actual = db.Column(db.String(30))
+    estado_actualizado_en = db.Column(db.DateTime)
 
     usuario_id = db.Column(
         db.Integer,
@@ -104,6 +120,10 @@ class Animal(db.Model):
         ),
         UniqueConstraint("codigo_qr", name="animal_codigo_qr_uk"),
         Index("ix_animal_ubicacion", "ubicacion_id"),
+        Index("ix_animal_estado_actual", "estado_actual", "animal_id"),
+        trgm_index("ix_animal_nombre_trgm", "nombre"),
+        trgm_index("ix_animal_especie_trgm", "especie"),
+        trgm_index("ix_animal_color_trgm", "color"),
     )
 
     def __repr__(self):
@@ -152,16 +172,43 @@ class Insumo(db.Model):
     nombre = db.Column(db.String(50), nullable=False, unique=True)
     unidad = db.Column(db.String(50), nullable=False)        
     stock = db.Column(db.Numeric(10, 2), nullable=False, default=0)
-    fecha_vencimiento = db.Column(db.Date)
+    fecha_vencimiento = db.Column(db.Date)  # la más próxima entre sus lotes con saldo
 
     __table_args__ = (
         CheckConstraint("stock >= 0", name="insumo_stock_chk"),
+        trgm_index("ix_insumo_nombre_trgm", "nombre"),
+        trgm_index("ix_insumo_unidad_trgm", "unidad"),
     )
 
     def __repr__(self):
         return f"<Insumo {self.insumo_id} {self.nombre} stock={self.stock}>"
 
 
+class LoteInsumo(db.Model):
+    """Ingreso de un insumo con su propio vencimiento; se consume FEFO.
+    La suma de `cantidad` de los lotes es `Insumo.stock`."""
+    __tablename__ = "lote_insumo"
+
+    lote_id = db.Column(db.Integer, primary_key=True)
+    insumo_id = db.Column(db.Integer, db.ForeignKey("insumo.insumo_id", ondelete="CASCADE"), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    fecha_vencimiento = db.Column(db.Date)
+    creado_en = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        CheckConstraint("cantidad >= 0", name="lote_insumo_cantidad_chk"),
+        Index("ix_lote_insumo_fefo", "insumo_id", "fecha_vencimiento"),
+        # "lotes que vencen en los próximos N días": rango sobre lotes con saldo
+        Index("ix_lote_insumo_vencimiento", "fecha_vencimiento",
+              postgresql_where=db.text("cantidad > 0")),
+    )
+
+    insumo = db.relationship("Insumo")
+
+    def __repr__(self):
+        return f"<LoteInsumo {self.lote_id} i={self.insumo_id} cant={self.cantidad} vence={self.fecha_vencimiento}>"
+
+
 class TratamientoInsumo(db.Model):
     __tablename__ = "tratamiento_insumo"
 
@@ -205,6 +252,9 @@ class HistorialEstado(db.Model):
             "estado in ('En tratamiento','Recuperado','Adoptado','Fallecido','Observacion')",
             name="historial_estado_chk",
         ),
+        # Controles próximos/vencidos por rango de fecha (ver services/recordatorios.py)
+        Index("ix_historial_estado_proximo_control", "proximo_control",
+              postgresql_where=db.text("proximo_control IS NOT NULL")),
     )
 
     animal = db.relationship("Animal", back_populates="historial_estados")
@@ -218,8 +268,120 @@ class FotoAnimal(db.Model):
     filename = db.Column(db.String(255), nullable=False) 
     titulo = db.Column(db.String(100))
     fecha_subida = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+    procesada = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # variantes listas
 
     animal = db.relationship("Animal", back_populates="fotos")
     usuario = db.relationship("Usuario")
 
 
+
+
+class CorreoSaliente(db.Model):
+    """Bandeja de salida: los correos se encolan en la transacción del request y
+    un worker los entrega con reintentos (ver services/mail_queue.py)."""
+    __tablename__ = "correo_saliente"
+
+    correo_id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(255), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    cuerpo = db.Column(db.Text, nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default="Pendiente")
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proximo_intento = db.Column(db.DateTime, nullable=False)
+    ultimo_error = db.Column(db.Text)
+    creado_en = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+    enviado_en = db.Column(db.DateTime)
+
+    __table_args__ = (
+        CheckConstraint(
+            "estado IN ('Pendiente','Enviado','Fallido')",
+            name="correo_saliente_estado_chk",
+        ),
+        Index("ix_correo_saliente_pendientes", "estado", "proximo_intento"),
+    )
+
+    def __repr__(self):
+        return f"<CorreoSaliente {self.correo_id} {self.destinatario} {self.estado}>"
+
+
+class MovimientoInsumo(db.Model):
+    """Libro de movimientos de stock (solo inserción). `Insumo.stock` es el saldo
+    cacheado y se puede reconstruir sumando `delta` (ver services/stock.py)."""
+    __tablename__ = "movimiento_insumo"
+
+    movimiento_id = db.Column(db.Integer, primary_key=True)
+    # RESTRICT: un insumo con movimientos no se borra (el libro es el historial auditable)
+    insumo_id = db.Column(db.Integer, db.ForeignKey("insumo.insumo_id", ondelete="RESTRICT"), nullable=False)
+    delta = db.Column(db.Numeric(10, 2), nullable=False)
+    saldo = db.Column(db.Numeric(12, 2), nullable=False)  # stock tras el movimiento
+    motivo = db.Column(db.String(20), nullable=False)
+    nota = db.Column(db.String(250))
+    tratamiento_id = db.Column(db.Integer, db.ForeignKey("tratamiento.tratamiento_id", ondelete="SET NULL"))
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.usuario_id", ondelete="SET NULL"))
+    lote_id = db.Column(db.Integer, db.ForeignKey("lote_insumo.lote_id", ondelete="SET NULL"))
+    creado_en = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        CheckConstraint(
+            "motivo IN ('Inicial','Ingreso','Ajuste','Tratamiento')",
+            name="movimiento_insumo_motivo_chk",
+        ),
+        CheckConstraint("delta <> 0", name="movimiento_insumo_delta_chk"),
+        Index("ix_movimiento_insumo_fecha", "insumo_id", "creado_en"),
+        Index("ix_movimiento_insumo_tratamiento", "tratamiento_id"),
+    )
+
+    insumo = db.relationship("Insumo")
+    usuario = db.relationship("Usuario")
+    lote = db.relationship("LoteInsumo")
+
+    def __repr__(self):
+        return f"<MovimientoInsumo {self.movimiento_id} i={self.insumo_id} {self.delta:+} {self.motivo}>"
+
+
+class RecordatorioControl(db.Model):
+    """Registro de recordatorios de `proximo_control` ya encolados; la restricción
+    única evita que dos workers (o un reinicio) avisen dos veces lo mismo."""
+    __tablename__ = "recordatorio_control"
+
+    recordatorio_id = db.Column(db.Integer, primary_key=True)
+    historial_id = db.Column(db.Integer, db.ForeignKey("historial_estado.historial_id", ondelete="CASCADE"), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.usuario_id", ondelete="SET NULL"))
+    tipo = db.Column(db.String(20), nullable=False)
+    enviado_en = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        CheckConstraint("tipo IN ('Proximo','Vencido')", name="recordatorio_control_tipo_chk"),
+        UniqueConstraint("historial_id", "tipo", name="uq_recordatorio_control"),
+    )
+
+    def __repr__(self):
+        return f"<RecordatorioControl h={self.historial_id} {self.tipo}>"
+
+
+class KpiResumen(db.Model):
+    """Agregados del panel (conteos por estado, ubicación, especie, etc.).
+    Se reescriben completos en cada refresco (ver services/kpi.py)."""
+    __tablename__ = "kpi_resumen"
+
+    grupo = db.Column(db.String(30), primary_key=True)
+    clave = db.Column(db.String(150), primary_key=True)
+    valor = db.Column(db.Numeric(12, 2), nullable=False)
+    orden = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<KpiResumen {self.grupo}:{self.clave}={self.valor}>"
+
+
+class CatalogoVersion(db.Model):
+    """Versión de cada catálogo cacheado (insumos, ubicaciones). Se incrementa
+    dentro de la transacción que lo modifica; todos los workers la consultan
+    antes de usar su copia (ver services/catalogo.py)."""
+    __tablename__ = "catalogo_version"
+
+    tipo = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CatalogoVersion {self.tipo}={self.version}>"
@@ -0,0 +1,38 @@
+# app/services/background.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor(app) -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get("BACKGROUND_WORKERS", 2),
+                thread_name_prefix="patitas-bg",
+            )
+        return _executor
+
+
+def _run(app, fn, args, kwargs):
+    with app.app_context():
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            app.logger.exception("Error en tarea de fondo %s", getattr(fn, "__name__", fn))
+            raise
+
+
+def submit(fn, *args, **kwargs):
+    """Ejecuta `fn` fuera del hilo del request, dentro de un app context propio.
+
+    Con BACKGROUND_SYNC=1 (tests, CLI) se ejecuta en línea.
+    """
+    app = current_app._get_current_object()
+    if app.config.get("BACKGROUND_SYNC"):
+        return _run(app, fn, args, kwargs)
+    return _get_executor(app).submit(_run, app, fn, args, kwargs)
@@ -0,0 +1,40 @@
+# app/services/cargas.py
+from flask import abort
+from sqlalchemy.orm import joinedload, selectinload
+from .. import db
+from ..models import Animal, HistorialEstado, Tratamiento, TratamientoInsumo
+
+# Qué relaciones usa cada plantilla del animal. selectinload para colecciones
+# (una consulta IN por nivel), joinedload para many-to-one. Son funciones porque
+# Animal.tratamientos es un backref y no existe hasta que se configuran los mappers.
+VISTAS = {
+    "detalle": lambda: (
+        joinedload(Animal.ubicacion),
+        selectinload(Animal.fotos),
+    ),
+    "historial": lambda: (
+        selectinload(Animal.historial_estados).joinedload(HistorialEstado.usuario),
+    ),
+    "tratamientos": lambda: (
+        selectinload(Animal.tratamientos)
+        .selectinload(Tratamiento.detalle_insumos)
+        .joinedload(TratamientoInsumo.insumo),
+    ),
+    "publica": lambda: (
+        joinedload(Animal.ubicacion),
+        selectinload(Animal.fotos),
+        selectinload(Animal.historial_estados),
+    ),
+}
+
+
+def opciones(vista: str) -> tuple:
+    return VISTAS[vista]()
+
+
+def animal_or_404(animal_id: int, vista: str) -> Animal:
+    """Animal con las relaciones de `vista` ya cargadas, o 404."""
+    a = db.session.get(Animal, animal_id, options=opciones(vista))
+    if a is None:
+        abort(404)
+    return a
@@ -0,0 +1,124 @@
+# app/services/catalogo.py
+import unicodedata
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import select, update
+from .. import db
+from ..models import CatalogoVersion, Insumo, Ubicacion
+from .cache import TTLCache
+
+InsumoItem = namedtuple("InsumoItem", ["insumo_id", "nombre", "unidad", "stock"])
+UbicacionItem = namedtuple("UbicacionItem", ["ubicacion_id", "comuna", "nombre_sector", "descripcion"])
+
+# tipo -> (versión, [items]), por proceso. La versión vive en la tabla
+# catalogo_version: cada lectura la compara (una consulta por PK), así un cambio
+# confirmado en cualquier worker invalida la copia de todos. El stock no se
+# cachea (cambia con cada movimiento); se lee aparte solo para los ítems mostrados.
+_catalogos = TTLCache(maxsize=8, ttl=300)
+
+
+def _consulta(tipo: str):
+    if tipo == "insumos":
+        rows = db.session.execute(
+            select(Insumo.insumo_id, Insumo.nombre, Insumo.unidad).order_by(Insumo.nombre)
+        )
+        return [InsumoItem(*r, stock=None) for r in rows]
+    rows = db.session.execute(
+        select(Ubicacion.ubicacion_id, Ubicacion.comuna, Ubicacion.nombre_sector, Ubicacion.descripcion)
+        .order_by(Ubicacion.comuna, Ubicacion.nombre_sector)
+    )
+    return [UbicacionItem(*r) for r in rows]
+
+
+def _version(tipo: str) -> int:
+    v = db.session.scalar(select(CatalogoVersion.version).where(CatalogoVersion.tipo == tipo))
+    return v or 0
+
+
+def _cargar(tipo: str) -> list:
+    version = _version(tipo)
+    hit = _catalogos.get(tipo)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    items = _consulta(tipo)
+    _catalogos.set(tipo, (version, items), ttl=current_app.config.get("CATALOGO_CACHE_TTL", 300))
+    return items
+
+
+def _con_stock(items: list) -> list:
+    """Copia de `items` (insumos) con el stock actual, en una sola consulta."""
+    if not items:
+        return items
+    stock = dict(db.session.execute(
+        select(Insumo.insumo_id, Insumo.stock).where(Insumo.insumo_id.in_([i.insumo_id for i in items]))
+    ).all())
+    return [i._replace(stock=stock.get(i.insumo_id)) for i in items]
+
+
+def insumos() -> list:
+    return _cargar("insumos")
+
+
+def ubicaciones() -> list:
+    return _cargar("ubicaciones")
+
+
+def para_select(tipo: str):
+    """Lista completa para embeber en un <select>, o None si supera
+    CATALOGO_EMBED_MAX (la plantilla usa entonces el buscador JSON)."""
+    items = _cargar(tipo)
+    if len(items) > current_app.config.get("CATALOGO_EMBED_MAX", 300):
+        return None
+    return _con_stock(items) if tipo == "insumos" else items
+
+
+def marcar(*tipos: str) -> None:
+    """Sube la versión de los catálogos dentro de la transacción actual: si se
+    confirma, todos los workers recargan en su siguiente lectura; si se revierte,
+    la versión tampoco cambia."""
+    # sin autoflush: los cambios pendientes se validan en el commit del handler, no aquí
+    with db.session.no_autoflush:
+        for tipo in tipos:
+            res = db.session.execute(
+                update(CatalogoVersion).where(CatalogoVersion.tipo == tipo)
+                .values(version=CatalogoVersion.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if res.rowcount == 0:
+                db.session.add(CatalogoVersion(tipo=tipo, version=1))
+
+
+def _norm(s) -> str:
+    s = unicodedata.normalize("NFKD", s or "")
+    return "".join(c for c in s if not unicodedata.combining(c)).lower()
+
+
+def _etiqueta(item) -> str:
+    if isinstance(item, InsumoItem):
+        return item.nombre
+    t = f"{item.comuna} — {item.nombre_sector}"
+    return f"{t} ({item.descripcion})" if item.descripcion else t
+
+
+def texto(item) -> str:
+    if isinstance(item, InsumoItem) and item.stock is not None:
+        return f"{item.nombre} (stock: {item.stock})"
+    return _etiqueta(item)
+
+
+def buscar(tipo: str, q: str, limit: int = 20) -> list:
+    """Coincidencias sin tildes ni mayúsculas; primero las que empiezan con `q`."""
+    q = _norm(q).strip()
+    if not q:
+        return []
+    pref, resto = [], []
+    for item in _cargar(tipo):
+        t = _norm(_etiqueta(item))
+        if t.startswith(q):
+            pref.append(item)
+        elif q in t:
+            resto.append(item)
+        if len(pref) >= limit:
+            break
+    items = (pref + resto)[:limit]
+    return _con_stock(items) if tipo == "insumos" else items
@@ -0,0 +1,83 @@
+# app/services/db_pool.py
+import threading, time
+from sqlalchemy import exc, text
+from sqlalchemy.pool import QueuePool
+
+LENTO = 0.1  # segundos de espera por conexión que cuentan como checkout lento
+
+
+class _Stats:
+    """Contadores del pool de este proceso (cada worker de gunicorn tiene los suyos)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.lentos = 0
+        self.agotado = 0     # TimeoutError: no hubo conexión dentro de pool_timeout
+
+    def observar(self, espera: float, agotado: bool = False) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+            self.lentos += espera > LENTO
+            self.agotado += agotado
+
+
+stats = _Stats()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool que mide la espera de cada checkout y cuántas veces se agota."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            con = super()._do_get()
+        except exc.TimeoutError:
+            stats.observar(time.perf_counter() - t0, agotado=True)
+            raise
+        stats.observar(time.perf_counter() - t0)
+        return con
+
+
+def metricas(engine) -> dict:
+    pool = engine.pool
+    out = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(), checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(), overflow=pool.overflow(),
+            timeout_s=pool.timeout(),
+        )
+    with stats.lock:
+        n = stats.checkouts
+        out.update(
+            checkouts=n,
+            espera_prom_ms=round(1000 * stats.espera_total / n, 3) if n else 0.0,
+            espera_max_ms=round(1000 * stats.espera_max, 3),
+            checkouts_lentos=stats.lentos,
+            agotado=stats.agotado,
+        )
+    return out
+
+
+def timeouts_locales(session, statement_ms: int | None = None, lock_ms: int | None = None) -> None:
+    """SET LOCAL para la transacción en curso (solo PostgreSQL; 0 = sin límite).
+
+    Los valores por defecto de cada conexión vienen de DB_STATEMENT_TIMEOUT_MS /
+    DB_LOCK_TIMEOUT_MS; esto permite acotar más un request puntual.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    if statement_ms is not None:
+        session.execute(text(f"SET LOCAL statement_timeout = {int(statement_ms)}"))
+    if lock_ms is not None:
+        session.execute(text(f"SET LOCAL lock_timeout = {int(lock_ms)}"))
+
+
+def es_bloqueo(err: exc.DBAPIError) -> bool:
+    """True si el error es un lock_timeout de PostgreSQL (SQLSTATE 55P03)."""
+    return getattr(getattr(err, "orig", None), "sqlstate", None) == "55P03"
@@ -0,0 +1,50 @@
+# app/services/estado_animal.py
+from sqlalchemy import select, func, update
+from .. import db
+from ..models import Animal, HistorialEstado
+
+
+def _ultimo(animal_id):
+    """Subconsultas (estado, fecha) del historial más reciente; correlacionadas si animal_id es columna."""
+    h = HistorialEstado
+    base = (
+        select(h.estado, h.fecha_estado)
+        .where(h.animal_id == animal_id)
+        .order_by(h.fecha_estado.desc(), h.historial_id.desc())
+        .limit(1)
+    )
+    return base.with_only_columns(h.estado).scalar_subquery(), base.with_only_columns(h.fecha_estado).scalar_subquery()
+
+
+def registrar_estado(animal: Animal, estado: str) -> None:
+    """Tras agregar un historial: la entrada nueva siempre es la más reciente.
+
+    CURRENT_TIMESTAMP es el mismo que toma `historial_estado.fecha_estado` en la transacción.
+    """
+    animal.estado_actual = estado
+    animal.estado_actualizado_en = func.current_timestamp()
+
+
+def recalcular(animal: Animal) -> None:
+    """Tras borrar un historial: vuelve a leer el más reciente (una consulta)."""
+    db.session.flush()
+    row = db.session.execute(
+        select(HistorialEstado.estado, HistorialEstado.fecha_estado)
+        .where(HistorialEstado.animal_id == animal.animal_id)
+        .order_by(HistorialEstado.fecha_estado.desc(), HistorialEstado.historial_id.desc())
+        .limit(1)
+    ).first()
+    animal.estado_actual, animal.estado_actualizado_en = row if row else (None, None)
+
+
+def reparar() -> int:
+    """Recalcula la copia para todos los animales que no coinciden (un UPDATE). No hace commit."""
+    estado, fecha = _ultimo(Animal.animal_id)
+    res = db.session.execute(
+        update(Animal)
+        .where(Animal.estado_actual.is_distinct_from(estado)
+               | Animal.estado_actualizado_en.is_distinct_from(fecha))
+        .values(estado_actual=estado, estado_actualizado_en=fecha)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount
@@ -0,0 +1,106 @@
+# app/services/forecast.py
+import threading, time
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import select, func
+from .. import db
+from ..models import Tratamiento, TratamientoInsumo, MovimientoInsumo
+
+VENTANAS = (7, 30, 90)       # días
+VENTANA_BASE = 30            # la que se usa para proyectar
+
+Pronostico = namedtuple("Pronostico", ["consumo", "por_dia", "dias_stock", "dias_vence", "agota_antes"])
+# consumo / por_dia: {ventana: Decimal}; dias_*: int o None
+
+
+class _Consumo:
+    """Consumo aprobado por insumo y día, para los últimos max(VENTANAS) días.
+
+    Se arma con un GROUP BY sobre tratamiento_insumo ⨝ tratamiento y luego se
+    actualiza leyendo solo los movimientos 'Tratamiento' posteriores a `hw`
+    (el último movimiento_id visto). Cada FORECAST_REBUILD_SECONDS se rehace
+    completo, lo que también corrige movimientos que confirmaron fuera de orden.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}   # insumo_id -> {fecha: Decimal}
+        self.hw = None
+        self.built_at = 0.0
+
+    def _add(self, rows):
+        for ins_id, fecha, cant in rows:
+            b = self.buckets.setdefault(ins_id, {})
+            b[fecha] = b.get(fecha, Decimal("0")) + Decimal(str(cant))
+
+    def _rebuild(self, desde: date):
+        ti, t, m = TratamientoInsumo, Tratamiento, MovimientoInsumo
+        # hw en la misma sentencia: misma foto de la BD que la agregación
+        hw = select(func.coalesce(func.max(m.movimiento_id), 0)).scalar_subquery()
+        rows = db.session.execute(
+            select(ti.insumo_id, t.fecha_tratamiento, func.sum(ti.cantidad), hw)
+            .join(t, t.tratamiento_id == ti.tratamiento_id)
+            .where(t.estado == "Aprobado", t.fecha_tratamiento >= desde)
+            .group_by(ti.insumo_id, t.fecha_tratamiento)
+        ).all()
+        self.buckets = {}
+        self._add((r[0], r[1], r[2]) for r in rows)
+        if rows:
+            self.hw = rows[0][3]
+        else:
+            self.hw = db.session.execute(select(hw)).scalar()
+        self.built_at = time.monotonic()
+
+    def _refresh(self):
+        m, t = MovimientoInsumo, Tratamiento
+        rows = db.session.execute(
+            select(m.insumo_id, t.fecha_tratamiento, func.sum(-m.delta), func.max(m.movimiento_id))
+            .join(t, t.tratamiento_id == m.tratamiento_id)
+            .where(m.movimiento_id > self.hw, m.motivo == "Tratamiento")
+            .group_by(m.insumo_id, t.fecha_tratamiento)
+        ).all()
+        if rows:
+            self._add((r[0], r[1], r[2]) for r in rows)
+            self.hw = max(r[3] for r in rows)
+
+    def sumas(self, hoy: date) -> dict:
+        """{insumo_id: {ventana: consumo}} para las ventanas que terminan `hoy`."""
+        desde = hoy - timedelta(days=max(VENTANAS))
+        ttl = current_app.config.get("FORECAST_REBUILD_SECONDS", 900)
+        with self.lock:
+            if self.hw is None or time.monotonic() - self.built_at > ttl:
+                self._rebuild(desde)
+            else:
+                self._refresh()
+            out = {}
+            for ins_id, b in self.buckets.items():
+                tot = dict.fromkeys(VENTANAS, Decimal("0"))
+                for fecha, cant in b.items():
+                    edad = (hoy - fecha).days
+                    for v in VENTANAS:
+                        if 0 <= edad < v:
+                            tot[v] += cant
+                out[ins_id] = tot
+            return out
+
+
+_consumo = _Consumo()
+
+
+def pronostico(insumos, hoy: date | None = None) -> dict:
+    """{insumo_id: Pronostico} para los insumos dados (con stock y vencimiento ya cargados)."""
+    hoy = hoy or date.today()
+    sumas = _consumo.sumas(hoy)
+    out = {}
+    for i in insumos:
+        consumo = sumas.get(i.insumo_id) or dict.fromkeys(VENTANAS, Decimal("0"))
+        por_dia = {v: consumo[v] / v for v in VENTANAS}
+        tasa = por_dia[VENTANA_BASE]
+        stock = i.stock or Decimal("0")
+        dias_stock = int(stock / tasa) if tasa > 0 else None
+        dias_vence = (i.fecha_vencimiento - hoy).days if i.fecha_vencimiento else None
+        agota_antes = dias_stock is not None and (dias_vence is None or dias_stock < dias_vence)
+        out[i.insumo_id] = Pronostico(consumo, por_dia, dias_stock, dias_vence, agota_antes)
+    return out
@@ -0,0 +1,154 @@
+# app/services/images.py
+import tempfile, uuid
+from contextlib import closing
+from flask import current_app
+from PIL import Image, ImageOps
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import FotoAnimal
+from .background import submit
+from .storage import get_storage
+
+# nombre -> ancho máximo en px
+RENDITIONS = {"sm": 320, "md": 1024}
+ORIGINAL_MAX = 2048
+WEBP_QUALITY = 80
+# Prefijo de las claves internas (subidas sin procesar, _cuarentena/): /media/ no las sirve
+INTERNO = "_"
+
+
+def clave_subida(animal_id: int, ext: str) -> str:
+    """Clave del archivo recién subido, aún con sus metadatos: animal/1/_abc.jpg"""
+    return f"animal/{animal_id}/{INTERNO}{uuid.uuid4().hex}.{ext}"
+
+
+def es_interna(key: str) -> bool:
+    """True si algún segmento de `key` empieza con INTERNO."""
+    return any(p.startswith(INTERNO) for p in key.split("/"))
+
+
+def rendition_name(filename: str, size: str) -> str:
+    """animal/1/abc.jpg -> animal/1/abc_md.webp"""
+    base = filename.rsplit(".", 1)[0]
+    return f"{base}_{size}.webp"
+
+
+def all_files(filename: str):
+    """Original más todas sus variantes (claves del almacenamiento)."""
+    return [filename] + [rendition_name(filename, s) for s in RENDITIONS]
+
+
+def borrar_archivos(filenames) -> int:
+    """Borra originales y variantes de `filenames`; devuelve cuántos archivos borró."""
+    storage = get_storage()
+    n = 0
+    for filename in filenames:
+        for rel in all_files(filename):
+            try:
+                n += storage.delete(rel)
+            except Exception:
+                # lo que quede lo recoge `flask uploads-gc`
+                current_app.logger.warning("No se pudo borrar %s", rel, exc_info=True)
+    return n
+
+
+def borrar_tras_commit(filenames) -> None:
+    """Programa el borrado de los archivos para cuando confirme la transacción actual.
+
+    Si la transacción se revierte, los archivos quedan: nunca hay filas que
+    apunten a archivos ya borrados.
+    """
+    db.session.info.setdefault("archivos_por_borrar", []).extend(filenames)
+
+
+@event.listens_for(Session, "after_commit")
+def _borrar_pendientes(session):
+    filenames = session.info.pop("archivos_por_borrar", None)
+    if filenames:
+        submit(borrar_archivos, filenames)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    session.info.pop("archivos_por_borrar", None)
+
+
+def _guardar(img: Image.Image, key: str, **params) -> None:
+    """Codifica en un temporal (en memoria hasta 1 MB) y lo sube al almacenamiento."""
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as tmp:
+        img.save(tmp, **params)
+        tmp.seek(0)
+        get_storage().save(key, tmp)
+
+
+def _save_params(fmt: str) -> dict:
+    fmt = (fmt or "").upper()
+    if fmt in ("JPEG", "JPG"):
+        return {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True}
+    if fmt == "WEBP":
+        return {"format": "WEBP", "quality": WEBP_QUALITY, "method": 4}
+    if fmt == "PNG":
+        return {"format": "PNG", "optimize": True}
+    return {"format": fmt}
+
+
+def process_upload(foto_id: int) -> None:
+    """Genera las variantes de una FotoAnimal y limpia el original.
+
+    - Aplica la orientación EXIF y re-codifica el original sin metadatos (GPS, cámara),
+      limitado a ORIGINAL_MAX px, con un nombre nuevo: cada URL de /media/ apunta
+      siempre al mismo contenido y puede cachearse como inmutable.
+    - Crea variantes WebP (`_sm`, `_md`) para `srcset`.
+    - Los GIF animados conservan su contenido, copiado a un nombre público.
+
+    Hasta que termina, la foto no se sirve (ver `clave_subida` y media.foto_src).
+    """
+    f = db.session.get(FotoAnimal, foto_id)
+    if not f or f.procesada:
+        return
+    storage = get_storage()
+    old_rel = f.filename
+    subdir, name = old_rel.rsplit("/", 1)
+    new_rel = f"{subdir}/{uuid.uuid4().hex}.{name.rsplit('.', 1)[-1]}"
+    written = []
+
+    try:
+        with storage.local(old_rel) as src, Image.open(src) as im:
+            fmt = im.format
+            animated = getattr(im, "is_animated", False)
+            icc = im.info.get("icc_profile")
+            im = ImageOps.exif_transpose(im)
+            if im.mode not in ("RGB", "RGBA", "L"):
+                im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("P", "LA") else "RGB")
+
+            if animated:
+                # se copia tal cual: re-codificarlo perdería cuadros o la paleta
+                written.append(new_rel)
+                with closing(storage.open(old_rel)) as stream:
+                    storage.save(new_rel, stream)
+            else:
+                orig = im.copy()
+                orig.thumbnail((ORIGINAL_MAX, ORIGINAL_MAX), Image.LANCZOS)
+                if fmt == "JPEG" and orig.mode == "RGBA":
+                    orig = orig.convert("RGB")
+                # sin exif=: el archivo servido ya no lleva metadatos (solo el perfil de color)
+                written.append(new_rel)
+                _guardar(orig, new_rel, icc_profile=icc, **_save_params(fmt))
+
+            for size, width in RENDITIONS.items():
+                r = im.copy()
+                r.thumbnail((width, width * 4), Image.LANCZOS)
+                written.append(rendition_name(new_rel, size))
+                _guardar(r, written[-1], icc_profile=icc, **_save_params("WEBP"))
+
+        f.filename = new_rel
+        f.procesada = True
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for key in written:
+            storage.delete(key)
+        raise
+
+    storage.delete(old_rel)
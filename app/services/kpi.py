@@ -0,0 +1,138 @@
+# app/services/kpi.py
+import threading
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import select, func, delete
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import Animal, Ubicacion, Tratamiento, Insumo, KpiResumen
+from .background import submit
+from .stock import por_vencer
+
+_refrescando = threading.Lock()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _conteos(grupo, rows):
+    """rows = [(clave, n)] -> filas ordenadas de mayor a menor."""
+    rows = sorted(rows, key=lambda r: (-r[1], r[0]))
+    return [(grupo, str(clave)[:150], Decimal(n), k) for k, (clave, n) in enumerate(rows)]
+
+
+def _filas(hoy: date) -> list:
+    cfg = current_app.config
+    ex = db.session.execute
+    filas = []
+
+    # NULL se rotula aquí: un coalesce con parámetro en SELECT y GROUP BY son dos
+    # expresiones distintas para PostgreSQL
+    filas += _conteos("estado", [
+        (estado or "Sin estado", n) for estado, n in
+        ex(select(Animal.estado_actual, func.count()).group_by(Animal.estado_actual))
+    ])
+    filas += _conteos("especie", ex(
+        select(Animal.especie, func.count()).group_by(Animal.especie)
+    ).all())
+    ubic = ex(
+        select(Ubicacion.comuna, Ubicacion.nombre_sector, func.count(Animal.animal_id))
+        .select_from(Animal).outerjoin(Ubicacion, Ubicacion.ubicacion_id == Animal.ubicacion_id)
+        .group_by(Ubicacion.comuna, Ubicacion.nombre_sector)
+    ).all()
+    filas += _conteos("ubicacion", [
+        (f"{c} — {s}" if c else "Sin ubicación", n) for c, s, n in ubic
+    ])
+
+    # Tratamientos por semana (lunes) y estado: se agrupa por día en SQL y por semana aquí,
+    # así funciona igual en PostgreSQL y SQLite (sin date_trunc)
+    semanas = cfg.get("KPI_SEMANAS", 8)
+    lunes = hoy - timedelta(days=hoy.weekday())
+    desde = lunes - timedelta(weeks=semanas - 1)
+    por_semana = {}
+    for fecha, estado, n in ex(
+        select(Tratamiento.fecha_tratamiento, Tratamiento.estado, func.count())
+        .where(Tratamiento.fecha_tratamiento >= desde, Tratamiento.estado.in_(("Pendiente", "Aprobado")))
+        .group_by(Tratamiento.fecha_tratamiento, Tratamiento.estado)
+    ):
+        semana = fecha - timedelta(days=fecha.weekday())
+        por_semana[(estado, semana)] = por_semana.get((estado, semana), 0) + n
+    for k in range(semanas):
+        semana = desde + timedelta(weeks=k)
+        for estado, grupo in (("Pendiente", "trat_pendiente"), ("Aprobado", "trat_aprobado")):
+            filas.append((grupo, semana.isoformat(), Decimal(por_semana.get((estado, semana), 0)), k))
+
+    bajos = ex(
+        select(Insumo.nombre, Insumo.unidad, Insumo.stock)
+        .where(Insumo.stock <= cfg.get("KPI_STOCK_BAJO", 5))
+        .order_by(Insumo.stock, Insumo.nombre).limit(20)
+    ).all()
+    filas += [("stock_bajo", f"{nom} ({uni})"[:150], stock, k) for k, (nom, uni, stock) in enumerate(bajos)]
+
+    vencen = por_vencer(cfg.get("LOTES_AVISO_DIAS", 30), hoy=hoy, limit=20)
+    filas += [
+        ("por_vencer", f"{ins.nombre} · {l.fecha_vencimiento.isoformat()} · lote #{l.lote_id}"[:150], l.cantidad, k)
+        for k, (l, ins) in enumerate(vencen)
+    ]
+    return filas
+
+
+def refrescar(hoy: date | None = None) -> int:
+    """Reescribe kpi_resumen en una transacción; devuelve cuántas filas quedaron."""
+    filas = _filas(hoy or date.today())
+    ahora = _utcnow()
+    db.session.execute(delete(KpiResumen))
+    db.session.add_all(
+        KpiResumen(grupo=g, clave=c, valor=v, orden=o, actualizado_en=ahora) for g, c, v, o in filas
+    )
+    db.session.commit()
+    return len(filas)
+
+
+def _refrescar_en_fondo() -> None:
+    if not _refrescando.acquire(blocking=False):
+        return
+    try:
+        refrescar()
+    except IntegrityError:
+        # otro worker refrescó al mismo tiempo; su resultado es igual de válido
+        db.session.rollback()
+    finally:
+        _refrescando.release()
+
+
+def leer():
+    """({grupo: [(clave, valor)]}, actualizado_en) desde kpi_resumen (una consulta)."""
+    datos, ts = {}, None
+    for r in db.session.execute(
+        select(KpiResumen).order_by(KpiResumen.grupo, KpiResumen.orden, KpiResumen.clave)
+    ).scalars():
+        datos.setdefault(r.grupo, []).append((r.clave, r.valor))
+        ts = r.actualizado_en if ts is None or r.actualizado_en > ts else ts
+    return datos, ts
+
+
+def _agrupar(filas) -> dict:
+    """Mismo formato que `leer`, a partir de las filas de `_filas`."""
+    datos = {}
+    for g, c, v, _ in sorted(filas, key=lambda f: (f[0], f[3], f[1])):
+        datos.setdefault(g, []).append((c, v))
+    return datos
+
+
+def panel():
+    """Lee el resumen; si está vencido lo refresca en segundo plano y devuelve el anterior."""
+    datos, ts = leer()
+    if ts is None:
+        # Tabla vacía (primer uso): se calcula en vivo sin escribir; la escritura va al
+        # fondo, donde un refresco simultáneo de otro worker se descarta sin error
+        datos, ts = _agrupar(_filas(date.today())), _utcnow()
+        if not _refrescando.locked():
+            submit(_refrescar_en_fondo)
+        return datos, ts
+    if (_utcnow() - ts).total_seconds() > current_app.config.get("KPI_REFRESH_SECONDS", 300) \
+            and not _refrescando.locked():
+        submit(_refrescar_en_fondo)
+    return datos, ts
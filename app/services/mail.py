@@ -1,9 +1,95 @@
 # app/services/mail.py
-import os, base64, json, time, smtplib, requests
+import os, base64, json, time, smtplib, threading, requests
 from email.message import EmailMessage
 from flask import current_app
 
+
+def _build_message(sender: str, to: str, subject: str, body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg
+
+
 # ---------- SMTP (para local) ----------
+class SmtpTransport:
+    """Mantiene una conexión SMTP abierta por proceso y la reutiliza entre envíos.
+
+    Antes de reutilizarla comprueba con NOOP si sigue viva. Solo si una conexión
+    reutilizada resulta cerrada por el servidor (SMTPServerDisconnected) se reconecta
+    y reintenta una vez; las respuestas 4xx/5xx y los timeouts se propagan sin
+    reenviar, para no duplicar un mensaje que el servidor quizá ya aceptó.
+    """
+
+    def __init__(self, server, port, use_tls, user, pwd, max_idle=60, timeout=20):
+        self.server, self.port, self.use_tls = server, port, use_tls
+        self.user, self.pwd = user, pwd
+        self.max_idle, self.timeout = max_idle, timeout
+        self._conn = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        s = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.use_tls: s.starttls()
+        if self.user and self.pwd: s.login(self.user, self.pwd)
+        return s
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except Exception:
+                pass
+        self._conn = None
+
+    def _alive(self) -> bool:
+        if self._conn is None:
+            return False
+        if time.monotonic() - self._last_used > self.max_idle:
+            return False
+        try:
+            return self._conn.noop()[0] == 250
+        except smtplib.SMTPServerDisconnected:
+            return False
+        except smtplib.SMTPException:
+            raise
+        except OSError:  # socket roto (reset, timeout, TLS): se descarta la conexión
+            return False
+
+    def _enviar(self, msg: EmailMessage) -> None:
+        try:
+            self._conn.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._close()
+            raise
+        except smtplib.SMTPException:
+            # respuesta 4xx/5xx: sendmail ya hizo RSET y la conexión sigue usable
+            self._last_used = time.monotonic()
+            raise
+        except OSError:
+            self._close()
+            raise
+        self._last_used = time.monotonic()
+
+    def send(self, msg: EmailMessage) -> None:
+        with self._lock:
+            reutilizada = self._alive()
+            if not reutilizada:
+                self._close()
+                self._conn = self._connect()
+            try:
+                self._enviar(msg)
+            except smtplib.SMTPServerDisconnected:
+                if not reutilizada:
+                    raise
+                # el servidor cerró la conexión entre el NOOP y el envío
+                self._conn = self._connect()
+                self._enviar(msg)
+
+
 def _send_via_smtp(to: str, subject: str, body: str) -> None:
     server  = current_app.config.get("MAIL_SERVER", "smtp.gmail.com")
     port    = int(current_app.config.get("MAIL_PORT", 587))
@@ -16,65 +102,103 @@ def _send_via_smtp(to: str, subject: str, body: str) -> None:
         print(f"[EMAIL MOCK]\nFROM: {sender}\nTO: {to}\nSUBJECT: {subject}\n\n{body}")
         return
 
-    msg = EmailMessage()
-    msg["From"] = sender
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.set_content(body)
+    max_idle = int(current_app.config.get("MAIL_SMTP_MAX_IDLE", 60))
+    transport = _get_transport(("smtp", server, port, use_tls, user, pwd),
+                               lambda: SmtpTransport(server, port, use_tls, user, pwd, max_idle=max_idle))
+    transport.send(_build_message(sender, to, subject, body))
 
-    with smtplib.SMTP(server, port, timeout=20) as s:
-        if use_tls: s.starttls()
-        if user and pwd: s.login(user, pwd)
-        s.send_message(msg)
 
 # ---------- Gmail API (para Render) ----------
-def _gmail_get_access_token(client_id: str, client_secret: str, refresh_token: str) -> str:
-    r = requests.post(
-        "https://oauth2.googleapis.com/token",
-        data={
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token",
-        },
-        timeout=20,
-    )
-    if r.status_code != 200:
-        raise RuntimeError(f"Gmail token error {r.status_code}: {r.text}")
-    return r.json()["access_token"]
+class GmailApiTransport:
+    """Envía por la API de Gmail reutilizando una `requests.Session` (keep-alive)
+    y cacheando el access token hasta poco antes de su `expires_in`."""
+
+    TOKEN_URL = "https://oauth2.googleapis.com/token"
+    SEND_URL = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
+    EXPIRY_MARGIN = 60  # segundos
+
+    def __init__(self, client_id: str, client_secret: str, refresh_token: str):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.http = requests.Session()
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> str:
+        r = self.http.post(
+            self.TOKEN_URL,
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "refresh_token": self.refresh_token,
+                "grant_type": "refresh_token",
+            },
+            timeout=20,
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"Gmail token error {r.status_code}: {r.text}")
+        data = r.json()
+        self._token = data["access_token"]
+        self._expires_at = time.monotonic() + int(data.get("expires_in", 3600)) - self.EXPIRY_MARGIN
+        return self._token
+
+    def access_token(self, force: bool = False) -> str:
+        with self._lock:
+            if force or not self._token or time.monotonic() >= self._expires_at:
+                return self._refresh()
+            return self._token
+
+    def send(self, msg: EmailMessage) -> None:
+        raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
+        payload = json.dumps({"raw": raw})
+        for intento in (1, 2):
+            r = self.http.post(
+                self.SEND_URL,
+                headers={"Authorization": f"Bearer {self.access_token(force=intento == 2)}",
+                         "Content-Type": "application/json"},
+                data=payload,
+                timeout=20,
+            )
+            # 401: token revocado o expirado antes de lo previsto -> se renueva una vez
+            if r.status_code == 401 and intento == 1:
+                continue
+            if r.status_code not in (200, 202):
+                raise RuntimeError(f"Gmail send error {r.status_code}: {r.text}")
+            return
+
 
 def _send_via_gmail_api(to: str, subject: str, body: str) -> None:
     # Requiere vars de entorno y que el remitente esté en esa cuenta de Gmail
     client_id     = os.getenv("GOOGLE_CLIENT_ID")
     client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
     refresh_token = os.getenv("GMAIL_REFRESH_TOKEN")
-    sender        = current_app.config.get("MAIL_DEFAULT_SENDER") 
+    sender        = current_app.config.get("MAIL_DEFAULT_SENDER")
 
     if not (client_id and client_secret and refresh_token and sender):
         raise RuntimeError("Faltan GOOGLE_CLIENT_ID/SECRET, GMAIL_REFRESH_TOKEN o MAIL_DEFAULT_SENDER")
 
-    access_token = _gmail_get_access_token(client_id, client_secret, refresh_token)
+    transport = _get_transport(("gmail_api", client_id, client_secret, refresh_token),
+                               lambda: GmailApiTransport(client_id, client_secret, refresh_token))
+    transport.send(_build_message(sender, to, subject, body))
 
-    # Construye el MIME y codifícalo en base64url (raw)
-    msg = EmailMessage()
-    msg["From"] = sender
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.set_content(body)
-    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
 
-    r = requests.post(
-        "https://gmail.googleapis.com/gmail/v1/users/me/messages/send",
-        headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
-        data=json.dumps({"raw": raw}),
-        timeout=20,
-    )
-    if r.status_code not in (200, 202):
-        raise RuntimeError(f"Gmail send error {r.status_code}: {r.text}")
+# ---------- Transportes compartidos por proceso ----------
+_transports = {}
+_transports_lock = threading.Lock()
+
+def _get_transport(key, factory):
+    """Un transporte por configuración: si cambian credenciales o servidor se crea otro."""
+    with _transports_lock:
+        t = _transports.get(key)
+        if t is None:
+            t = _transports[key] = factory()
+        return t
+
 
 def send_email(to: str, subject: str, body: str) -> None:
     transport = (current_app.config.get("MAIL_TRANSPORT") or os.getenv("MAIL_TRANSPORT") or "smtp").lower()
     if transport == "gmail_api":
         return _send_via_gmail_api(to, subject, body)
     return _send_via_smtp(to, subject, body)
-
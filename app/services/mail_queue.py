@@ -0,0 +1,150 @@
+# app/services/mail_queue.py
+import threading
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import CorreoSaliente
+from .mail import send_email
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_email(to: str, subject: str, body: str) -> None:
+    """Encola el correo en la sesión actual; el worker lo envía tras el commit del request."""
+    db.session.add(CorreoSaliente(
+        destinatario=to, asunto=subject, cuerpo=body,
+        estado="Pendiente", intentos=0, proximo_intento=_utcnow(),
+    ))
+    db.session.info["mail_queue_kick"] = True
+
+
+def _backoff(intentos: int) -> timedelta:
+    base = current_app.config.get("MAIL_RETRY_BASE_SECONDS", 30)
+    tope = current_app.config.get("MAIL_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(tope, base * (2 ** max(0, intentos - 1))))
+
+
+def _claim_next():
+    """Reserva el siguiente correo vencido en una transacción corta.
+
+    La reserva es un arriendo: `proximo_intento` se corre MAIL_SEND_LEASE_SECONDS
+    y se confirma, así el envío SMTP ocurre sin transacción ni conexión tomada.
+    Si el proceso muere a mitad del envío, el correo vuelve a vencer y se reintenta.
+    Devuelve (correo_id, destinatario, asunto, cuerpo) o None.
+    """
+    ahora = _utcnow()
+    stmt = (
+        select(CorreoSaliente)
+        .where(CorreoSaliente.estado == "Pendiente", CorreoSaliente.proximo_intento <= ahora)
+        .order_by(CorreoSaliente.proximo_intento, CorreoSaliente.correo_id)
+        .limit(1)
+        # SKIP LOCKED: varios workers de gunicorn pueden reservar a la vez sin chocar
+        .with_for_update(skip_locked=True)
+    )
+    c = db.session.execute(stmt).scalars().first()
+    if c is None:
+        db.session.rollback()
+        return None
+    datos = (c.correo_id, c.destinatario, c.asunto, c.cuerpo)
+    c.proximo_intento = ahora + timedelta(seconds=current_app.config.get("MAIL_SEND_LEASE_SECONDS", 300))
+    db.session.commit()
+    return datos
+
+
+def _registrar(correo_id: int, error: Exception | None, max_intentos: int) -> None:
+    """Anota el resultado del envío en otra transacción corta."""
+    c = db.session.get(CorreoSaliente, correo_id)
+    if c is None or c.estado != "Pendiente":
+        db.session.rollback()
+        return
+    c.intentos += 1
+    if error is not None:
+        c.ultimo_error = f"{type(error).__name__}: {error}"[:2000]
+        if c.intentos >= max_intentos:
+            c.estado = "Fallido"
+            current_app.logger.error("Correo %s descartado tras %s intentos: %s",
+                                     c.correo_id, c.intentos, c.ultimo_error)
+        else:
+            c.proximo_intento = _utcnow() + _backoff(c.intentos)
+    else:
+        c.estado = "Enviado"
+        c.enviado_en = _utcnow()
+        c.cuerpo = ""  # no guardar contraseñas temporales ni enlaces de reseteo
+        c.ultimo_error = None
+    db.session.commit()
+
+
+def deliver_pending(limit: int | None = None) -> int:
+    """Entrega hasta `limit` correos vencidos; devuelve cuántos se enviaron."""
+    limit = limit or current_app.config.get("MAIL_QUEUE_BATCH", 20)
+    max_intentos = current_app.config.get("MAIL_MAX_ATTEMPTS", 6)
+    enviados = 0
+    for _ in range(limit):
+        reserva = _claim_next()
+        if reserva is None:
+            break
+        correo_id, destinatario, asunto, cuerpo = reserva
+        try:
+            send_email(destinatario, asunto, cuerpo)
+        except Exception as e:
+            _registrar(correo_id, e, max_intentos)
+        else:
+            _registrar(correo_id, None, max_intentos)
+            enviados += 1
+    return enviados
+
+
+def kick() -> None:
+    _wake.set()
+
+
+def _worker_loop(app) -> None:
+    poll = app.config.get("MAIL_QUEUE_POLL_SECONDS", 30)
+    while True:
+        _wake.wait(timeout=poll)
+        _wake.clear()
+        with app.app_context():
+            try:
+                while deliver_pending():
+                    pass
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Error en el worker de correo")
+
+
+def start_worker(app) -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_worker_loop, args=(app,), name="patitas-mail", daemon=True)
+        _worker.start()
+
+
+def init_app(app) -> None:
+    """Arranca el worker en el primer request (no en `flask db ...` ni otros comandos)."""
+    if not app.config.get("MAIL_QUEUE_WORKER", True):
+        return
+
+    @app.before_request
+    def _ensure_mail_worker():
+        if _worker is None or not _worker.is_alive():
+            start_worker(app)
+
+
+@event.listens_for(Session, "after_commit")
+def _kick_after_commit(session):
+    if session.info.pop("mail_queue_kick", False):
+        kick()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_kick(session):
+    session.info.pop("mail_queue_kick", None)
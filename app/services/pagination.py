@@ -0,0 +1,101 @@
+# app/services/pagination.py
+import base64, json
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from flask import abort, current_app, request
+from sqlalchemy import and_, or_
+
+Page = namedtuple("Page", ["items", "next_after", "first"])
+
+def _encode_cursor(values) -> str:
+    # default=str: Decimal/fecha viajan como texto y `_coerce` los reconstruye
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _coerce(col, value):
+    """`value` con el tipo Python de `col`; ValueError si no corresponde."""
+    if value is None:
+        return None
+    try:
+        py = col.type.python_type
+    except NotImplementedError:
+        return value
+    if py is bool or py is int:
+        if type(value) is not py:
+            raise ValueError(value)
+        return value
+    if py is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(value)
+        return float(value)
+    if py is str:
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return value
+    if py is Decimal:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(value)
+        try:
+            return Decimal(str(value))
+        except InvalidOperation as e:
+            raise ValueError(value) from e
+    if py in (date, datetime):
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return py.fromisoformat(value)
+    return value
+
+def _decode_cursor(token: str, keys):
+    """Valores del cursor con el tipo de cada columna clave, o None si no es válido
+    (así un cursor manipulado no llega a la BD como DataError)."""
+    try:
+        pad = "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + pad))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(keys):
+        return None
+    try:
+        return [_coerce(col, v) for (col, _), v in zip(keys, values)]
+    except (ValueError, TypeError):
+        return None
+
+def _after(keys, values):
+    # (c1, c2, ..., cn) > (v1, v2, ..., vn) respetando la dirección de cada columna
+    conds = []
+    for i, (col, desc) in enumerate(keys):
+        eq = [keys[j][0] == values[j] for j in range(i)]
+        cmp = col < values[i] if desc else col > values[i]
+        conds.append(and_(*eq, cmp))
+    return or_(*conds)
+
+def page_size() -> int:
+    default = int(current_app.config.get("PAGE_SIZE", 50))
+    maximo = int(current_app.config.get("PAGE_SIZE_MAX", 200))
+    size = request.args.get("size", type=int) or default
+    return max(1, min(size, maximo))
+
+def keyset_page(qry, keys, after: str | None = None, size: int | None = None) -> Page:
+    """Pagina `qry` por cursor sobre `keys` = [(columna, desc), ...].
+
+    Las columnas pueden ser expresiones etiquetadas; la última debe ser única (PK)
+    para que el orden sea total. Un `after` ilegible o con valores que no
+    calzan con el tipo de las claves responde 400.
+    """
+    size = size or page_size()
+    values = _decode_cursor(after, keys) if after else None
+    if after and values is None:
+        abort(400, "Cursor de paginación inválido")
+    if values is not None:
+        qry = qry.filter(_after(keys, values))
+    # Las claves se seleccionan junto a la entidad: así también sirven expresiones (p. ej. ranking)
+    qry = qry.add_columns(*[col for col, _ in keys])
+    qry = qry.order_by(*[col.desc() if desc else col.asc() for col, desc in keys])
+    rows = qry.limit(size + 1).all()
+
+    next_after = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_after = _encode_cursor(list(rows[-1][1:]))
+    return Page(items=[r[0] for r in rows], next_after=next_after, first=values is None)
@@ -0,0 +1,73 @@
+# app/services/public_cache.py
+import hashlib, threading
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..models import Animal, Tratamiento, HistorialEstado, FotoAnimal, Ubicacion
+from .cache import TTLCache
+
+# Ficha pública renderizada (solo visitas anónimas), por token del QR
+_fichas = TTLCache(maxsize=2048, ttl=300)
+_token_por_animal = {}
+_lock = threading.Lock()
+
+
+class FichaCacheada:
+    __slots__ = ("html", "etag", "animal_id")
+
+    def __init__(self, html: str, animal_id: int):
+        self.html = html
+        self.animal_id = animal_id
+        self.etag = hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+def get_ficha(token: str):
+    return _fichas.get(token)
+
+
+def set_ficha(token: str, animal_id: int, html: str, ttl: float | None = None) -> FichaCacheada:
+    entry = FichaCacheada(html, animal_id)
+    _fichas.set(token, entry, ttl=ttl)
+    with _lock:
+        _token_por_animal[animal_id] = token
+    return entry
+
+
+def invalidate_animal(animal_id: int) -> None:
+    with _lock:
+        token = _token_por_animal.pop(animal_id, None)
+    if token:
+        _fichas.pop(token)
+
+
+def invalidate_all() -> None:
+    with _lock:
+        _token_por_animal.clear()
+    _fichas.clear()
+
+
+# --- Invalidación automática al confirmar cambios que se ven en la ficha ---
+_FICHA_MODELS = (Tratamiento, HistorialEstado, FotoAnimal)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault("ficha_animal_ids", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Animal):
+            pending.add(obj.animal_id)
+        elif isinstance(obj, _FICHA_MODELS):
+            pending.add(obj.animal_id)
+        elif isinstance(obj, Ubicacion):
+            session.info["ficha_invalidate_all"] = True
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidation(session):
+    if session.info.pop("ficha_invalidate_all", False):
+        invalidate_all()
+    for animal_id in session.info.pop("ficha_animal_ids", ()):
+        invalidate_animal(animal_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("ficha_animal_ids", None)
+    session.info.pop("ficha_invalidate_all", None)
@@ -0,0 +1,49 @@
+# app/services/qr.py
+import hashlib, io, os, tempfile
+import qrcode
+from flask import current_app
+
+def qr_public_url(token: str) -> str:
+    base = current_app.config.get("QR_PUBLIC_BASE_URL", "http://localhost:5000")
+    return f"{base}/p/{token}"
+
+def qr_key(token: str) -> str:
+    """Clave de contenido: el PNG depende solo de la URL pública (base + token)."""
+    return hashlib.sha256(qr_public_url(token).encode("utf-8")).hexdigest()
+
+def qr_cache_dir() -> str:
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], "qr")
+
+def qr_cache_path(token: str) -> str:
+    key = qr_key(token)
+    return os.path.join(qr_cache_dir(), key[:2], f"{key}.png")
+
+def render_qr_png(token: str) -> bytes:
+    img = qrcode.make(qr_public_url(token))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def ensure_qr_png(token: str) -> str:
+    """Devuelve la ruta del PNG cacheado, generándolo si no existe.
+
+    Si cambia QR_PUBLIC_BASE_URL cambia la clave, así que los PNG antiguos
+    dejan de usarse sin tener que borrarlos a mano.
+    """
+    path = qr_cache_path(token)
+    if os.path.isfile(path):
+        return path
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    data = render_qr_png(token)
+    # escritura atómica: otro worker puede estar generando el mismo archivo
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
@@ -0,0 +1,153 @@
+# app/services/qr_sheet.py
+import io, os, zipfile
+from concurrent.futures import ProcessPoolExecutor
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+from flask import current_app
+from ..models import Animal
+from .qr import qr_public_url
+
+# Hoja A4 a 200 dpi, imagen de 1 bit (las etiquetas son blanco/negro)
+DPI = 200
+PAGE_W, PAGE_H = 1654, 2339
+MARGIN = 60
+LABEL_H = 36
+
+
+def _cell_size(cols: int, rows: int):
+    return (PAGE_W - 2 * MARGIN) // cols, (PAGE_H - 2 * MARGIN) // rows
+
+
+def _render_tag(job):
+    """Corre en un proceso del pool: no usa current_app ni la BD."""
+    url, label, cell_w, cell_h = job
+    qr = qrcode.QRCode(border=1)
+    qr.add_data(url)
+    qr.make(fit=True)
+    # módulos de tamaño entero en píxeles para que el lector no vea bordes irregulares
+    space = min(cell_w, cell_h - LABEL_H) - 16
+    qr.box_size = max(1, space // (qr.modules_count + 2 * qr.border))
+    img = qr.make_image().get_image().convert("1")
+    side = img.size[0]
+
+    tag = Image.new("1", (cell_w, cell_h), 1)
+    tag.paste(img, ((cell_w - side) // 2, 8))
+    draw = ImageDraw.Draw(tag)
+    font = ImageFont.load_default(size=22)
+    text = label if len(label) <= 40 else label[:39] + "…"
+    tw = draw.textlength(text, font=font)
+    draw.text(((cell_w - tw) / 2, side + 14), text, fill=0, font=font)
+    draw.rectangle([0, 0, cell_w - 1, cell_h - 1], outline=0)
+    return tag.tobytes()
+
+
+def _tag_label(animal) -> str:
+    nombre = animal.nombre or animal.especie
+    return f"#{animal.animal_id} · {nombre}"
+
+
+def iter_sheet_pages(animales, cols: int | None = None, rows: int | None = None, workers: int | None = None):
+    """Genera las páginas (PIL.Image) con una grilla de etiquetas QR.
+
+    Los QR se codifican en un pool de procesos; las páginas se componen en orden
+    a medida que llegan los resultados, sin esperar al lote completo.
+    """
+    cols = cols or current_app.config.get("QR_SHEET_COLS", 4)
+    rows = rows or current_app.config.get("QR_SHEET_ROWS", 6)
+    workers = workers or current_app.config.get("QR_SHEET_WORKERS") or os.cpu_count() or 1
+    cell_w, cell_h = _cell_size(cols, rows)
+    per_page = cols * rows
+
+    jobs = [(qr_public_url(a.codigo_qr), _tag_label(a), cell_w, cell_h) for a in animales]
+    if not jobs:
+        return
+
+    def _compose(tiles):
+        page = Image.new("1", (PAGE_W, PAGE_H), 1)
+        for n, raw in enumerate(tiles):
+            r, c = divmod(n, cols)
+            tile = Image.frombytes("1", (cell_w, cell_h), raw)
+            page.paste(tile, (MARGIN + c * cell_w, MARGIN + r * cell_h))
+        return page
+
+    def _pages(results):
+        tiles = []
+        for raw in results:
+            tiles.append(raw)
+            if len(tiles) == per_page:
+                yield _compose(tiles)
+                tiles = []
+        if tiles:
+            yield _compose(tiles)
+
+    if workers <= 1 or len(jobs) < per_page:
+        yield from _pages(map(_render_tag, jobs))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _pages(pool.map(_render_tag, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def write_sheet_pdf(animales, fp, **kw) -> int:
+    """Escribe el PDF en `fp` hoja por hoja; devuelve el número de páginas.
+
+    Cada hoja se agrega con el modo `append` de Pillow apenas se compone, así nunca
+    hay más de una en memoria. `fp` debe ser un archivo real abierto en "w+b"
+    (Pillow relee el PDF para agregar páginas).
+    """
+    n = 0
+    for page in iter_sheet_pages(animales, **kw):
+        page.save(fp, format="PDF", resolution=DPI, append=n > 0)
+        n += 1
+    if n == 0:
+        Image.new("1", (PAGE_W, PAGE_H), 1).save(fp, format="PDF", resolution=DPI)
+        n = 1
+    return n
+
+
+class _ChunkSink:
+    """Destino no buscable para zipfile: acumula bytes que el generador va entregando."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks = []
+        return out
+
+
+def iter_sheet_zip(animales, **kw):
+    """ZIP con una PNG por hoja, emitido página a página (para respuestas en streaming)."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for n, page in enumerate(iter_sheet_pages(animales, **kw), start=1):
+            buf = io.BytesIO()
+            page.save(buf, format="PNG", optimize=True, dpi=(DPI, DPI))
+            zf.writestr(f"hoja_qr_{n:03d}.png", buf.getvalue())
+            yield sink.drain()
+    yield sink.drain()
+
+
+def select_animales(ubicacion_id=None, desde=None, hasta=None, ids=None, limit=None):
+    """Animales a imprimir según ubicación, rango de fecha_registro o ids explícitos."""
+    qry = Animal.query.with_entities(Animal.animal_id, Animal.nombre, Animal.especie, Animal.codigo_qr)
+    if ids:
+        qry = qry.filter(Animal.animal_id.in_(ids))
+    if ubicacion_id:
+        qry = qry.filter(Animal.ubicacion_id == ubicacion_id)
+    if desde:
+        qry = qry.filter(Animal.fecha_registro >= desde)
+    if hasta:
+        qry = qry.filter(Animal.fecha_registro <= hasta)
+    qry = qry.order_by(Animal.animal_id.asc())
+    if limit:
+        qry = qry.limit(limit)
+    return qry.all()
@@ -0,0 +1,144 @@
+# app/services/recordatorios.py
+import threading, time
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import select, exists, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from .. import db
+from ..models import Animal, HistorialEstado, RecordatorioControl, Usuario
+from .mail_queue import enqueue_email
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def pendientes(hoy: date) -> list:
+    """Controles a avisar: el último historial de cada animal con `proximo_control`
+    dentro de [hoy - RECORDATORIOS_VENCIDOS_DIAS, hoy + RECORDATORIOS_DIAS] y sin
+    recordatorio de ese tipo. Devuelve [(HistorialEstado, Animal, tipo)]."""
+    cfg = current_app.config
+    desde = hoy - timedelta(days=cfg.get("RECORDATORIOS_VENCIDOS_DIAS", 30))
+    hasta = hoy + timedelta(days=cfg.get("RECORDATORIOS_DIAS", 3))
+    h, nuevo = HistorialEstado, aliased(HistorialEstado)
+
+    # Rango sobre ix_historial_estado_proximo_control; luego se descartan los
+    # historiales que ya tienen uno posterior del mismo animal
+    posterior = exists().where(
+        nuevo.animal_id == h.animal_id,
+        (nuevo.fecha_estado > h.fecha_estado)
+        | and_(nuevo.fecha_estado == h.fecha_estado, nuevo.historial_id > h.historial_id),
+    )
+    rows = db.session.execute(
+        select(h, Animal)
+        .join(Animal, Animal.animal_id == h.animal_id)
+        .where(h.proximo_control.between(desde, hasta), ~posterior)
+        .order_by(h.proximo_control, h.historial_id)
+    ).all()
+
+    out = []
+    enviados = {
+        (hid, tipo) for hid, tipo in db.session.execute(
+            select(RecordatorioControl.historial_id, RecordatorioControl.tipo)
+            .where(RecordatorioControl.historial_id.in_([r[0].historial_id for r in rows]))
+        )
+    } if rows else set()
+    for hist, animal in rows:
+        tipo = "Vencido" if hist.proximo_control < hoy else "Proximo"
+        if (hist.historial_id, tipo) not in enviados:
+            out.append((hist, animal, tipo))
+    return out
+
+
+def _responsables(items) -> dict:
+    """Agrupa por usuario activo: quien registró el control o, si no, el responsable del animal."""
+    ids = {x for hist, animal, _ in items for x in (hist.usuario_id, animal.usuario_id) if x}
+    activos = {
+        u.usuario_id: u for u in
+        db.session.execute(select(Usuario).where(Usuario.usuario_id.in_(ids), Usuario.activo.is_(True))).scalars()
+    } if ids else {}
+    grupos = {}
+    for hist, animal, tipo in items:
+        u = activos.get(hist.usuario_id) or activos.get(animal.usuario_id)
+        if u is not None:
+            grupos.setdefault(u.usuario_id, (u, []))[1].append((hist, animal, tipo))
+    return grupos
+
+
+def _cuerpo(u: Usuario, items, hoy: date) -> str:
+    base = current_app.config.get("QR_PUBLIC_BASE_URL", "")
+    lineas = []
+    for hist, animal, tipo in items:
+        dias = (hist.proximo_control - hoy).days
+        cuando = (f"vencido hace {-dias} día(s)" if dias < 0
+                  else "hoy" if dias == 0 else f"en {dias} día(s)")
+        lineas.append(
+            f"- #{animal.animal_id} {animal.nombre or 'Sin nombre'} ({animal.especie}): "
+            f"control {hist.proximo_control.strftime('%d-%m-%Y')}, {cuando}\n"
+            f"  {base}/animales/{animal.animal_id}/historial"
+        )
+    return (
+        f"Hola {u.nombre},\n\nEstos animales tienen controles próximos o vencidos:\n\n"
+        + "\n".join(lineas)
+        + "\n\nPatitas QR"
+    )
+
+
+def procesar(hoy: date | None = None) -> int:
+    """Encola un correo resumen por usuario; devuelve cuántos correos se encolaron.
+
+    Cada bloque de RECORDATORIOS_CHUNK usuarios va en una transacción, y cada
+    usuario en su propio savepoint: sus filas de recordatorio_control y su correo
+    se confirman juntos. Si otro worker ya registró alguno, la restricción única
+    revierte solo el savepoint de ese usuario y el resto del bloque sigue.
+    """
+    hoy = hoy or date.today()
+    grupos = list(_responsables(pendientes(hoy)).values())
+    chunk = current_app.config.get("RECORDATORIOS_CHUNK", 50)
+    encolados = 0
+    for k in range(0, len(grupos), chunk):
+        nuevos = 0
+        for u, items in grupos[k:k + chunk]:
+            try:
+                with db.session.begin_nested():
+                    for hist, _, tipo in items:
+                        db.session.add(RecordatorioControl(historial_id=hist.historial_id, usuario_id=u.usuario_id, tipo=tipo))
+                    enqueue_email(u.correo, f"Controles pendientes ({len(items)}) - Patitas QR", _cuerpo(u, items, hoy))
+                nuevos += 1
+            except IntegrityError:
+                current_app.logger.info("Recordatorios: usuario %s ya procesado por otro worker", u.usuario_id)
+        db.session.commit()
+        encolados += nuevos
+    return encolados
+
+
+def _worker_loop(app) -> None:
+    intervalo = app.config.get("RECORDATORIOS_INTERVALO_SECONDS", 3600)
+    while True:
+        with app.app_context():
+            try:
+                procesar()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Error en el worker de recordatorios")
+        time.sleep(intervalo)
+
+
+def start_worker(app) -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_worker_loop, args=(app,), name="patitas-recordatorios", daemon=True)
+        _worker.start()
+
+
+def init_app(app) -> None:
+    """Arranca el planificador en el primer request (no en `flask db ...` ni otros comandos)."""
+    if not app.config.get("RECORDATORIOS_WORKER", True):
+        return
+
+    @app.before_request
+    def _ensure_recordatorios_worker():
+        if _worker is None or not _worker.is_alive():
+            start_worker(app)
@@ -0,0 +1,36 @@
+# app/services/search.py
+from flask import current_app
+from sqlalchemy import Float, cast, func, or_
+from .. import db
+
+def _use_trgm() -> bool:
+    if not current_app.config.get("SEARCH_USE_TRGM", True):
+        return False
+    return db.engine.dialect.name == "postgresql"
+
+def apply_search(qry, columns, q: str):
+    """Filtra `qry` por `q` en `columns` y devuelve (qry, rank).
+
+    En PostgreSQL el ILIKE '%q%' lo resuelven los índices GIN de pg_trgm y `rank`
+    es la mayor similitud trigram entre las columnas (para ordenar por relevancia).
+    En otros motores (SQLite/tests) se mantiene el ILIKE simple y `rank` es None.
+    """
+    q = (q or "").strip()
+    if not q:
+        return qry, None
+    like = f"%{q}%"
+    qry = qry.filter(or_(*[col.ilike(like) for col in columns]))
+    if not _use_trgm():
+        return qry, None
+    # float8 explícito: el valor viaja en el cursor y debe compararse exacto al volver
+    rank = cast(
+        func.greatest(*[func.word_similarity(q, func.coalesce(col, "")) for col in columns]),
+        Float,
+    )
+    return qry, rank
+
+def search_keys(rank, pk, default_keys):
+    """Claves de paginación: por relevancia (y PK) si hay ranking, si no el orden habitual."""
+    if rank is None:
+        return default_keys
+    return [(rank, True), (pk, False)]
@@ -0,0 +1,42 @@
+# app/services/sql_stats.py
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+# El inicio se guarda en el contexto de ejecución de la sentencia, no en la conexión:
+# si la sentencia falla no corre after_cursor_execute y el contexto simplemente se descarta.
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and context is not None:
+        context._sql_stats_t0 = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_sql_stats_t0", None)
+    if not has_request_context() or t0 is None:
+        return
+    dur = time.perf_counter() - t0
+    g.sql_n = g.get("sql_n", 0) + 1
+    g.sql_t = g.get("sql_t", 0.0) + dur
+
+
+def init_app(app, db) -> None:
+    """Modo desarrollo (SQL_STATS=1): cuenta consultas y tiempo de BD por request.
+
+    Se registra en el log, en la cabecera Server-Timing (visible en las devtools
+    del navegador) y como warning cuando se pasa de SQL_STATS_WARN consultas,
+    para que los N+1 salten a la vista.
+    """
+    if not app.config.get("SQL_STATS"):
+        return
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _antes)
+        event.listen(db.engine, "after_cursor_execute", _despues)
+
+    @app.after_request
+    def _sql_stats(resp):
+        n, t = g.get("sql_n", 0), g.get("sql_t", 0.0) * 1000
+        resp.headers["Server-Timing"] = f'db;dur={t:.1f};desc="{n} consultas"'
+        log = app.logger.warning if n > app.config.get("SQL_STATS_WARN", 20) else app.logger.info
+        log("SQL %s %s: %d consultas, %.1f ms", request.method, request.path, n, t)
+        return resp
@@ -0,0 +1,265 @@
+# app/services/stock.py
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from .. import db
+from ..models import Insumo, LoteInsumo, Tratamiento, TratamientoInsumo, MovimientoInsumo
+
+CERO = Decimal("0")
+
+
+def cargar_insumos(ids, lock: bool = False) -> dict:
+    """Trae los insumos en una sola consulta: {insumo_id: Insumo}.
+
+    Con `lock=True` toma FOR UPDATE en orden de insumo_id; todas las rutas que
+    descuentan stock bloquean en el mismo orden, así dos aprobaciones que comparten
+    insumos se serializan en vez de bloquearse mutuamente.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    stmt = select(Insumo).where(Insumo.insumo_id.in_(ids)).order_by(Insumo.insumo_id)
+    if lock:
+        stmt = stmt.with_for_update()
+    return {i.insumo_id: i for i in db.session.execute(stmt).scalars()}
+
+
+def cargar_lotes(insumo_ids) -> dict:
+    """Lotes con saldo en orden FEFO: {insumo_id: [LoteInsumo]}.
+
+    Sin FOR UPDATE: quien modifica lotes ya tiene bloqueado su insumo.
+    """
+    ids = sorted(set(insumo_ids))
+    out = {i: [] for i in ids}
+    if not ids:
+        return out
+    stmt = (
+        select(LoteInsumo)
+        .where(LoteInsumo.insumo_id.in_(ids), LoteInsumo.cantidad > 0)
+        .order_by(LoteInsumo.insumo_id, LoteInsumo.fecha_vencimiento.asc().nulls_last(), LoteInsumo.lote_id)
+    )
+    for l in db.session.execute(stmt).scalars():
+        out[l.insumo_id].append(l)
+    return out
+
+
+def _vigente(lote: LoteInsumo, hoy: date) -> bool:
+    return lote.fecha_vencimiento is None or lote.fecha_vencimiento >= hoy
+
+
+def disponible(lotes, hoy: date | None = None) -> Decimal:
+    """Saldo utilizable (lotes no vencidos)."""
+    hoy = hoy or date.today()
+    return sum((l.cantidad for l in lotes if _vigente(l, hoy)), CERO)
+
+
+def requeridos(detalles) -> dict:
+    """Suma las cantidades por insumo: {insumo_id: Decimal}."""
+    tot = {}
+    for d in detalles:
+        tot[d.insumo_id] = tot.get(d.insumo_id, Decimal("0")) + d.cantidad
+    return tot
+
+
+def faltantes(req: dict, insumos: dict, lotes: dict, hoy: date | None = None) -> list:
+    """Mensajes de lo que impide descontar `req`: insumos inexistentes o sin
+    saldo suficiente en lotes vigentes (los vencidos no cuentan)."""
+    hoy = hoy or date.today()
+    out = []
+    for ins_id in sorted(req):
+        i = insumos.get(ins_id)
+        if not i:
+            out.append(f"Insumo #{ins_id} inexistente")
+            continue
+        ls = lotes.get(ins_id, [])
+        disp = disponible(ls, hoy)
+        if disp < req[ins_id]:
+            vencido = sum((l.cantidad for l in ls if not _vigente(l, hoy)), CERO)
+            extra = f", vencido: {vencido}" if vencido else ""
+            out.append(f"{i.nombre} (disponible: {disp}, requerido: {req[ins_id]}{extra})")
+    return out
+
+
+def registrar(insumo: Insumo, delta, motivo: str, lote=None, usuario_id=None, tratamiento_id=None, nota=None):
+    """Único punto que modifica `Insumo.stock` (y el saldo del lote): aplica `delta`
+    y anota el movimiento. Usar vía `ingresar` / `consumir`.
+
+    El insumo debe venir bloqueado (o ser nuevo) para que `saldo` sea correcto.
+    """
+    delta = Decimal(str(delta))
+    if delta == 0:
+        return None
+    if insumo.stock is None:  # insumo nuevo sin flush: aún no tomó el default
+        insumo.stock = CERO
+    insumo.stock = insumo.stock + delta
+    if lote is not None:
+        lote.cantidad = (lote.cantidad or CERO) + delta
+    m = MovimientoInsumo(
+        insumo=insumo, lote=lote, delta=delta, saldo=insumo.stock, motivo=motivo,
+        usuario_id=usuario_id, tratamiento_id=tratamiento_id, nota=nota,
+    )
+    db.session.add(m)
+    return m
+
+
+def ingresar(insumo: Insumo, cantidad, fecha_vencimiento, motivo: str, **mov):
+    """Crea un lote con `cantidad` y su vencimiento."""
+    cantidad = Decimal(str(cantidad))
+    if cantidad <= 0:
+        return None
+    lote = LoteInsumo(insumo=insumo, cantidad=CERO, fecha_vencimiento=fecha_vencimiento)
+    db.session.add(lote)
+    registrar(insumo, cantidad, motivo, lote=lote, **mov)
+    # Insumo.fecha_vencimiento = el vencimiento más próximo entre lotes con saldo
+    if fecha_vencimiento and (insumo.fecha_vencimiento is None or fecha_vencimiento < insumo.fecha_vencimiento):
+        insumo.fecha_vencimiento = fecha_vencimiento
+    return lote
+
+
+def consumir(insumo: Insumo, cantidad, lotes, motivo: str, hoy: date | None = None,
+             vencidos: bool = False, **mov) -> Decimal:
+    """Descuenta FEFO de `lotes` (los de `cargar_lotes`); devuelve lo que no alcanzó.
+
+    Con `vencidos=True` (ajustes, mermas) también toma de lotes vencidos, primero.
+    """
+    hoy = hoy or date.today()
+    resto = Decimal(str(cantidad))
+    for l in lotes:
+        if resto <= 0:
+            break
+        if l.cantidad <= 0 or not (vencidos or _vigente(l, hoy)):
+            continue
+        toma = min(l.cantidad, resto)
+        registrar(insumo, -toma, motivo, lote=l, **mov)
+        resto -= toma
+    _sincronizar_vencimiento(insumo, lotes)
+    return resto
+
+
+def _sincronizar_vencimiento(insumo: Insumo, lotes) -> None:
+    fechas = [l.fecha_vencimiento for l in lotes if l.cantidad > 0 and l.fecha_vencimiento]
+    insumo.fecha_vencimiento = min(fechas) if fechas else None
+
+
+def fijar_vencimiento(insumo: Insumo, lote: LoteInsumo, fecha, lotes) -> None:
+    """Corrige el vencimiento de `lote` (uno de `lotes`, de `cargar_lotes`) y
+    recalcula el del insumo, que debe venir bloqueado."""
+    lote.fecha_vencimiento = fecha
+    _sincronizar_vencimiento(insumo, lotes)
+
+
+def descontar(req: dict, insumos: dict, lotes: dict, tratamiento_id=None, usuario_id=None) -> None:
+    """Descuenta FEFO sobre insumos ya bloqueados y validados con `faltantes`."""
+    hoy = date.today()
+    for ins_id in sorted(req):
+        consumir(insumos[ins_id], req[ins_id], lotes[ins_id], "Tratamiento", hoy=hoy,
+                 usuario_id=usuario_id, tratamiento_id=tratamiento_id)
+
+
+def por_vencer(dias: int, hoy: date | None = None, limit: int = 50):
+    """Lotes con saldo que vencen en los próximos `dias` (incluye ya vencidos).
+
+    Recorre ix_lote_insumo_vencimiento por rango; devuelve [(LoteInsumo, Insumo)].
+    """
+    hoy = hoy or date.today()
+    return db.session.execute(
+        select(LoteInsumo, Insumo)
+        .join(Insumo, Insumo.insumo_id == LoteInsumo.insumo_id)
+        .where(LoteInsumo.cantidad > 0, LoteInsumo.fecha_vencimiento <= hoy + timedelta(days=dias))
+        .order_by(LoteInsumo.fecha_vencimiento, LoteInsumo.lote_id)
+        .limit(limit)
+    ).all()
+
+
+def movimientos(insumo_id: int, desde=None, hasta=None, limit: int | None = None):
+    """Movimientos de un insumo, más recientes primero (usa ix_movimiento_insumo_fecha)."""
+    stmt = (
+        select(MovimientoInsumo).where(MovimientoInsumo.insumo_id == insumo_id)
+        .options(joinedload(MovimientoInsumo.usuario))  # la tabla muestra quién lo registró
+    )
+    if desde is not None:
+        stmt = stmt.where(MovimientoInsumo.creado_en >= desde)
+    if hasta is not None:
+        stmt = stmt.where(MovimientoInsumo.creado_en < hasta)
+    stmt = stmt.order_by(MovimientoInsumo.creado_en.desc(), MovimientoInsumo.movimiento_id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return db.session.execute(stmt).scalars().all()
+
+
+def descuadres() -> list:
+    """[(insumo, saldo_libro)] donde el stock cacheado no coincide con la suma del libro."""
+    libro = (
+        select(MovimientoInsumo.insumo_id, func.sum(MovimientoInsumo.delta).label("saldo"))
+        .group_by(MovimientoInsumo.insumo_id).subquery()
+    )
+    saldo = func.coalesce(libro.c.saldo, 0)
+    rows = db.session.execute(
+        select(Insumo, saldo)
+        .outerjoin(libro, libro.c.insumo_id == Insumo.insumo_id)
+        .where(Insumo.stock != saldo)
+        .order_by(Insumo.insumo_id)
+    ).all()
+    return [(i, Decimal(str(s))) for i, s in rows]
+
+
+def reconstruir() -> int:
+    """Recalcula `Insumo.stock` desde el libro en un solo UPDATE. No hace commit."""
+    libro = (
+        select(func.coalesce(func.sum(MovimientoInsumo.delta), 0))
+        .where(MovimientoInsumo.insumo_id == Insumo.insumo_id)
+        .scalar_subquery()
+    )
+    res = db.session.execute(
+        Insumo.__table__.update().where(Insumo.__table__.c.stock != libro).values(stock=libro)
+    )
+    return res.rowcount
+
+
+def aprobar_lote(tratamiento_ids, usuario_id=None) -> list:
+    """Aprueba varios tratamientos Pendiente en una transacción.
+
+    Orden de bloqueo fijo: primero los tratamientos y luego todos sus insumos,
+    ambos por id y una sola vez. Cada tratamiento se valida contra el stock que dejaron
+    los anteriores del lote; los que no alcanzan quedan Pendiente. Devuelve
+    [(tratamiento_id, ok, mensaje)] en orden de id. No hace commit.
+    """
+    ids = sorted(set(tratamiento_ids))
+    tratamientos = db.session.execute(
+        select(Tratamiento).where(Tratamiento.tratamiento_id.in_(ids))
+        .order_by(Tratamiento.tratamiento_id).with_for_update()
+    ).scalars().all()
+    por_id = {t.tratamiento_id: t for t in tratamientos}
+
+    pendientes = [t.tratamiento_id for t in tratamientos if t.estado == "Pendiente"]
+    detalles = {}
+    if pendientes:
+        for d in db.session.execute(
+            select(TratamientoInsumo).where(TratamientoInsumo.tratamiento_id.in_(pendientes))
+        ).scalars():
+            detalles.setdefault(d.tratamiento_id, []).append(d)
+    insumos = cargar_insumos(
+        [d.insumo_id for ds in detalles.values() for d in ds], lock=True
+    )
+    lotes = cargar_lotes(insumos)
+
+    resultados = []
+    hoy = date.today()
+    for tid in ids:
+        t = por_id.get(tid)
+        if t is None:
+            resultados.append((tid, False, "Tratamiento inexistente"))
+            continue
+        if t.estado != "Pendiente":
+            resultados.append((tid, False, f"Estado {t.estado}, no Pendiente"))
+            continue
+        req = requeridos(detalles.get(tid, []))
+        falta = faltantes(req, insumos, lotes, hoy)
+        if falta:
+            resultados.append((tid, False, "Falta: " + "; ".join(falta)))
+            continue
+        descontar(req, insumos, lotes, tratamiento_id=tid, usuario_id=usuario_id)
+        t.estado = "Aprobado"
+        resultados.append((tid, True, "Aprobado"))
+    return resultados
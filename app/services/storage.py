@@ -0,0 +1,250 @@
+# app/services/storage.py
+import mimetypes, os, shutil, tempfile
+from contextlib import contextmanager
+from flask import current_app
+
+mimetypes.add_type("image/webp", ".webp")
+
+CHUNK = 1024 * 1024  # bytes por lectura al copiar un stream
+
+
+class RangoInvalido(ValueError):
+    """El Range pedido no se puede satisfacer (416)."""
+
+
+def _tipo(key: str, content_type: str | None) -> str:
+    return content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class LocalStorage:
+    """Archivos bajo `root` (UPLOAD_FOLDER); las claves son rutas relativas con '/'."""
+
+    nombre = "local"
+
+    def __init__(self, root: str, chunk: int = CHUNK):
+        self.root = os.path.abspath(root)
+        self.chunk = chunk
+
+    def path(self, key: str) -> str | None:
+        """Ruta absoluta de `key`, o None si se sale de `root`."""
+        full = os.path.abspath(os.path.join(self.root, key))
+        return full if full.startswith(self.root + os.sep) else None
+
+    def save(self, key: str, stream, content_type: str | None = None) -> int:
+        """Copia `stream` por bloques a un temporal y lo publica con os.replace."""
+        full = self.path(key)
+        if full is None:
+            raise ValueError(f"Clave fuera del almacenamiento: {key}")
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(full), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(stream, out, self.chunk)
+                n = out.tell()
+            os.replace(tmp, full)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return n
+
+    def open(self, key: str):
+        full = self.path(key)
+        if full is None or not os.path.isfile(full):
+            raise FileNotFoundError(key)
+        return open(full, "rb")
+
+    @contextmanager
+    def local(self, key: str):
+        """Ruta local legible de `key` (aquí, el propio archivo)."""
+        full = self.path(key)
+        if full is None or not os.path.isfile(full):
+            raise FileNotFoundError(key)
+        yield full
+
+    def exists(self, key: str) -> bool:
+        full = self.path(key)
+        return full is not None and os.path.isfile(full)
+
+    def delete(self, key: str) -> bool:
+        full = self.path(key)
+        if full is None:
+            return False
+        try:
+            os.remove(full)
+        except FileNotFoundError:
+            return False
+        try:
+            os.rmdir(os.path.dirname(full))   # solo si quedó vacío
+        except OSError:
+            pass
+        return True
+
+    def move(self, src: str, dst: str) -> None:
+        a, b = self.path(src), self.path(dst)
+        if a is None or b is None:
+            raise ValueError(f"Clave fuera del almacenamiento: {src} -> {dst}")
+        os.makedirs(os.path.dirname(b), exist_ok=True)
+        os.replace(a, b)
+        try:
+            os.rmdir(os.path.dirname(a))
+        except OSError:
+            pass
+
+    def list(self, prefix: str):
+        """(key, size, mtime) bajo `prefix`, directorio por directorio con os.scandir.
+
+        Las claves de un mismo directorio salen juntas (lo usa uploads_gc).
+        """
+        base = self.path(prefix.rstrip("/"))
+        if base is None:
+            return
+        pila = [base]
+        while pila:
+            d = pila.pop()
+            try:
+                it = os.scandir(d)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            subdirs = []
+            with it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    elif e.is_file(follow_symlinks=False) and not e.name.endswith(".tmp"):
+                        st = e.stat(follow_symlinks=False)
+                        key = os.path.relpath(e.path, self.root).replace(os.sep, "/")
+                        yield key, st.st_size, st.st_mtime
+            pila.extend(sorted(subdirs, reverse=True))
+
+
+class S3Storage:
+    """Bucket S3 o compatible (MinIO, R2, ...). Requiere `boto3`."""
+
+    nombre = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", chunk: int = CHUNK, **client_kwargs):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requiere el paquete boto3") from e
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.chunk = chunk
+        self.client = boto3.client("s3", **{k: v for k, v in client_kwargs.items() if v})
+        # multipart por bloques: el archivo nunca se lee entero en memoria
+        self.transfer = TransferConfig(
+            multipart_threshold=max(chunk, 5 * 1024 * 1024),
+            multipart_chunksize=max(chunk, 5 * 1024 * 1024),
+        )
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    def _no_existe(self, err) -> bool:
+        code = getattr(err, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def save(self, key: str, stream, content_type: str | None = None) -> int:
+        contador = _Contador(stream)
+        self.client.upload_fileobj(
+            contador, self.bucket, self._k(key),
+            ExtraArgs={"ContentType": _tipo(key, content_type)}, Config=self.transfer,
+        )
+        return contador.n
+
+    def get(self, key: str, rango: str | None = None) -> dict:
+        """Respuesta de get_object (Body en streaming, ContentLength, ETag, ...).
+
+        `rango`: cabecera Range ("bytes=0-99"); la respuesta trae entonces ContentRange.
+        Un rango fuera del objeto levanta RangoInvalido.
+        """
+        from botocore.exceptions import ClientError
+        extra = {"Range": rango} if rango else {}
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._k(key), **extra)
+        except ClientError as e:
+            if self._no_existe(e):
+                raise FileNotFoundError(key) from e
+            if getattr(e, "response", {}).get("Error", {}).get("Code") == "InvalidRange":
+                raise RangoInvalido(key) from e
+            raise
+
+    def open(self, key: str):
+        return self.get(key)["Body"]
+
+    @contextmanager
+    def local(self, key: str):
+        """Descarga `key` por bloques a un temporal (PIL necesita un archivo con seek)."""
+        body = self.open(key)
+        fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for bloque in body.iter_chunks(self.chunk):
+                    out.write(bloque)
+            yield tmp
+        finally:
+            body.close()
+            os.remove(tmp)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._k(key))
+            return True
+        except ClientError as e:
+            if self._no_existe(e):
+                return False
+            raise
+
+    def delete(self, key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self._k(key))
+        return True
+
+    def move(self, src: str, dst: str) -> None:
+        self.client.copy({"Bucket": self.bucket, "Key": self._k(src)}, self.bucket, self._k(dst))
+        self.delete(src)
+
+    def list(self, prefix: str):
+        """(key, size, mtime) en orden lexicográfico, página a página."""
+        pages = self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=self._k(prefix)
+        )
+        for page in pages:
+            for obj in page.get("Contents", ()):
+                yield obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp()
+
+
+class _Contador:
+    """Envuelve un stream y cuenta los bytes leídos."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.n = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.n += len(data)
+        return data
+
+
+def crear(cfg) -> "LocalStorage | S3Storage":
+    chunk = cfg.get("STORAGE_CHUNK_SIZE", CHUNK)
+    if cfg.get("STORAGE_BACKEND", "local") == "s3":
+        return S3Storage(
+            cfg["S3_BUCKET"], prefix=cfg.get("S3_PREFIX", ""), chunk=chunk,
+            endpoint_url=cfg.get("S3_ENDPOINT_URL"), region_name=cfg.get("S3_REGION"),
+            aws_access_key_id=cfg.get("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=cfg.get("S3_SECRET_ACCESS_KEY"),
+        )
+    return LocalStorage(cfg["UPLOAD_FOLDER"], chunk=chunk)
+
+
+def get_storage():
+    """Backend de la app actual (uno por app, creado en el primer uso)."""
+    app = current_app._get_current_object()
+    st = app.extensions.get("patitas_storage")
+    if st is None:
+        st = app.extensions["patitas_storage"] = crear(app.config)
+    return st
@@ -0,0 +1,137 @@
+# app/services/uploads_gc.py
+import time
+from datetime import date
+from itertools import groupby
+from flask import current_app
+from sqlalchemy import select
+from .. import db
+from ..models import FotoAnimal
+from .images import all_files
+from .storage import get_storage
+
+RAIZ = "animal"          # claves animal/<animal_id>/<archivo>
+CUARENTENA = "_cuarentena"
+
+
+class Informe:
+    """Totales del recorrido; `por_animal` = {animal_id: [archivos, bytes, huérfanos, bytes_huérfanos]}."""
+
+    def __init__(self):
+        self.archivos = self.bytes = 0
+        self.huerfanos = self.bytes_huerfanos = 0
+        self.recientes = 0      # huérfanos aparentes dentro del período de gracia
+        self.faltantes = 0      # filas de foto_animal sin su archivo original
+        self.ejemplos_faltantes = []
+        self.ignorados = []     # claves bajo animal/ que no son animal/<id>/<archivo>
+        self.por_animal = {}
+
+    def faltante(self, filename: str) -> None:
+        self.faltantes += 1
+        if len(self.ejemplos_faltantes) < 20:
+            self.ejemplos_faltantes.append(filename)
+
+    def sumar(self, animal_id: int, size: int, huerfano: bool) -> None:
+        t = self.por_animal.setdefault(animal_id, [0, 0, 0, 0])
+        t[0] += 1
+        t[1] += size
+        self.archivos += 1
+        self.bytes += size
+        if huerfano:
+            t[2] += 1
+            t[3] += size
+            self.huerfanos += 1
+            self.bytes_huerfanos += size
+
+
+def _por_animal(storage):
+    """(animal_id, [(key, size, mtime)]) por cada animal/<id>/, en el orden del listado.
+
+    Ambos backends entregan juntas las claves de un mismo animal (os.scandir por
+    directorio; S3 en orden lexicográfico, y "animal/1/" < "animal/10/"), así
+    solo se retiene en memoria un animal a la vez. animal_id None = clave ajena.
+    """
+    def grupo(item):
+        partes = item[0].split("/")
+        return int(partes[1]) if len(partes) == 3 and partes[1].isdigit() else None
+
+    for animal_id, items in groupby(storage.list(RAIZ + "/"), key=grupo):
+        yield animal_id, list(items)
+
+
+def _conocidos(animal_ids) -> tuple:
+    """Una consulta por lote: (rutas válidas incluidas las variantes, {animal_id: [filename]})."""
+    validos, por_animal = set(), {}
+    for aid, fn in db.session.execute(
+        select(FotoAnimal.animal_id, FotoAnimal.filename).where(FotoAnimal.animal_id.in_(animal_ids))
+    ):
+        validos.update(all_files(fn))
+        por_animal.setdefault(aid, []).append(fn)
+    return validos, por_animal
+
+
+def recolectar(accion: str | None = None, min_edad: int | None = None, lote: int | None = None) -> Informe:
+    """Recorre las claves animal/ del almacenamiento y las cruza con foto_animal.
+
+    Huérfano = archivo que no es el original ni una variante de ninguna FotoAnimal.
+    `accion`: None (solo informa), "borrar" o "cuarentena" (mueve a
+    _cuarentena/<fecha>/ conservando la ruta). Los archivos más nuevos que
+    `min_edad` segundos no se tocan: una subida o un procesamiento en curso
+    escribe el archivo antes de confirmar su fila.
+
+    La memoria queda acotada por `lote` archivos (más los totales por animal):
+    el listado se consume en streaming y la BD se consulta por lotes de animales.
+    """
+    cfg = current_app.config
+    storage = get_storage()
+    min_edad = cfg.get("UPLOADS_GC_MIN_EDAD", 3600) if min_edad is None else min_edad
+    lote = lote or cfg.get("UPLOADS_GC_LOTE", 1000)
+    destino = f"{CUARENTENA}/{date.today().isoformat()}"
+    limite = time.time() - min_edad
+    inf = Informe()
+
+    pendientes = {}   # animal_id -> [(key, size, mtime)] del lote
+    recorridos = set()
+
+    def procesar():
+        validos, fotos = _conocidos(sorted(pendientes))
+        for aid, items in pendientes.items():
+            vistos = set()
+            for key, size, mtime in items:
+                vistos.add(key)
+                huerfano = key not in validos
+                if huerfano and mtime > limite:
+                    inf.recientes += 1
+                    huerfano = False
+                inf.sumar(aid, size, huerfano)
+                if huerfano and accion == "borrar":
+                    storage.delete(key)
+                elif huerfano and accion == "cuarentena":
+                    storage.move(key, f"{destino}/{key}")
+            for fn in fotos.get(aid, ()):
+                if fn not in vistos:
+                    inf.faltante(fn)
+        pendientes.clear()
+
+    n = 0
+    for animal_id, items in _por_animal(storage):
+        if animal_id is None:
+            if len(inf.ignorados) < 100:
+                inf.ignorados += [k for k, _, _ in items][:100 - len(inf.ignorados)]
+            continue
+        # un animal nunca se parte entre lotes: sus faltantes se calculan completos
+        pendientes.setdefault(animal_id, []).extend(items)
+        recorridos.add(animal_id)
+        n += len(items)
+        if n >= lote or len(pendientes) >= lote:
+            procesar()
+            n = 0
+    if pendientes:
+        procesar()
+
+    # Fotos de animales sin archivos: se leen por bloques (yield_per), sin cargarlas todas
+    for aid, fn in db.session.execute(
+        select(FotoAnimal.animal_id, FotoAnimal.filename).execution_options(yield_per=lote)
+    ):
+        if aid not in recorridos:
+            inf.faltante(fn)
+    return inf
@@ -0,0 +1,56 @@
+# app/services/user_cache.py
+import threading
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from .. import db
+from ..models import Usuario
+from .cache import TTLCache
+
+# usuario_id -> dict de columnas. Por proceso; el TTL acota lo que puede tardar otro
+# worker en ver un cambio de rol o una desactivación. `_generacion` cuenta las
+# invalidaciones: un request que leyó el usuario mientras otro lo invalidaba no lo
+# cachea (un solo entero, no crece con los usuarios).
+_usuarios = TTLCache(maxsize=512, ttl=60)
+_generacion = 0
+_lock = threading.Lock()
+
+_COLUMNAS = [c.key for c in inspect(Usuario).column_attrs]
+
+
+def _snapshot(u: Usuario) -> dict:
+    return {k: getattr(u, k) for k in _COLUMNAS}
+
+
+def _attach(data: dict) -> Usuario:
+    """Reconstruye el Usuario y lo adjunta a la sesión sin consultar la BD.
+
+    Queda como instancia persistente: cambios como `set_password` se guardan con commit.
+    """
+    u = Usuario(**data)
+    make_transient_to_detached(u)
+    return db.session.merge(u, load=False)
+
+
+def load_user(usuario_id: int):
+    """user_loader de Flask-Login: devuelve None si no existe o está desactivado."""
+    data = _usuarios.get(usuario_id)
+    if data is not None:
+        return _attach(data) if data["activo"] else None
+
+    generacion = _generacion
+    u = db.session.get(Usuario, usuario_id)
+    if u is None:
+        return None
+    with _lock:
+        if generacion == _generacion:
+            _usuarios.set(usuario_id, _snapshot(u), ttl=current_app.config.get("USER_CACHE_TTL", 60))
+    return u if u.activo else None
+
+
+def invalidate_user(usuario_id: int) -> None:
+    """Llamar tras commit de cambios de rol, estado o contraseña."""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _usuarios.pop(usuario_id)
@@ -233,3 +233,50 @@
     if (href) window.location.href = href;
   });
 })();
+
+
+// Buscador para <select data-typeahead="url"> (catálogos grandes que no se embeben completos)
+(() => {
+  const selects = document.querySelectorAll('select[data-typeahead]');
+  if (!selects.length) return;
+
+  selects.forEach((sel) => {
+    const q = document.createElement('input');
+    q.type = 'search';
+    q.className = 'typeahead-q';
+    q.placeholder = 'Buscar…';
+    q.autocomplete = 'off';
+    sel.parentNode.insertBefore(q, sel);
+  });
+
+  const timers = new WeakMap();
+
+  const fill = async (q, sel) => {
+    const url = new URL(sel.dataset.typeahead, window.location.origin);
+    url.searchParams.set('q', q.value);
+    let data;
+    try {
+      const resp = await fetch(url, { headers: { Accept: 'application/json' } });
+      if (!resp.ok) return;
+      data = await resp.json();
+    } catch { return; }
+
+    // conserva la opción vacía y la seleccionada; reemplaza el resto
+    const keep = sel.value;
+    [...sel.options].forEach((o) => { if (o.value && o.value !== keep) o.remove(); });
+    data.items.forEach((it) => {
+      if (String(it.id) === keep) return;
+      sel.add(new Option(it.texto, it.id));
+    });
+  };
+
+  // Delegación: también sirve para las filas clonadas del formulario de insumos
+  document.addEventListener('input', (e) => {
+    const q = e.target.closest('input.typeahead-q');
+    if (!q) return;
+    const sel = q.nextElementSibling;
+    if (!sel || !sel.dataset.typeahead) return;
+    clearTimeout(timers.get(q));
+    timers.set(q, setTimeout(() => fill(q, sel), 200));
+  });
+})();
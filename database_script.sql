@@ -51,6 +51,8 @@ CREATE TABLE IF NOT EXISTS animal (
     fecha_registro DATE NOT NULL DEFAULT CURRENT_DATE,
     usuario_id INTEGER NULL,
     ubicacion_id INTEGER NULL,
+    estado_actual VARCHAR(30),                      -- copia del último historial_estado
+    estado_actualizado_en TIMESTAMP WITHOUT TIME ZONE,
     CONSTRAINT animal_sexo_chk CHECK (sexo IN ('Macho','Hembra') OR sexo IS NULL),
     CONSTRAINT animal_codigo_qr_uk UNIQUE (codigo_qr),
     CONSTRAINT fk_animal_usuario FOREIGN KEY (usuario_id)
@@ -59,6 +61,7 @@ CREATE TABLE IF NOT EXISTS animal (
         REFERENCES ubicacion(ubicacion_id) ON DELETE SET NULL
 );
 CREATE INDEX IF NOT EXISTS ix_animal_ubicacion ON animal (ubicacion_id);
+CREATE INDEX IF NOT EXISTS ix_animal_estado_actual ON animal (estado_actual, animal_id);
 
 -- ==================
 -- TABLA: tratamiento
@@ -127,6 +130,8 @@ CREATE TABLE IF NOT EXISTS historial_estado (
         REFERENCES usuario(usuario_id) ON DELETE SET NULL
 );
 CREATE INDEX IF NOT EXISTS ix_historial_estado_animal ON historial_estado (animal_id);
+CREATE INDEX IF NOT EXISTS ix_historial_estado_proximo_control ON historial_estado (proximo_control)
+    WHERE proximo_control IS NOT NULL;
 
 -- =================
 -- TABLA: foto_animal
@@ -138,9 +143,135 @@ CREATE TABLE IF NOT EXISTS foto_animal (
     filename VARCHAR(255) NOT NULL,
     titulo VARCHAR(100),
     fecha_subida TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    procesada BOOLEAN NOT NULL DEFAULT FALSE,
     CONSTRAINT fk_foto_animal FOREIGN KEY (animal_id)
         REFERENCES animal(animal_id) ON DELETE CASCADE,
     CONSTRAINT fk_foto_usuario FOREIGN KEY (usuario_id)
         REFERENCES usuario(usuario_id) ON DELETE SET NULL
 );
 CREATE INDEX IF NOT EXISTS ix_foto_animal_animal ON foto_animal (animal_id);
+
+-- =====================
+-- TABLA: correo_saliente
+-- =====================
+-- Bandeja de salida de correos; un worker los entrega con reintentos.
+CREATE TABLE IF NOT EXISTS correo_saliente (
+    correo_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    destinatario VARCHAR(255) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    cuerpo TEXT NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'Pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    ultimo_error TEXT,
+    creado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    enviado_en TIMESTAMP WITHOUT TIME ZONE,
+    CONSTRAINT correo_saliente_estado_chk CHECK (estado IN ('Pendiente','Enviado','Fallido'))
+);
+CREATE INDEX IF NOT EXISTS ix_correo_saliente_pendientes ON correo_saliente (estado, proximo_intento);
+
+-- =====================
+-- TABLA: lote_insumo
+-- =====================
+-- Ingresos de stock con su propio vencimiento; se consumen FEFO.
+CREATE TABLE IF NOT EXISTS lote_insumo (
+    lote_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    insumo_id INTEGER NOT NULL,
+    cantidad NUMERIC(10,2) NOT NULL,
+    fecha_vencimiento DATE,
+    creado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT lote_insumo_cantidad_chk CHECK (cantidad >= 0),
+    CONSTRAINT fk_lote_insumo FOREIGN KEY (insumo_id)
+        REFERENCES insumo(insumo_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS ix_lote_insumo_fefo ON lote_insumo (insumo_id, fecha_vencimiento);
+CREATE INDEX IF NOT EXISTS ix_lote_insumo_vencimiento ON lote_insumo (fecha_vencimiento) WHERE cantidad > 0;
+
+-- ===========================
+-- TABLA: movimiento_insumo
+-- ===========================
+-- Libro de movimientos de stock (solo inserción); insumo.stock es el saldo cacheado.
+CREATE TABLE IF NOT EXISTS movimiento_insumo (
+    movimiento_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    insumo_id INTEGER NOT NULL,
+    delta NUMERIC(10,2) NOT NULL,
+    saldo NUMERIC(12,2) NOT NULL,
+    motivo VARCHAR(20) NOT NULL,
+    nota VARCHAR(250),
+    tratamiento_id INTEGER NULL,
+    usuario_id INTEGER NULL,
+    lote_id INTEGER NULL,
+    creado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT movimiento_insumo_motivo_chk CHECK (motivo IN ('Inicial','Ingreso','Ajuste','Tratamiento')),
+    CONSTRAINT movimiento_insumo_delta_chk CHECK (delta <> 0),
+    CONSTRAINT fk_movimiento_insumo FOREIGN KEY (insumo_id)
+        REFERENCES insumo(insumo_id) ON DELETE RESTRICT,
+    CONSTRAINT fk_movimiento_tratamiento FOREIGN KEY (tratamiento_id)
+        REFERENCES tratamiento(tratamiento_id) ON DELETE SET NULL,
+    CONSTRAINT fk_movimiento_usuario FOREIGN KEY (usuario_id)
+        REFERENCES usuario(usuario_id) ON DELETE SET NULL,
+    CONSTRAINT fk_movimiento_lote FOREIGN KEY (lote_id)
+        REFERENCES lote_insumo(lote_id) ON DELETE SET NULL
+);
+CREATE INDEX IF NOT EXISTS ix_movimiento_insumo_fecha ON movimiento_insumo (insumo_id, creado_en);
+CREATE INDEX IF NOT EXISTS ix_movimiento_insumo_tratamiento ON movimiento_insumo (tratamiento_id);
+
+-- ============================
+-- TABLA: recordatorio_control
+-- ============================
+-- Recordatorios de próximo control ya encolados (uno por historial y tipo).
+CREATE TABLE IF NOT EXISTS recordatorio_control (
+    recordatorio_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    historial_id INTEGER NOT NULL,
+    usuario_id INTEGER NULL,
+    tipo VARCHAR(20) NOT NULL,
+    enviado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT recordatorio_control_tipo_chk CHECK (tipo IN ('Proximo','Vencido')),
+    CONSTRAINT uq_recordatorio_control UNIQUE (historial_id, tipo),
+    CONSTRAINT fk_recordatorio_historial FOREIGN KEY (historial_id)
+        REFERENCES historial_estado(historial_id) ON DELETE CASCADE,
+    CONSTRAINT fk_recordatorio_usuario FOREIGN KEY (usuario_id)
+        REFERENCES usuario(usuario_id) ON DELETE SET NULL
+);
+
+-- =====================
+-- TABLA: kpi_resumen
+-- =====================
+-- Agregados del panel; se reescriben en cada refresco.
+CREATE TABLE IF NOT EXISTS kpi_resumen (
+    grupo VARCHAR(30) NOT NULL,
+    clave VARCHAR(150) NOT NULL,
+    valor NUMERIC(12,2) NOT NULL,
+    orden INTEGER NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (grupo, clave)
+);
+
+-- =====================
+-- TABLA: catalogo_version
+-- =====================
+-- Versión de los catálogos cacheados por los workers (insumos, ubicaciones).
+CREATE TABLE IF NOT EXISTS catalogo_version (
+    tipo VARCHAR(30) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO catalogo_version (tipo, version) VALUES ('insumos', 0), ('ubicaciones', 0)
+ON CONFLICT (tipo) DO NOTHING;
+
+-- ==================================
+-- ÍNDICES DE BÚSQUEDA (pg_trgm)
+-- ==================================
+-- Permiten que las búsquedas ILIKE '%texto%' de los listados usen índice
+-- y que los resultados se ordenen por similitud.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_animal_nombre_trgm ON animal USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_animal_especie_trgm ON animal USING gin (especie gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_animal_color_trgm ON animal USING gin (color gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_insumo_nombre_trgm ON insumo USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_insumo_unidad_trgm ON insumo USING gin (unidad gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_ubicacion_comuna_trgm ON ubicacion USING gin (comuna gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_ubicacion_sector_trgm ON ubicacion USING gin (nombre_sector gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_ubicacion_descripcion_trgm ON ubicacion USING gin (descripcion gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_usuario_nombre_trgm ON usuario USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_usuario_apellido_trgm ON usuario USING gin (apellido gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_usuario_correo_trgm ON usuario USING gin (correo gin_trgm_ops);
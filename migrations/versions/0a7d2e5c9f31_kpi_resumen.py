@@ -0,0 +1,31 @@
+"""kpi resumen
+
+Revision ID: 0a7d2e5c9f31
+Revises: f0c4a8e6b213
+Create Date: 2026-10-17 18:31:55.640172
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7d2e5c9f31'
+down_revision = 'f0c4a8e6b213'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('kpi_resumen',
+    sa.Column('grupo', sa.String(length=30), nullable=False),
+    sa.Column('clave', sa.String(length=150), nullable=False),
+    sa.Column('valor', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('orden', sa.Integer(), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('grupo', 'clave')
+    )
+
+
+def downgrade():
+    op.drop_table('kpi_resumen')
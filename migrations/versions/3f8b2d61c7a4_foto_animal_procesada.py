@@ -0,0 +1,26 @@
+"""foto_animal procesada
+
+Revision ID: 3f8b2d61c7a4
+Revises: 7c1e4a9d2b30
+Create Date: 2026-10-17 11:02:15.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8b2d61c7a4'
+down_revision = '7c1e4a9d2b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('foto_animal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('procesada', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('foto_animal', schema=None) as batch_op:
+        batch_op.drop_column('procesada')
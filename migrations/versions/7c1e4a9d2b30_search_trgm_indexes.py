@@ -0,0 +1,52 @@
+"""search trgm indexes
+
+Revision ID: 7c1e4a9d2b30
+Revises: 509505219ab5
+Create Date: 2026-10-17 10:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4a9d2b30'
+down_revision = '509505219ab5'
+branch_labels = None
+depends_on = None
+
+
+TRGM_INDEXES = [
+    ('animal', 'ix_animal_nombre_trgm', 'nombre'),
+    ('animal', 'ix_animal_especie_trgm', 'especie'),
+    ('animal', 'ix_animal_color_trgm', 'color'),
+    ('insumo', 'ix_insumo_nombre_trgm', 'nombre'),
+    ('insumo', 'ix_insumo_unidad_trgm', 'unidad'),
+    ('ubicacion', 'ix_ubicacion_comuna_trgm', 'comuna'),
+    ('ubicacion', 'ix_ubicacion_sector_trgm', 'nombre_sector'),
+    ('ubicacion', 'ix_ubicacion_descripcion_trgm', 'descripcion'),
+    ('usuario', 'ix_usuario_nombre_trgm', 'nombre'),
+    ('usuario', 'ix_usuario_apellido_trgm', 'apellido'),
+    ('usuario', 'ix_usuario_correo_trgm', 'correo'),
+]
+
+
+def upgrade():
+    is_pg = op.get_bind().dialect.name == 'postgresql'
+    if is_pg:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table, name, column in TRGM_INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if is_pg:
+                batch_op.create_index(name, [column], unique=False,
+                                      postgresql_using='gin',
+                                      postgresql_ops={column: 'gin_trgm_ops'})
+            else:
+                batch_op.create_index(name, [column], unique=False)
+
+
+def downgrade():
+    for table, name, _column in reversed(TRGM_INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
@@ -0,0 +1,42 @@
+"""correo saliente
+
+Revision ID: a4d9e0b57f12
+Revises: 3f8b2d61c7a4
+Create Date: 2026-10-17 11:48:03.271556
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e0b57f12'
+down_revision = '3f8b2d61c7a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('correo_saliente',
+    sa.Column('correo_id', sa.Integer(), nullable=False),
+    sa.Column('destinatario', sa.String(length=255), nullable=False),
+    sa.Column('asunto', sa.String(length=255), nullable=False),
+    sa.Column('cuerpo', sa.Text(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('proximo_intento', sa.DateTime(), nullable=False),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('enviado_en', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("estado IN ('Pendiente','Enviado','Fallido')", name='correo_saliente_estado_chk'),
+    sa.PrimaryKeyConstraint('correo_id')
+    )
+    with op.batch_alter_table('correo_saliente', schema=None) as batch_op:
+        batch_op.create_index('ix_correo_saliente_pendientes', ['estado', 'proximo_intento'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('correo_saliente', schema=None) as batch_op:
+        batch_op.drop_index('ix_correo_saliente_pendientes')
+
+    op.drop_table('correo_saliente')
@@ -0,0 +1,32 @@
+"""catalogo version
+
+Revision ID: b3f91d7c4e20
+Revises: 0a7d2e5c9f31
+Create Date: 2026-10-17 20:12:08.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f91d7c4e20'
+down_revision = '0a7d2e5c9f31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tabla = op.create_table('catalogo_version',
+    sa.Column('tipo', sa.String(length=30), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('tipo')
+    )
+    op.bulk_insert(tabla, [
+        {'tipo': 'insumos', 'version': 0},
+        {'tipo': 'ubicaciones', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.drop_table('catalogo_version')
@@ -0,0 +1,55 @@
+"""movimiento insumo
+
+Revision ID: c2e7f3a91d05
+Revises: a4d9e0b57f12
+Create Date: 2026-10-17 14:22:40.118903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e7f3a91d05'
+down_revision = 'a4d9e0b57f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('movimiento_insumo',
+    sa.Column('movimiento_id', sa.Integer(), nullable=False),
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('saldo', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('motivo', sa.String(length=20), nullable=False),
+    sa.Column('nota', sa.String(length=250), nullable=True),
+    sa.Column('tratamiento_id', sa.Integer(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.CheckConstraint("motivo IN ('Inicial','Ingreso','Ajuste','Tratamiento')", name='movimiento_insumo_motivo_chk'),
+    sa.CheckConstraint('delta <> 0', name='movimiento_insumo_delta_chk'),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.insumo_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tratamiento_id'], ['tratamiento.tratamiento_id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.usuario_id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('movimiento_id')
+    )
+    with op.batch_alter_table('movimiento_insumo', schema=None) as batch_op:
+        batch_op.create_index('ix_movimiento_insumo_fecha', ['insumo_id', 'creado_en'], unique=False)
+        batch_op.create_index('ix_movimiento_insumo_tratamiento', ['tratamiento_id'], unique=False)
+
+    # Saldo de apertura: el stock actual queda como movimiento 'Inicial'
+    # para que la suma del libro coincida con insumo.stock desde el primer día.
+    op.execute(
+        "INSERT INTO movimiento_insumo (insumo_id, delta, saldo, motivo, nota) "
+        "SELECT insumo_id, stock, stock, 'Inicial', 'Saldo al crear el libro de movimientos' "
+        "FROM insumo WHERE stock <> 0"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('movimiento_insumo', schema=None) as batch_op:
+        batch_op.drop_index('ix_movimiento_insumo_tratamiento')
+        batch_op.drop_index('ix_movimiento_insumo_fecha')
+
+    op.drop_table('movimiento_insumo')
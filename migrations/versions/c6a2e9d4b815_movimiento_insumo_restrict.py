@@ -0,0 +1,47 @@
+"""movimiento insumo restrict
+
+Revision ID: c6a2e9d4b815
+Revises: b3f91d7c4e20
+Create Date: 2026-10-17 20:41:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a2e9d4b815'
+down_revision = 'b3f91d7c4e20'
+branch_labels = None
+depends_on = None
+
+# SQLite no nombra las FK: batch las reconoce por esta convención
+NAMING = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+NOMBRE_SQLITE = 'fk_movimiento_insumo_insumo_id_insumo'
+
+
+def _fk_actual():
+    """Nombre de la FK movimiento_insumo.insumo_id: la de la migración original
+    (nombre automático) o la de database_script.sql (fk_movimiento_insumo)."""
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('movimiento_insumo'):
+        if fk['referred_table'] == 'insumo' and fk['constrained_columns'] == ['insumo_id']:
+            return fk['name'] or NOMBRE_SQLITE
+    return None
+
+
+def _cambiar(ondelete):
+    nombre = _fk_actual()
+    with op.batch_alter_table('movimiento_insumo', schema=None, naming_convention=NAMING) as batch_op:
+        if nombre:
+            batch_op.drop_constraint(nombre, type_='foreignkey')
+        batch_op.create_foreign_key(nombre or 'fk_movimiento_insumo', 'insumo', ['insumo_id'], ['insumo_id'],
+                                    ondelete=ondelete)
+
+
+def upgrade():
+    # el libro de stock no se borra en cascada con el insumo
+    _cambiar('RESTRICT')
+
+
+def downgrade():
+    _cambiar('CASCADE')
@@ -0,0 +1,55 @@
+"""lote insumo
+
+Revision ID: d81a6c4e09b7
+Revises: c2e7f3a91d05
+Create Date: 2026-10-17 15:40:12.506221
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81a6c4e09b7'
+down_revision = 'c2e7f3a91d05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lote_insumo',
+    sa.Column('lote_id', sa.Integer(), nullable=False),
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('fecha_vencimiento', sa.Date(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.CheckConstraint('cantidad >= 0', name='lote_insumo_cantidad_chk'),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.insumo_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lote_id')
+    )
+    with op.batch_alter_table('lote_insumo', schema=None) as batch_op:
+        batch_op.create_index('ix_lote_insumo_fefo', ['insumo_id', 'fecha_vencimiento'], unique=False)
+        batch_op.create_index('ix_lote_insumo_vencimiento', ['fecha_vencimiento'], unique=False,
+                              postgresql_where=sa.text('cantidad > 0'))
+
+    with op.batch_alter_table('movimiento_insumo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lote_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_movimiento_lote', 'lote_insumo', ['lote_id'], ['lote_id'], ondelete='SET NULL')
+
+    # Un lote por insumo con el stock y vencimiento actuales
+    op.execute(
+        "INSERT INTO lote_insumo (insumo_id, cantidad, fecha_vencimiento) "
+        "SELECT insumo_id, stock, fecha_vencimiento FROM insumo WHERE stock > 0"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('movimiento_insumo', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_movimiento_lote', type_='foreignkey')
+        batch_op.drop_column('lote_id')
+
+    with op.batch_alter_table('lote_insumo', schema=None) as batch_op:
+        batch_op.drop_index('ix_lote_insumo_vencimiento')
+        batch_op.drop_index('ix_lote_insumo_fefo')
+
+    op.drop_table('lote_insumo')
@@ -0,0 +1,41 @@
+"""recordatorio control
+
+Revision ID: e5b3c7d2a614
+Revises: d81a6c4e09b7
+Create Date: 2026-10-17 16:58:31.774402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3c7d2a614'
+down_revision = 'd81a6c4e09b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recordatorio_control',
+    sa.Column('recordatorio_id', sa.Integer(), nullable=False),
+    sa.Column('historial_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('enviado_en', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.CheckConstraint("tipo IN ('Proximo','Vencido')", name='recordatorio_control_tipo_chk'),
+    sa.ForeignKeyConstraint(['historial_id'], ['historial_estado.historial_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.usuario_id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('recordatorio_id'),
+    sa.UniqueConstraint('historial_id', 'tipo', name='uq_recordatorio_control')
+    )
+    with op.batch_alter_table('historial_estado', schema=None) as batch_op:
+        batch_op.create_index('ix_historial_estado_proximo_control', ['proximo_control'], unique=False,
+                              postgresql_where=sa.text('proximo_control IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('historial_estado', schema=None) as batch_op:
+        batch_op.drop_index('ix_historial_estado_proximo_control')
+
+    op.drop_table('recordatorio_control')
@@ -0,0 +1,39 @@
+"""animal estado actual
+
+Revision ID: f0c4a8e6b213
+Revises: e5b3c7d2a614
+Create Date: 2026-10-17 17:45:09.231847
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0c4a8e6b213'
+down_revision = 'e5b3c7d2a614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('animal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('estado_actual', sa.String(length=30), nullable=True))
+        batch_op.add_column(sa.Column('estado_actualizado_en', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_animal_estado_actual', ['estado_actual', 'animal_id'], unique=False)
+
+    # Backfill desde el último historial de cada animal (igual que `flask estado-reparar`)
+    op.execute(
+        "UPDATE animal SET "
+        "estado_actual = (SELECT h.estado FROM historial_estado h WHERE h.animal_id = animal.animal_id "
+        "ORDER BY h.fecha_estado DESC, h.historial_id DESC LIMIT 1), "
+        "estado_actualizado_en = (SELECT h.fecha_estado FROM historial_estado h WHERE h.animal_id = animal.animal_id "
+        "ORDER BY h.fecha_estado DESC, h.historial_id DESC LIMIT 1)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('animal', schema=None) as batch_op:
+        batch_op.drop_index('ix_animal_estado_actual')
+        batch_op.drop_column('estado_actualizado_en')
+        batch_op.drop_column('estado_actual')
@@ -0,0 +1,130 @@
+# tests/conftest.py
+"""Fixtures comunes. Por defecto usan SQLite en un directorio temporal; con
+TEST_DATABASE_URL=postgresql://... corren contra PostgreSQL (necesario para los
+tests marcados `pg`)."""
+import os, sys, tempfile
+from contextlib import contextmanager
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="patitas-tests-")
+# La configuración se lee al importar app.config: fijar el entorno antes
+os.environ.update(
+    LOCAL_DATABASE_URL=os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_TMP}/test.db",
+    UPLOAD_FOLDER=os.path.join(_TMP, "uploads"),
+    STORAGE_BACKEND="local",
+    SECRET_KEY="test",
+    BACKGROUND_SYNC="1",
+    MAIL_QUEUE_WORKER="0",
+    RECORDATORIOS_WORKER="0",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text  # noqa: E402
+from app import create_app, db as _db  # noqa: E402
+from app.models import Usuario, Ubicacion  # noqa: E402
+from app.services import catalogo, public_cache, user_cache  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "pg: requiere PostgreSQL (TEST_DATABASE_URL)")
+
+
+def es_postgres() -> bool:
+    return os.environ["LOCAL_DATABASE_URL"].startswith("postgres")
+
+
+def pytest_collection_modifyitems(config, items):
+    if es_postgres():
+        return
+    saltar = pytest.mark.skip(reason="requiere TEST_DATABASE_URL=postgresql://...")
+    for item in items:
+        if "pg" in item.keywords:
+            item.add_marker(saltar)
+
+
+def _pg_trgm(app) -> None:
+    """Activa pg_trgm; si el servidor de pruebas no la trae, se prueba como
+    SEARCH_USE_TRGM=0 y sin los índices trigram."""
+    with _db.engine.begin() as conn:
+        hay = conn.scalar(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+        if hay:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            return
+    app.config["SEARCH_USE_TRGM"] = False
+    for tabla in _db.metadata.tables.values():
+        for ix in [ix for ix in tabla.indexes if ix.name and ix.name.endswith("_trgm")]:
+            tabla.indexes.discard(ix)
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    with app.app_context():
+        if _db.engine.dialect.name == "postgresql":
+            _pg_trgm(app)
+        if _db.engine.dialect.name == "sqlite":
+            @event.listens_for(_db.engine, "connect")
+            def _fk(dbapi_con, _):
+                dbapi_con.execute("PRAGMA foreign_keys=ON")
+            _db.engine.dispose()
+    return app
+
+
+@pytest.fixture
+def db(app):
+    """Esquema vacío por test y cachés de proceso limpias. No deja un app context
+    abierto: cada request del cliente usa el suyo (y su propia sesión), como en
+    producción; para tocar la BD desde el test, `with app.app_context():`."""
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+    for c in (catalogo._catalogos, public_cache._fichas, user_cache._usuarios):
+        c.clear()
+    return _db
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app, db):
+    with app.app_context():
+        u = Usuario(nombre="Ada", apellido="Admin", correo="admin@test.cl", rol="admin")
+        u.set_password("secreta123")
+        db.session.add(u)
+        db.session.commit()
+        return u.usuario_id
+
+
+@pytest.fixture
+def login(client, admin):
+    r = client.post("/login", data={"correo": "admin@test.cl", "password": "secreta123"})
+    assert r.status_code == 302
+    return client
+
+
+@pytest.fixture
+def ubicacion(app, db):
+    with app.app_context():
+        u = Ubicacion(comuna="Santiago", nombre_sector="Centro")
+        db.session.add(u)
+        db.session.commit()
+        return u.ubicacion_id
+
+
+@contextmanager
+def contar_consultas(engine):
+    """Cuenta las sentencias enviadas a `engine` dentro del bloque."""
+    n = []
+
+    def _antes(conn, cursor, statement, *a):
+        n.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _antes)
+    try:
+        yield n
+    finally:
+        event.remove(engine, "before_cursor_execute", _antes)
@@ -0,0 +1,84 @@
+# tests/test_animales.py
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import (Animal, FotoAnimal, HistorialEstado, Insumo, Tratamiento, TratamientoInsumo,
+                        Ubicacion, Usuario)
+from .conftest import contar_consultas
+
+
+def _poblar(app, db, desde: int, n: int) -> None:
+    """`n` animales, cada uno con su propia ubicación, usuario y 3 tratamientos
+    (objetos distintos: un lazy load por fila no queda oculto por el identity map)."""
+    hoy = date.today()
+    with app.app_context():
+        _crear(db, hoy, range(desde, desde + n))
+        db.session.commit()
+
+
+def _crear(db, hoy, rango) -> None:
+    for k in rango:
+        u = Usuario(nombre=f"U{k}", apellido="T", correo=f"u{k}@test.cl", rol="veterinario",
+                    hash_contrasena="-")
+        ub = Ubicacion(comuna=f"Comuna {k}", nombre_sector="Sector")
+        a = Animal(nombre=f"Animal {k}", especie="Perro", usuario=u, ubicacion=ub)
+        for d in range(3):
+            a.tratamientos.append(Tratamiento(tipo="Control", usuario=u, fecha_tratamiento=hoy - timedelta(days=d)))
+        db.session.add(a)
+
+
+def _consultas_lista(app, client, db) -> int:
+    with app.app_context():
+        engine = db.engine
+    with contar_consultas(engine) as sentencias:
+        r = client.get("/animales")
+    assert r.status_code == 200
+    return len(sentencias)
+
+
+@pytest.mark.parametrize("n", [10, 40])
+def test_lista_animales_no_crece_con_n(app, login, db, n):
+    _poblar(app, db, 0, 2)
+    _consultas_lista(app, login, db)  # calienta la caché del usuario logueado
+    base = _consultas_lista(app, login, db)
+    _poblar(app, db, 2, n)
+    assert _consultas_lista(app, login, db) == base
+
+
+def _agregar_filas(app, db, animal_id: int, desde: int, n: int) -> None:
+    """`n` fotos, estados y tratamientos con insumo, cada fila con su propio usuario/insumo."""
+    with app.app_context():
+        for k in range(desde, desde + n):
+            u = Usuario(nombre=f"H{k}", apellido="T", correo=f"h{k}@test.cl", rol="veterinario",
+                        hash_contrasena="-")
+            ins = Insumo(nombre=f"Insumo {k}", unidad="ml", stock=10)
+            t = Tratamiento(animal_id=animal_id, tipo="Control", usuario=u, fecha_tratamiento=date.today())
+            t.detalle_insumos.append(TratamientoInsumo(insumo=ins, cantidad=1))
+            db.session.add_all([
+                u, t,
+                FotoAnimal(animal_id=animal_id, filename=f"animal/{animal_id}/{k}.jpg", procesada=True),
+                HistorialEstado(animal_id=animal_id, estado="En tratamiento", usuario=u),
+            ])
+        db.session.commit()
+
+
+@pytest.mark.parametrize("vista", ["", "/historial", "/tratamientos"])
+def test_vistas_del_animal_no_crecen_con_n(app, login, db, ubicacion, vista):
+    """Las opciones de services/cargas.VISTAS cargan todo lo que usa cada plantilla."""
+    with app.app_context():
+        a = Animal(nombre="Luna", especie="Perro", ubicacion_id=ubicacion)
+        db.session.add(a)
+        db.session.commit()
+        aid, engine = a.animal_id, db.engine
+    _agregar_filas(app, db, aid, 0, 1)
+
+    def consultas() -> int:
+        with contar_consultas(engine) as sentencias:
+            assert login.get(f"/animales/{aid}{vista}").status_code == 200
+        return len(sentencias)
+
+    consultas()  # calienta cachés (usuario, catálogos)
+    base = consultas()
+    _agregar_filas(app, db, aid, 1, 8)
+    assert consultas() == base
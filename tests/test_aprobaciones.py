@@ -0,0 +1,163 @@
+# tests/test_aprobaciones.py
+"""Aprobaciones concurrentes. Los tests `pg` necesitan PostgreSQL real
+(FOR UPDATE, lock_timeout); el mapeo 55P03 -> 409 se prueba también sin él."""
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from app.models import Animal, Insumo, LoteInsumo, Tratamiento, TratamientoInsumo
+from app.services import stock
+from app.services.db_pool import es_bloqueo, timeouts_locales
+
+
+def _escenario(app, db, admin, ubicacion, stock_inicial=3, pedidos=(("A", "B"), ("B", "A"))):
+    """Insumos A y B con `stock_inicial` cada uno y un tratamiento Pendiente por
+    pedido, que usa 2 de cada insumo listado (en ese orden de detalle)."""
+    with app.app_context():
+        insumos = {}
+        for nombre in ("A", "B"):
+            i = Insumo(nombre=nombre, unidad="un", stock=0)
+            db.session.add(i)
+            stock.ingresar(i, stock_inicial, None, "Inicial")
+            insumos[nombre] = i
+        a = Animal(nombre="Toby", especie="Perro", usuario_id=admin, ubicacion_id=ubicacion)
+        db.session.add(a)
+        tids = []
+        for pedido in pedidos:
+            t = Tratamiento(tipo="Curación", animal=a, usuario_id=admin)
+            for nombre in pedido:
+                t.detalle_insumos.append(TratamientoInsumo(insumo=insumos[nombre], cantidad=2))
+            db.session.add(t)
+            db.session.flush()
+            tids.append(t.tratamiento_id)
+        db.session.commit()
+        return tids
+
+
+def _aprobar(app, db, tid, resultados, bloqueado=None, soltar=None):
+    with app.app_context():
+        try:
+            timeouts_locales(db.session, lock_ms=5000)
+            r = stock.aprobar_lote([tid])
+            if bloqueado:
+                bloqueado.set()       # ya tiene los FOR UPDATE
+                soltar.wait(5)        # y los retiene mientras el otro hilo intenta aprobar
+            db.session.commit()
+            resultados[tid] = r[0][1]
+        except Exception as e:  # noqa: BLE001 - el test revisa qué fue
+            db.session.rollback()
+            resultados[tid] = e
+        finally:
+            db.session.remove()
+
+
+@pytest.mark.pg
+@pytest.mark.parametrize("ronda", range(5))
+def test_aprobaciones_concurrentes_no_dejan_stock_negativo(app, db, admin, ubicacion, ronda):
+    t1, t2 = _escenario(app, db, admin, ubicacion)
+    resultados, bloqueado, soltar = {}, threading.Event(), threading.Event()
+    h1 = threading.Thread(target=_aprobar, args=(app, db, t1, resultados, bloqueado, soltar))
+    h2 = threading.Thread(target=_aprobar, args=(app, db, t2, resultados))
+    h1.start()
+    assert bloqueado.wait(5)
+    h2.start()
+    h2.join(0.3)
+    assert h2.is_alive(), "la segunda aprobación debe esperar los FOR UPDATE de la primera"
+    soltar.set()
+    h1.join(10)
+    h2.join(10)
+
+    # Ni deadlock (40P01) ni lock_timeout: la segunda esperó y vio el stock ya descontado
+    assert resultados == {t1: True, t2: False}
+    with app.app_context():
+        saldos = db.session.execute(select(Insumo.nombre, Insumo.stock)).all()
+        assert dict(saldos) == {"A": 1, "B": 1}
+        assert db.session.scalar(select(LoteInsumo.cantidad).where(LoteInsumo.cantidad < 0)) is None
+        assert stock.descuadres() == []
+
+
+@pytest.mark.pg
+@pytest.mark.parametrize("ronda", range(10))
+def test_aprobaciones_simultaneas_en_orden_opuesto(app, db, admin, ubicacion, ronda):
+    """Sin retención artificial: dos aprobaciones que listan los mismos insumos en
+    orden opuesto arrancan a la vez. Con bloqueo ordenado nunca hay deadlock."""
+    t1, t2 = _escenario(app, db, admin, ubicacion, stock_inicial=100)
+    resultados, inicio = {}, threading.Barrier(2)
+
+    def correr(tid):
+        inicio.wait(5)
+        _aprobar(app, db, tid, resultados)
+
+    hilos = [threading.Thread(target=correr, args=(t,)) for t in (t1, t2)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join(10)
+    assert resultados == {t1: True, t2: True}
+    with app.app_context():
+        assert dict(db.session.execute(select(Insumo.nombre, Insumo.stock)).all()) == {"A": 96, "B": 96}
+
+
+@pytest.mark.pg
+def test_lock_timeout_responde_409(app, db, login, admin, ubicacion):
+    (t1,) = _escenario(app, db, admin, ubicacion, pedidos=(("A",),))
+    app.config["APROBACION_LOCK_TIMEOUT_MS"] = 200
+    try:
+        with app.app_context():
+            engine = db.engine
+        with engine.connect() as otra:
+            otra.execute(text("SELECT 1 FROM insumo FOR UPDATE"))  # otra aprobación retiene los insumos
+            r = login.post("/tratamientos/aprobar", json={"tratamiento_ids": [t1]})
+            otra.rollback()
+    finally:
+        app.config["APROBACION_LOCK_TIMEOUT_MS"] = 3000
+    assert r.status_code == 409
+    with app.app_context():
+        assert db.session.get(Tratamiento, t1).estado == "Pendiente"
+        assert db.session.scalar(select(Insumo.stock)) == 3
+
+
+class _Orig(Exception):
+    sqlstate = "55P03"
+
+
+def test_es_bloqueo_lee_el_sqlstate():
+    assert es_bloqueo(OperationalError("SELECT", {}, _Orig()))
+    assert not es_bloqueo(OperationalError("SELECT", {}, Exception()))
+
+
+def test_bloqueo_en_lote_json_es_409(app, db, login, admin, ubicacion, monkeypatch):
+    (t1,) = _escenario(app, db, admin, ubicacion, pedidos=(("A",),))
+
+    def bloqueado(*a, **kw):
+        raise OperationalError("SELECT ... FOR UPDATE", {}, _Orig())
+
+    monkeypatch.setattr(stock, "aprobar_lote", bloqueado)
+    r = login.post("/tratamientos/aprobar", json={"tratamiento_ids": [t1]})
+    assert r.status_code == 409
+    assert "bloqueados" in r.get_json()["error"]
+
+
+@pytest.mark.parametrize("pedidos, en_lote", [((("A",),), False), ((("A",), ("B",)), True)])
+def test_casillas_y_formulario_de_lote_van_juntos(app, db, login, admin, ubicacion, pedidos, en_lote):
+    _escenario(app, db, admin, ubicacion, pedidos=pedidos)
+    with app.app_context():
+        aid = db.session.scalar(select(Animal.animal_id))
+    html = login.get(f"/animales/{aid}/tratamientos").get_data(as_text=True)
+    assert ('form="aprobar-lote"' in html) is en_lote
+    assert ('id="aprobar-lote"' in html) is en_lote
+    assert html.count('form="aprobar-lote"') == (len(pedidos) if en_lote else 0)
+
+
+def test_agregar_linea_suma_y_avisa_si_supera_stock(app, db, login, admin, ubicacion):
+    (tid,) = _escenario(app, db, admin, ubicacion, pedidos=(("A",),))
+    with app.app_context():
+        iid = db.session.scalar(select(Insumo.insumo_id).where(Insumo.nombre == "A"))
+    r = login.post(f"/tratamientos/{tid}/detalle/agregar", data={"insumo_id": iid, "cantidad": "2"},
+                   follow_redirects=True)
+    assert r.status_code == 200 and "supera stock actual" in r.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(TratamientoInsumo, (tid, iid)).cantidad == Decimal("4")
@@ -0,0 +1,47 @@
+# tests/test_catalogo.py
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app.models import CatalogoVersion, Insumo, Ubicacion
+from app.services import catalogo, stock
+
+
+def test_cambio_de_otro_worker_invalida_la_copia(app, db, ubicacion):
+    with app.app_context():
+        assert [u.comuna for u in catalogo.ubicaciones()] == ["Santiago"]
+        # Otro worker: inserta y sube la versión en su transacción, sin pasar por esta caché
+        db.session.add(Ubicacion(comuna="Arica", nombre_sector="Norte"))
+        db.session.add(CatalogoVersion(tipo="ubicaciones", version=7))
+        db.session.commit()
+        assert [u.comuna for u in catalogo.ubicaciones()] == ["Arica", "Santiago"]
+
+
+def test_marcar_se_revierte_con_la_transaccion(app, db, ubicacion):
+    with app.app_context():
+        catalogo.ubicaciones()
+        db.session.add(Ubicacion(comuna="Arica", nombre_sector="Norte"))
+        catalogo.marcar("ubicaciones")
+        db.session.rollback()
+        assert catalogo._version("ubicaciones") == 0
+        catalogo.marcar("ubicaciones")
+        db.session.commit()
+        assert catalogo._version("ubicaciones") == 1
+
+
+def test_stock_del_select_no_sale_de_la_cache(app, db):
+    with app.app_context():
+        i = Insumo(nombre="Vacuna", unidad="dosis", stock=Decimal("0"))
+        db.session.add(i)
+        catalogo.marcar("insumos")
+        stock.ingresar(i, Decimal("10"), None, "Inicial")
+        db.session.commit()
+        assert catalogo.para_select("insumos")[0].stock == 10
+        version = catalogo._version("insumos")
+
+        stock.registrar(i, Decimal("-4"), "Ajuste")
+        db.session.commit()
+        # un movimiento de stock no invalida el catálogo, pero el <select> ve el saldo nuevo
+        assert catalogo._version("insumos") == version
+        assert catalogo.para_select("insumos")[0].stock == 6
+        assert catalogo.texto(catalogo.buscar("insumos", "vac")[0]) == "Vacuna (stock: 6.00)"
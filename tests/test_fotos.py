@@ -0,0 +1,90 @@
+# tests/test_fotos.py
+"""Una foto recién subida (con EXIF/GPS) no se sirve hasta que process_upload la limpia."""
+import io
+
+from PIL import Image
+
+from app.blueprints import animales as animales_bp
+from app.models import Animal, FotoAnimal
+from app.services.images import process_upload, rendition_name
+from app.services.storage import get_storage
+
+
+def _jpeg_con_gps() -> bytes:
+    im = Image.new("RGB", (64, 48), "red")
+    exif = Image.Exif()
+    exif[0x010F] = "Camara"                            # Make
+    exif.get_ifd(0x8825)[2] = (33.0, 27.0, 0.0)        # GPSLatitude
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+def _animal(app, db, ubicacion, admin) -> int:
+    with app.app_context():
+        a = Animal(nombre="Luna", especie="Perro", ubicacion_id=ubicacion, usuario_id=admin)
+        db.session.add(a)
+        db.session.commit()
+        return a.animal_id
+
+
+def _subir(client, animal_id):
+    r = client.post(f"/animales/{animal_id}/fotos/subir",
+                    data={"foto": (io.BytesIO(_jpeg_con_gps()), "luna.jpg")},
+                    content_type="multipart/form-data")
+    assert r.status_code == 302
+
+
+def _foto(app, animal_id):
+    with app.app_context():
+        f = FotoAnimal.query.filter_by(animal_id=animal_id).one()
+        return f.foto_id, f.filename, f.procesada
+
+
+def test_subida_sin_procesar_no_se_sirve(app, db, login, ubicacion, admin, monkeypatch):
+    monkeypatch.setattr(animales_bp, "submit", lambda fn, *a, **kw: None)
+    aid = _animal(app, db, ubicacion, admin)
+    _subir(login, aid)
+    foto_id, rel, procesada = _foto(app, aid)
+    assert not procesada
+    assert login.get(f"/media/{rel}").status_code == 404
+    html = login.get(f"/animales/{aid}").get_data(as_text=True)
+    assert rel not in html and "foto-procesando.svg" in html
+
+    with app.app_context():
+        process_upload(foto_id)
+        assert not get_storage().exists(rel)
+    _, final, procesada = _foto(app, aid)
+    assert procesada and final != rel
+    for key in (final, rendition_name(final, "md")):
+        r = login.get(f"/media/{key}")
+        assert r.status_code == 200 and r.cache_control.immutable
+    with Image.open(io.BytesIO(login.get(f"/media/{final}").data)) as im:
+        assert not im.getexif()
+    assert final in login.get(f"/animales/{aid}").get_data(as_text=True)
+
+
+def test_gif_animado_pasa_a_nombre_publico(app, db, login, ubicacion, admin, monkeypatch):
+    monkeypatch.setattr(animales_bp, "submit", lambda fn, *a, **kw: None)
+    aid = _animal(app, db, ubicacion, admin)
+    buf = io.BytesIO()
+    cuadros = [Image.new("RGB", (16, 16), c) for c in ("red", "green", "blue")]
+    cuadros[0].save(buf, format="GIF", save_all=True, append_images=cuadros[1:])
+    with Image.open(io.BytesIO(buf.getvalue())) as im:
+        assert im.is_animated
+    login.post(f"/animales/{aid}/fotos/subir", data={"foto": (io.BytesIO(buf.getvalue()), "a.gif")},
+               content_type="multipart/form-data")
+    foto_id, rel, _ = _foto(app, aid)
+    with app.app_context():
+        process_upload(foto_id)
+    _, final, procesada = _foto(app, aid)
+    assert procesada and final != rel
+    r = login.get(f"/media/{final}")
+    assert r.status_code == 200 and r.data == buf.getvalue()
+    assert login.get(f"/media/{rel}").status_code == 404
+
+
+def test_cuarentena_no_se_sirve(app, db, client):
+    with app.app_context():
+        get_storage().save("_cuarentena/2026-01-01/animal/1/x.jpg", io.BytesIO(b"x"))
+    assert client.get("/media/_cuarentena/2026-01-01/animal/1/x.jpg").status_code == 404
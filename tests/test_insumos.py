@@ -0,0 +1,115 @@
+# tests/test_insumos.py
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, inspect
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Insumo, LoteInsumo, MovimientoInsumo
+
+HOY = date.today()
+PRONTO, LUEGO = HOY + timedelta(days=10), HOY + timedelta(days=90)
+
+
+def _insumo(app, db, **lotes):
+    """Insumo 'Vacuna' con un lote de 5 por cada fecha dada."""
+    from app.services.stock import ingresar
+    with app.app_context():
+        i = Insumo(nombre="Vacuna", unidad="dosis", stock=0)
+        db.session.add(i)
+        for fv in lotes.values():
+            ingresar(i, 5, fv, "Inicial")
+        db.session.commit()
+        return i.insumo_id
+
+
+def _flashes(client):
+    with client.session_transaction() as s:
+        return [m for _, m in s.get("_flashes", [])]
+
+
+def test_ajuste_positivo_rechaza_vencimiento_pasado(app, db, login):
+    iid = _insumo(app, db, a=LUEGO)
+    r = login.post(f"/insumos/{iid}/ajustar", data={"delta": "3", "fecha_vencimiento": "2020-01-01"})
+    assert r.status_code == 302
+    assert "La fecha de vencimiento no puede ser pasada." in _flashes(login)
+    with app.app_context():
+        i = db.session.get(Insumo, iid)
+        assert i.stock == 5 and i.fecha_vencimiento == LUEGO
+        assert db.session.query(LoteInsumo).count() == 1
+
+
+def test_crear_sin_stock_avisa_que_ignora_el_vencimiento(app, db, login):
+    r = login.post("/insumos", data={"nombre": "Gasa", "unidad": "un", "stock": "0",
+                                     "fecha_vencimiento": LUEGO.isoformat()})
+    assert r.status_code == 302
+    assert any("se ignoró la fecha de vencimiento" in m for m in _flashes(login))
+
+
+def test_corregir_vencimiento_de_lote_resincroniza_el_insumo(app, db, login):
+    iid = _insumo(app, db, a=PRONTO, b=LUEGO)
+    with app.app_context():
+        lote_pronto = db.session.query(LoteInsumo).filter_by(fecha_vencimiento=PRONTO).one().lote_id
+    nueva = HOY + timedelta(days=200)
+    r = login.post(f"/insumos/{iid}/lotes/{lote_pronto}/vencimiento",
+                   data={"fecha_vencimiento": nueva.isoformat()})
+    assert r.status_code == 302
+    with app.app_context():
+        assert db.session.get(LoteInsumo, lote_pronto).fecha_vencimiento == nueva
+        assert db.session.get(Insumo, iid).fecha_vencimiento == LUEGO
+
+    r = login.post(f"/insumos/{iid}/lotes/{lote_pronto}/vencimiento", data={"fecha_vencimiento": "2020-01-01"})
+    assert "La fecha de vencimiento no puede ser pasada." in _flashes(login)
+    with app.app_context():
+        assert db.session.get(LoteInsumo, lote_pronto).fecha_vencimiento == nueva
+
+
+def test_corregir_vencimiento_de_lote_ajeno_es_404(app, db, login):
+    iid = _insumo(app, db, a=PRONTO)
+    r = login.post(f"/insumos/{iid}/lotes/999/vencimiento", data={"fecha_vencimiento": LUEGO.isoformat()})
+    assert r.status_code == 404
+
+
+def test_edicion_muestra_formulario_por_lote(app, db, login):
+    iid = _insumo(app, db, a=PRONTO)
+    r = login.get(f"/insumos/{iid}/editar")
+    assert r.status_code == 200
+    assert f"/insumos/{iid}/lotes/".encode() in r.data
+
+
+def test_insumo_con_movimientos_no_se_elimina(app, db, login):
+    iid = _insumo(app, db, a=LUEGO)
+    r = login.post(f"/insumos/{iid}/eliminar")
+    assert r.status_code == 302
+    assert any("movimientos de stock" in m for m in _flashes(login))
+    with app.app_context():
+        assert db.session.get(Insumo, iid) is not None
+        assert db.session.query(MovimientoInsumo).filter_by(insumo_id=iid).count() == 1
+        # también en la BD: el libro no se borra en cascada
+        with pytest.raises(IntegrityError):
+            db.session.execute(delete(Insumo).where(Insumo.insumo_id == iid))
+            db.session.flush()
+        db.session.rollback()
+
+
+def test_insumo_sin_movimientos_se_elimina(app, db, login):
+    iid = _insumo(app, db)
+    login.post(f"/insumos/{iid}/eliminar")
+    with app.app_context():
+        assert db.session.get(Insumo, iid) is None
+
+
+def test_movimientos_traen_el_usuario(app, db, admin):
+    from app.services.stock import ingresar, movimientos
+    with app.app_context():
+        i = Insumo(nombre="Gasa", unidad="un", stock=0)
+        db.session.add(i)
+        for _ in range(3):
+            ingresar(i, 1, None, "Ingreso", usuario_id=admin)
+        db.session.commit()
+        iid = i.insumo_id
+        db.session.expunge_all()
+        movs = movimientos(iid)
+        assert len(movs) == 3
+        assert all("usuario" not in inspect(m).unloaded for m in movs)
+        assert {m.usuario.correo for m in movs} == {"admin@test.cl"}
@@ -0,0 +1,80 @@
+# tests/test_kpi.py
+import threading
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Animal, KpiResumen
+from app.services import kpi
+
+
+def _animal(app, db, admin, ubicacion):
+    with app.app_context():
+        db.session.add(Animal(nombre="Toby", especie="Perro", usuario_id=admin, ubicacion_id=ubicacion))
+        db.session.commit()
+
+
+def _filas_resumen(app, db) -> int:
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(KpiResumen))
+
+
+def test_primera_carga_se_calcula_en_vivo_y_se_persiste(app, db, login, admin, ubicacion):
+    _animal(app, db, admin, ubicacion)
+    r = login.get("/panel")
+    assert r.status_code == 200
+    assert b"Perro" in r.data
+    assert _filas_resumen(app, db) > 0  # BACKGROUND_SYNC: el refresco de fondo ya corrió
+
+
+def test_primera_carga_tolera_refresco_simultaneo(app, db, login, admin, ubicacion, monkeypatch):
+    _animal(app, db, admin, ubicacion)
+
+    def otro_worker_gano(*a, **kw):
+        raise IntegrityError("INSERT INTO kpi_resumen", {}, Exception("duplicate key"))
+
+    monkeypatch.setattr(kpi, "refrescar", otro_worker_gano)
+    r = login.get("/panel")
+    assert r.status_code == 200
+    assert b"Perro" in r.data
+
+
+class _SinCandado:
+    """Sustituye el candado de proceso: cada hilo hace de un worker distinto."""
+
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+    def locked(self):
+        return False
+
+
+@pytest.mark.pg
+def test_refrescos_simultaneos_de_dos_workers(app, db, admin, ubicacion, monkeypatch):
+    _animal(app, db, admin, ubicacion)
+    monkeypatch.setattr(kpi, "_refrescando", _SinCandado())
+    errores, inicio = [], threading.Barrier(2)
+
+    def worker():
+        with app.app_context():
+            try:
+                inicio.wait(5)
+                kpi._refrescar_en_fondo()
+            except Exception as e:  # noqa: BLE001
+                errores.append(e)
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=worker) for _ in range(2)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join(10)
+    assert errores == []
+    with app.app_context():
+        datos, ts = kpi.leer()
+    assert ts is not None and datos["especie"] == [("Perro", 1)]
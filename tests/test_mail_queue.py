@@ -0,0 +1,179 @@
+# tests/test_mail_queue.py
+"""deliver_pending contra un sumidero SMTP local (aiosmtpd)."""
+import asyncio, socket
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models import CorreoSaliente
+from app.services import mail_queue
+from app.services.mail import SmtpTransport
+
+
+aiosmtpd = pytest.importorskip("aiosmtpd.controller")
+
+
+class _Sumidero:
+    """Handler de aiosmtpd: guarda los mensajes y cuenta conexiones (un EHLO por conexión).
+
+    `rechazar`: responde 451 al MAIL FROM. `cortar`: cierra la conexión tras cada mensaje.
+    """
+
+    def __init__(self):
+        self.mensajes, self.conexiones, self.rechazar, self.cortar = [], 0, False, False
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.conexiones += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.rechazar:
+            return "451 intente más tarde"
+        envelope.mail_from = address
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes.append(envelope.content.decode(errors="replace"))
+        if self.cortar:
+            asyncio.get_running_loop().call_soon(server.transport.close)
+        return "250 OK"
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    sumidero = _Sumidero()
+    ctl = aiosmtpd.Controller(sumidero, hostname="127.0.0.1", port=_puerto_libre())
+    ctl.start()
+    for k, v in (("MAIL_TRANSPORT", "smtp"), ("MAIL_SERVER", "127.0.0.1"), ("MAIL_PORT", ctl.port),
+                 ("MAIL_USE_TLS", False), ("MAIL_USERNAME", ""), ("MAIL_PASSWORD", ""),
+                 ("MAIL_DEFAULT_SENDER", "patitas@test.cl"), ("MAIL_RETRY_BASE_SECONDS", 30),
+                 ("MAIL_MAX_ATTEMPTS", 3)):
+        monkeypatch.setitem(app.config, k, v)
+    yield sumidero
+    ctl.stop()
+
+
+def _encolar(app, db, n: int) -> list:
+    with app.app_context():
+        for k in range(n):
+            mail_queue.enqueue_email(f"dest{k}@test.cl", f"Asunto {k}", f"clave temporal {k}")
+        db.session.commit()
+        return [c.correo_id for c in db.session.query(CorreoSaliente).order_by(CorreoSaliente.correo_id)]
+
+
+def test_entrega_la_bandeja_en_una_conexion_y_borra_el_cuerpo(app, db, smtp):
+    _encolar(app, db, 4)
+    with app.app_context():
+        assert mail_queue.deliver_pending() == 4
+        assert mail_queue.deliver_pending() == 0
+        correos = db.session.query(CorreoSaliente).all()
+        assert {c.estado for c in correos} == {"Enviado"}
+        assert all(c.cuerpo == "" and c.intentos == 1 and c.enviado_en for c in correos)
+    assert len(smtp.mensajes) == 4 and smtp.conexiones == 1
+    assert "clave temporal 0" in smtp.mensajes[0]
+
+
+def test_reintento_con_backoff_y_descarte(app, db, smtp):
+    (cid,) = _encolar(app, db, 1)
+    smtp.rechazar = True
+    with app.app_context():
+        assert mail_queue.deliver_pending() == 0
+        c = db.session.get(CorreoSaliente, cid)
+        assert (c.estado, c.intentos) == ("Pendiente", 1)
+        assert "451" in c.ultimo_error and c.cuerpo == "clave temporal 0"
+        espera = c.proximo_intento - mail_queue._utcnow()
+        assert timedelta(seconds=25) < espera <= timedelta(seconds=30)
+
+        # aún no vence: ni se intenta
+        assert mail_queue.deliver_pending() == 0
+        assert db.session.get(CorreoSaliente, cid).intentos == 1
+
+        c.proximo_intento -= timedelta(seconds=31)
+        db.session.commit()
+        assert mail_queue.deliver_pending() == 0
+        c = db.session.get(CorreoSaliente, cid)
+        espera = c.proximo_intento - mail_queue._utcnow()
+        assert c.intentos == 2 and timedelta(seconds=55) < espera <= timedelta(seconds=60)  # se duplica
+
+        # el servidor se recupera: se envía, se borra el cuerpo y se limpia el error
+        smtp.rechazar = False
+        c.proximo_intento -= timedelta(seconds=61)
+        db.session.commit()
+        assert mail_queue.deliver_pending() == 1
+        c = db.session.get(CorreoSaliente, cid)
+        assert (c.estado, c.intentos, c.cuerpo, c.ultimo_error) == ("Enviado", 3, "", None)
+    assert len(smtp.mensajes) == 1
+
+
+def test_fallido_tras_max_intentos(app, db, smtp):
+    (cid,) = _encolar(app, db, 1)
+    smtp.rechazar = True
+    with app.app_context():
+        for _ in range(3):
+            c = db.session.get(CorreoSaliente, cid)
+            c.proximo_intento = mail_queue._utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            mail_queue.deliver_pending()
+        c = db.session.get(CorreoSaliente, cid)
+        assert (c.estado, c.intentos) == ("Fallido", 3)
+        assert mail_queue.deliver_pending() == 0
+
+
+def test_envio_fuera_de_transaccion_con_reserva(app, db, smtp, monkeypatch):
+    (cid,) = _encolar(app, db, 1)
+    vistos = []
+
+    def enviar(to, subject, body):
+        # durante el envío no hay transacción abierta ni fila bloqueada; la reserva ya está confirmada
+        vistos.append(db.session().in_transaction())
+        with db.engine.connect() as conn:
+            vistos.append(conn.execute(select(CorreoSaliente.proximo_intento)
+                                       .where(CorreoSaliente.correo_id == cid)).scalar_one())
+
+    monkeypatch.setattr(mail_queue, "send_email", enviar)
+    with app.app_context():
+        antes = mail_queue._utcnow()
+        assert mail_queue.deliver_pending() == 1
+        assert vistos[0] is False
+        assert vistos[1] >= antes + timedelta(seconds=299)
+        assert db.session.get(CorreoSaliente, cid).estado == "Enviado"
+
+
+def test_reserva_vencida_se_reintenta(app, db, smtp):
+    (cid,) = _encolar(app, db, 1)
+    with app.app_context():
+        assert mail_queue._claim_next()[0] == cid
+        # el proceso "murió" tras reservar: nadie más lo toma hasta que vence el arriendo
+        assert mail_queue._claim_next() is None
+        c = db.session.get(CorreoSaliente, cid)
+        c.proximo_intento = mail_queue._utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert mail_queue.deliver_pending() == 1
+    assert len(smtp.mensajes) == 1
+
+
+def test_rechazo_smtp_no_reconecta_ni_reenvia(app, db, smtp):
+    _encolar(app, db, 2)
+    smtp.rechazar = True
+    with app.app_context():
+        assert mail_queue.deliver_pending() == 0
+    # un 451 por correo, sobre la misma conexión: ni reconexión ni segundo envío
+    assert smtp.conexiones == 1 and smtp.mensajes == []
+
+
+def test_conexion_cerrada_por_el_servidor_se_reabre(app, db, smtp, monkeypatch):
+    smtp.cortar = True
+    _encolar(app, db, 3)
+    # sin NOOP previo: la caída se descubre al enviar y se reintenta una vez
+    monkeypatch.setattr(SmtpTransport, "_alive", lambda self: self._conn is not None)
+    with app.app_context():
+        assert mail_queue.deliver_pending() == 3
+    assert len(smtp.mensajes) == 3 and smtp.conexiones == 3
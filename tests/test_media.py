@@ -0,0 +1,68 @@
+# tests/test_media.py
+"""/media/ servido desde S3 (moto): Range, redirección al bucket público y caché."""
+import pytest
+
+from app.services.storage import S3Storage
+
+DATOS = bytes(range(256)) * 40  # 10 KB
+CLAVE = "animal/1/abc.jpg"
+
+
+@pytest.fixture
+def s3(app, db, monkeypatch):
+    moto = pytest.importorskip("moto")
+    for var, val in (("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"),
+                     ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(var, val)
+    with moto.mock_aws():
+        st = S3Storage("patitas", prefix="fotos", region_name="us-east-1")
+        st.client.create_bucket(Bucket="patitas")
+        st.client.put_object(Bucket="patitas", Key="fotos/" + CLAVE, Body=DATOS, ContentType="image/jpeg")
+        monkeypatch.setitem(app.extensions, "patitas_storage", st)
+        monkeypatch.setitem(app.config, "S3_PUBLIC_BASE_URL", None)
+        yield st
+
+
+def test_s3_completo_inmutable(client, s3):
+    r = client.get(f"/media/{CLAVE}")
+    assert r.status_code == 200 and r.data == DATOS
+    assert r.mimetype == "image/jpeg" and r.headers["Accept-Ranges"] == "bytes"
+    assert r.cache_control.immutable and r.cache_control.max_age == 31536000
+
+
+def test_s3_range_206(client, s3):
+    r = client.get(f"/media/{CLAVE}", headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206 and r.data == DATOS[100:200]
+    assert r.headers["Content-Range"] == f"bytes 100-199/{len(DATOS)}"
+    assert r.content_length == 100 and r.cache_control.immutable
+
+    r = client.get(f"/media/{CLAVE}", headers={"Range": "bytes=-10"})
+    assert r.status_code == 206 and r.data == DATOS[-10:]
+
+    assert client.get(f"/media/{CLAVE}", headers={"Range": f"bytes={len(DATOS)}-"}).status_code == 416
+
+
+def test_s3_redireccion_sin_cache_inmutable(app, client, s3, monkeypatch):
+    monkeypatch.setitem(app.config, "S3_PUBLIC_BASE_URL", "https://cdn.test/")
+    r = client.get(f"/media/{CLAVE}")
+    assert r.status_code == 302
+    assert r.headers["Location"] == f"https://cdn.test/fotos/{CLAVE}"
+    assert not r.cache_control.immutable and r.cache_control.max_age <= 300
+
+
+def test_s3_clave_inexistente_404(client, s3):
+    r = client.get("/media/animal/1/no-existe.jpg")
+    assert r.status_code == 404 and not r.cache_control.immutable
+
+
+def test_s3_condicional_304(client, s3):
+    etag = client.get(f"/media/{CLAVE}").headers["ETag"]
+    r = client.get(f"/media/{CLAVE}", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.data == b""
+    assert r.cache_control.immutable
+    assert client.get(f"/media/{CLAVE}", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_s3_clave_interna_404(client, s3):
+    s3.client.put_object(Bucket="patitas", Key="fotos/animal/1/_subida.jpg", Body=b"exif")
+    assert client.get("/media/animal/1/_subida.jpg").status_code == 404
@@ -0,0 +1,55 @@
+# tests/test_paginacion.py
+import re
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Date, Float, Numeric, column
+
+from app.models import Insumo
+from app.services.pagination import _coerce, _encode_cursor
+
+
+def _siguiente(html: bytes):
+    m = re.search(r'after=([\w-]+)', html.decode())
+    return m and m.group(1)
+
+
+def test_recorre_todas_las_paginas(app, db, login):
+    with app.app_context():
+        db.session.add_all(Insumo(nombre=f"Insumo {k:02}", unidad="un", stock=0) for k in range(7))
+        db.session.commit()
+    vistos, url = [], "/insumos?size=3"
+    while url:
+        r = login.get(url)
+        assert r.status_code == 200
+        vistos += re.findall(r"Insumo \d\d", r.data.decode())
+        after = _siguiente(r.data)
+        url = f"/insumos?size=3&after={after}" if after else None
+    assert sorted(set(vistos)) == [f"Insumo {k:02}" for k in range(7)]
+
+
+@pytest.mark.parametrize("url, valores", [
+    ("/animales", ["abc"]),                          # animal_id no es entero
+    ("/animales", [1.5]),
+    ("/animales", [True]),
+    ("/insumos", [3, 1]),                            # nombre no es texto
+    ("/usuarios", [1, "admin", "Admin", 1]),         # activo no es booleano
+])
+def test_cursor_con_tipos_que_no_calzan_es_400(app, db, login, url, valores):
+    r = login.get(f"{url}?after={_encode_cursor(valores)}")
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("after", ["basura", _encode_cursor({"a": 1}), _encode_cursor([1, 2])])
+def test_cursor_ilegible_es_400(app, db, login, after):
+    assert login.get(f"/animales?after={after}").status_code == 400
+
+
+def test_coerce_reconstruye_tipos_del_cursor():
+    assert _coerce(column("r", Float()), 1) == 1.0
+    assert _coerce(column("n", Numeric(10, 2)), "2.50") == Decimal("2.50")
+    assert _coerce(column("d", Date()), "2026-10-17") == date(2026, 10, 17)
+    assert _coerce(column("n", Numeric(10, 2)), None) is None
+    with pytest.raises(ValueError):
+        _coerce(column("d", Date()), 20261017)
@@ -0,0 +1,79 @@
+# tests/test_qr_sheet.py
+import os, tempfile
+from collections import namedtuple
+
+import pytest
+from PIL import PdfParser
+
+from app.services import qr_sheet
+
+A = namedtuple("A", "animal_id nombre especie codigo_qr")
+ANIMALES = [A(k, f"Perro {k}", "Perro", f"token-{k}") for k in range(1, 12)]
+
+
+def _paginas(fp) -> list:
+    """MediaBox de cada página, leyendo el PDF con el parser de Pillow."""
+    fp.seek(0)
+    pdf = PdfParser.PdfParser(buf=fp.read())
+    return [list(pdf.read_indirect(ref)[b"MediaBox"]) for ref in pdf.pages]
+
+
+def test_pdf_una_pagina_a4_por_hoja(app):
+    with app.app_context(), tempfile.TemporaryFile() as fp:
+        assert qr_sheet.write_sheet_pdf(ANIMALES, fp, cols=2, rows=2, workers=1) == 3
+        cajas = _paginas(fp)
+    assert len(cajas) == 3
+    ancho, alto = qr_sheet.PAGE_W * 72 / qr_sheet.DPI, qr_sheet.PAGE_H * 72 / qr_sheet.DPI
+    assert all(c[2] == pytest.approx(ancho) and c[3] == pytest.approx(alto) for c in cajas)
+
+
+def test_pdf_se_escribe_hoja_a_hoja(app, monkeypatch):
+    escrito_al_pedir = []
+    original = qr_sheet.iter_sheet_pages
+
+    with tempfile.TemporaryFile() as fp:
+        def espia(*a, **kw):
+            for pagina in original(*a, **kw):
+                yield pagina
+                escrito_al_pedir.append(os.fstat(fp.fileno()).st_size)  # antes de componer la siguiente
+
+        monkeypatch.setattr(qr_sheet, "iter_sheet_pages", espia)
+        with app.app_context():
+            qr_sheet.write_sheet_pdf(ANIMALES, fp, cols=2, rows=2, workers=1)
+    assert len(escrito_al_pedir) == 3
+    assert 0 < escrito_al_pedir[0] < escrito_al_pedir[1] < escrito_al_pedir[2]
+
+
+def test_pdf_sin_animales_tiene_una_hoja_en_blanco(app):
+    with app.app_context(), tempfile.TemporaryFile() as fp:
+        assert qr_sheet.write_sheet_pdf([], fp) == 1
+        assert len(_paginas(fp)) == 1
+
+
+def test_endpoint_hoja_qr_pdf(app, db, login, admin, ubicacion):
+    from app.models import Animal
+    with app.app_context():
+        db.session.add_all(Animal(nombre=f"Toby {k}", especie="Perro", usuario_id=admin, ubicacion_id=ubicacion)
+                           for k in range(3))
+        db.session.commit()
+    r = login.get(f"/animales/qr/hoja?ubicacion_id={ubicacion}")
+    assert r.status_code == 200 and r.mimetype == "application/pdf"
+    assert r.data.startswith(b"%PDF") and r.data.rstrip().endswith(b"%%EOF")
+
+
+def test_endpoint_hoja_qr_no_crea_procesos(app, db, login, admin, ubicacion, monkeypatch):
+    """Dentro del request no se hace fork, aunque la selección ocupe varias hojas."""
+    from app.models import Animal
+
+    def prohibido(*a, **kw):
+        raise AssertionError("ProcessPoolExecutor dentro de un request")
+
+    monkeypatch.setattr(qr_sheet, "ProcessPoolExecutor", prohibido)
+    monkeypatch.setitem(app.config, "QR_SHEET_WORKERS", 4)
+    with app.app_context():
+        db.session.add_all(Animal(nombre=f"Toby {k}", especie="Perro", usuario_id=admin, ubicacion_id=ubicacion)
+                           for k in range(30))
+        db.session.commit()
+    for formato in ("pdf", "zip"):
+        r = login.get(f"/animales/qr/hoja?ubicacion_id={ubicacion}&formato={formato}")
+        assert r.status_code == 200 and len(r.data) > 0
@@ -0,0 +1,41 @@
+# tests/test_recordatorios.py
+from datetime import date, timedelta
+
+from app.models import Animal, CorreoSaliente, HistorialEstado, RecordatorioControl, Usuario
+from app.services import recordatorios
+
+
+def _controles(app, db, ubicacion, n: int) -> list:
+    """`n` veterinarios, cada uno con un animal cuyo control es mañana."""
+    with app.app_context():
+        for k in range(n):
+            u = Usuario(nombre=f"V{k}", apellido="T", correo=f"v{k}@test.cl", rol="veterinario",
+                        hash_contrasena="-")
+            a = Animal(nombre=f"Animal {k}", especie="Perro", usuario=u, ubicacion_id=ubicacion)
+            db.session.add(HistorialEstado(animal=a, usuario=u, estado="Observacion",
+                                           proximo_control=date.today() + timedelta(days=1)))
+        db.session.commit()
+        return [h.historial_id for h in db.session.query(HistorialEstado).order_by(HistorialEstado.historial_id)]
+
+
+def test_un_correo_por_usuario_y_no_se_repite(app, db, ubicacion):
+    _controles(app, db, ubicacion, 3)
+    with app.app_context():
+        assert recordatorios.procesar() == 3
+        assert recordatorios.procesar() == 0
+        assert db.session.query(CorreoSaliente).count() == 3
+
+
+def test_conflicto_solo_salta_a_ese_usuario(app, db, ubicacion, monkeypatch):
+    hids = _controles(app, db, ubicacion, 3)
+    with app.app_context():
+        vistos = recordatorios.pendientes(date.today())
+        # otro worker registra el del segundo usuario entre la lectura y la escritura
+        db.session.add(RecordatorioControl(historial_id=hids[1], tipo="Proximo"))
+        db.session.commit()
+        monkeypatch.setattr(recordatorios, "pendientes", lambda hoy: vistos)
+
+        assert recordatorios.procesar() == 2
+        destinos = {c.destinatario for c in db.session.query(CorreoSaliente)}
+        assert destinos == {"v0@test.cl", "v2@test.cl"}
+        assert db.session.query(RecordatorioControl).count() == 3
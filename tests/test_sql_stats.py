@@ -0,0 +1,40 @@
+# tests/test_sql_stats.py
+import pytest
+from flask import g
+from sqlalchemy import text
+
+from app import create_app
+from app.config import Config
+
+
+@pytest.fixture
+def app_stats(db, admin, monkeypatch):
+    """Otra app sobre la misma BD, creada con SQL_STATS=1 (se lee en create_app)."""
+    monkeypatch.setattr(Config, "SQL_STATS", True)
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_cabecera_server_timing(app_stats):
+    c = app_stats.test_client()
+    c.post("/login", data={"correo": "admin@test.cl", "password": "secreta123"})
+    r = c.get("/animales")
+    assert r.status_code == 200
+    cabecera = r.headers["Server-Timing"]
+    assert cabecera.startswith("db;dur=") and 'consultas"' in cabecera
+    n = int(cabecera.split('desc="')[1].split()[0])
+    assert n >= 1
+
+
+def test_sentencia_fallida_no_deja_estado(app_stats, db):
+    with app_stats.test_request_context():
+        with db.engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM tabla_que_no_existe"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert not any(k.startswith("sql") for k in conn.info)
+        # solo la sentencia que terminó cuenta, con su propia duración
+        assert g.sql_n == 1 and 0 <= g.sql_t < 1
@@ -0,0 +1,92 @@
+# tests/test_storage.py
+"""Mismo contrato para LocalStorage y S3Storage (este último sobre moto)."""
+import io, os
+
+import pytest
+
+from app.services.storage import LocalStorage, S3Storage
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request, tmp_path, monkeypatch):
+    if request.param == "local":
+        yield LocalStorage(str(tmp_path / "uploads"), chunk=64 * 1024)
+        return
+    moto = pytest.importorskip("moto")
+    for var, val in (("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"),
+                     ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(var, val)
+    with moto.mock_aws():
+        st = S3Storage("patitas", prefix="/fotos/", chunk=5 * MB, region_name="us-east-1")
+        st.client.create_bucket(Bucket="patitas")
+        # fuera del prefijo: no debe aparecer en list()
+        st.client.put_object(Bucket="patitas", Key="otra-app/animal/1/x.jpg", Body=b"x")
+        yield st
+
+
+def _leer(st, key) -> bytes:
+    with st.local(key) as ruta, open(ruta, "rb") as f:
+        return f.read()
+
+
+def test_save_por_bloques_y_local(storage):
+    datos = os.urandom(11 * MB + 123)  # en S3 supera el umbral: subida multipart
+    assert storage.save("animal/1/grande.jpg", io.BytesIO(datos), content_type="image/jpeg") == len(datos)
+    assert storage.exists("animal/1/grande.jpg")
+    assert _leer(storage, "animal/1/grande.jpg") == datos
+    if isinstance(storage, S3Storage):
+        assert "-" in storage.get("animal/1/grande.jpg")["ETag"]  # ETag de multipart: "<md5>-<partes>"
+
+
+def test_save_reemplaza(storage):
+    storage.save("animal/1/a.webp", io.BytesIO(b"uno"))
+    storage.save("animal/1/a.webp", io.BytesIO(b"dos"))
+    with storage.open("animal/1/a.webp") as f:
+        assert f.read() == b"dos"
+
+
+def test_move(storage):
+    storage.save("animal/1/a.jpg", io.BytesIO(b"foto"))
+    storage.move("animal/1/a.jpg", "_cuarentena/2026-10-17/animal/1/a.jpg")
+    assert not storage.exists("animal/1/a.jpg")
+    assert _leer(storage, "_cuarentena/2026-10-17/animal/1/a.jpg") == b"foto"
+
+
+def test_list_devuelve_claves_sin_prefijo(storage):
+    for key in ("animal/2/b.jpg", "animal/1/a.jpg", "animal/1/c.jpg", "_cuarentena/x.jpg"):
+        storage.save(key, io.BytesIO(key.encode()))
+    listado = list(storage.list("animal/"))
+    assert sorted(k for k, _, _ in listado) == ["animal/1/a.jpg", "animal/1/c.jpg", "animal/2/b.jpg"]
+    assert all(size == len(k) and mtime > 0 for k, size, mtime in listado)
+    # las claves de un mismo animal salen juntas (uploads_gc agrupa por directorio)
+    dirs = [k.rsplit("/", 1)[0] for k, _, _ in listado]
+    assert dirs == sorted(dirs, key=dirs.index)
+
+
+def test_inexistente_es_filenotfound(storage):
+    with pytest.raises(FileNotFoundError):
+        storage.open("animal/9/nada.jpg")
+    with pytest.raises(FileNotFoundError):
+        with storage.local("animal/9/nada.jpg"):
+            pass
+    if isinstance(storage, S3Storage):
+        with pytest.raises(FileNotFoundError):
+            storage.get("animal/9/nada.jpg")
+    assert not storage.exists("animal/9/nada.jpg")
+
+
+def test_delete(storage):
+    storage.save("animal/1/a.jpg", io.BytesIO(b"x"))
+    assert storage.delete("animal/1/a.jpg")
+    assert not storage.exists("animal/1/a.jpg")
+    assert list(storage.list("animal/")) == []
+
+
+def test_local_no_sale_de_la_raiz(tmp_path):
+    st = LocalStorage(str(tmp_path / "uploads"))
+    with pytest.raises(ValueError):
+        st.save("../fuera.jpg", io.BytesIO(b"x"))
+    with pytest.raises(FileNotFoundError):
+        st.open("../../etc/passwd")
@@ -0,0 +1,72 @@
+# tests/test_user_cache.py
+import pytest
+
+from app.models import Usuario
+from app.services import user_cache
+from .conftest import contar_consultas
+
+
+@pytest.fixture
+def vet(app, db):
+    with app.app_context():
+        u = Usuario(nombre="Vera", apellido="Vet", correo="vet@test.cl", rol="veterinario")
+        u.set_password("secreta123")
+        # otro veterinario activo: la app no deja quitar el rol o desactivar al único
+        db.session.add_all([u, Usuario(nombre="Otra", apellido="Vet", correo="vet2@test.cl",
+                                       rol="veterinario", hash_contrasena="-")])
+        db.session.commit()
+        return u.usuario_id
+
+
+@pytest.fixture
+def cliente_vet(app, vet):
+    c = app.test_client()
+    assert c.post("/login", data={"correo": "vet@test.cl", "password": "secreta123"}).status_code == 302
+    return c
+
+
+def test_acierto_no_consulta_la_bd(app, db, vet):
+    with app.test_request_context():
+        assert user_cache.load_user(vet).correo == "vet@test.cl"
+        with contar_consultas(db.engine) as sentencias:
+            u = user_cache.load_user(vet)
+        assert sentencias == []
+        assert (u.rol, u.activo) == ("veterinario", True)
+
+
+def test_cambio_de_rol_invalida(app, db, login, vet, cliente_vet):
+    assert cliente_vet.get("/animales").status_code == 200  # queda en caché
+    assert login.post(f"/usuarios/{vet}/rol", data={"rol": "asistente"}).status_code == 302
+    with app.test_request_context():
+        assert user_cache.load_user(vet).rol == "asistente"
+
+
+def test_desactivar_cierra_la_sesion(app, db, login, vet, cliente_vet):
+    assert cliente_vet.get("/animales").status_code == 200
+    assert login.post(f"/usuarios/{vet}/desactivar").status_code == 302
+    r = cliente_vet.get("/animales")
+    assert r.status_code == 302 and "/login" in r.headers["Location"]
+
+
+def test_inactivo_devuelve_none(app, db, vet):
+    with app.app_context():
+        db.session.get(Usuario, vet).activo = False
+        db.session.commit()
+    with app.test_request_context():
+        assert user_cache.load_user(vet) is None   # desde la BD
+        assert user_cache.load_user(vet) is None   # desde la caché
+
+
+def test_invalidacion_durante_la_lectura_no_cachea(app, db, vet, monkeypatch):
+    leer = db.session.get
+
+    def get_con_invalidacion(modelo, ident):
+        u = leer(modelo, ident)
+        user_cache.invalidate_user(ident)  # otro request confirma un cambio justo ahora
+        return u
+
+    with app.test_request_context():
+        monkeypatch.setattr(db.session, "get", get_con_invalidacion)
+        user_cache.load_user(vet)
+        monkeypatch.undo()
+        assert user_cache._usuarios.get(vet) is None